@@ -0,0 +1,85 @@
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Future
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+
+# Bytes read from TestRail and sent to ADO at a time; files up to this size are
+# uploaded in one request, larger ones through ADO's chunked upload
+ATTACHMENT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def spool(chunks: Iterable[bytes]) -> Tuple[BinaryIO, str, int]:
+    """Write a streamed download to an anonymous temp file.
+
+    Returns the file rewound to its start, the SHA-256 of its content and its
+    size. Only one chunk is held in memory at a time.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    spooled = tempfile.TemporaryFile()
+    try:
+        for chunk in chunks:
+            if chunk:
+                digest.update(chunk)
+                spooled.write(chunk)
+                size += len(chunk)
+        spooled.seek(0)
+    except BaseException:
+        spooled.close()
+        raise
+    return spooled, digest.hexdigest(), size
+
+
+def read_chunks(f: BinaryIO, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset, chunk) pairs from a file"""
+    offset = 0
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield offset, chunk
+        offset += len(chunk)
+
+
+class AttachmentRegistry:
+    """Thread-safe map of attachment content to uploaded ADO attachments.
+
+    Uploads are single-flight per SHA-256: the first thread to claim a hash
+    uploads the file and every other thread waits for its URL, so a file
+    attached to many cases is uploaded once and linked many times. TestRail
+    attachment IDs are remembered as well, so an attachment seen again is not
+    downloaded again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_hash: Dict[str, Future] = {}
+        self.by_attachment_id: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.by_hash)
+
+    def url_for_attachment(self, attachment_id: str) -> Optional[str]:
+        """Return the ADO URL a TestRail attachment was already uploaded to"""
+        return self.by_attachment_id.get(str(attachment_id))
+
+    def remember_attachment(self, attachment_id: str, url: str):
+        with self.lock:
+            self.by_attachment_id[str(attachment_id)] = url
+
+    def claim(self, digest: str) -> Tuple[Future, bool]:
+        """Return the upload future for a hash and whether the caller must perform the upload"""
+        with self.lock:
+            upload = self.by_hash.get(digest)
+            if upload is not None:
+                return upload, False
+            upload = self.by_hash[digest] = Future()
+            return upload, True
+
+    def release(self, digest: str, error: BaseException):
+        """Fail a claimed upload; waiting threads see the error and later claims retry"""
+        with self.lock:
+            upload = self.by_hash.pop(digest, None)
+        if upload is not None:
+            upload.set_exception(error)
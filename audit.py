@@ -0,0 +1,113 @@
+import hashlib
+import html
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Work item fields the migrator writes, compared field by field
+AUDITED_FIELDS = ('System.Title', 'System.Description', 'Microsoft.VSTS.Common.Priority',
+                  'Microsoft.VSTS.TCM.Steps', 'System.Tags')
+DIGEST_SIZE = 8
+
+
+def normalize_field(name: str, value: Any, tag_prefixes: Tuple[str, ...]) -> str:
+    """Reduce a field value to the form ADO stores it in, give or take formatting.
+
+    HTML entities and whitespace are normalized, since ADO re-encodes rich
+    text. Only the tags the migrator writes are compared, in any order.
+    """
+    if value is None:
+        return ''
+    if name == 'System.Tags':
+        tags = (tag.strip() for tag in str(value).split(';'))
+        return ';'.join(sorted(tag for tag in tags if tag.startswith(tag_prefixes)))
+    if name == 'Microsoft.VSTS.Common.Priority':
+        return str(int(value)) if str(value).strip().lstrip('-').isdigit() else str(value)
+    return ' '.join(html.unescape(str(value)).split())
+
+
+def field_digests(fields: Dict[str, Any], tag_prefixes: Tuple[str, ...]) -> bytes:
+    """Digest each audited field, so a work item is kept as DIGEST_SIZE bytes per field"""
+    return b''.join(hashlib.blake2b(normalize_field(name, fields.get(name), tag_prefixes).encode('utf-8'),
+                                    digest_size=DIGEST_SIZE).digest()
+                    for name in AUDITED_FIELDS)
+
+
+def payload_fields(payload: List[dict]) -> Dict[str, Any]:
+    """Return the field values a JSON-patch document sets"""
+    return {operation['path'][len('/fields/'):]: operation.get('value')
+            for operation in payload if operation.get('path', '').startswith('/fields/')}
+
+
+def differing_fields(expected: bytes, actual: bytes) -> List[str]:
+    """Name the audited fields whose digests differ"""
+    differing = []
+    for index, name in enumerate(AUDITED_FIELDS):
+        field = slice(index * DIGEST_SIZE, (index + 1) * DIGEST_SIZE)
+        if expected[field] != actual[field]:
+            differing.append(name)
+    return differing
+
+
+class AuditReport:
+    """Differences between a TestRail suite and the work items migrated from it"""
+
+    def __init__(self):
+        self.cases = 0
+        self.intact = 0
+        self.missing: List[dict] = []
+        self.mismatched: List[dict] = []
+        self.misplaced: List[dict] = []
+        self.duplicated: List[dict] = []
+        self.orphaned: List[dict] = []
+
+    def check(self, case_id: int, title: str, expected: bytes, expected_suite: Optional[int],
+              work_item_ids: List[int], items: Dict[int, bytes], suites: Dict[int, Set[int]]):
+        """Compare one TestRail case with the work items that claim to hold it"""
+        self.cases += 1
+        found = [work_item_id for work_item_id in work_item_ids if work_item_id in items]
+        if not found:
+            self.missing.append({'testrail_case_id': case_id, 'title': title, 'work_item_ids': work_item_ids})
+            return
+        if len(found) > 1:
+            self.duplicated.append({'testrail_case_id': case_id, 'title': title, 'work_item_ids': found})
+
+        work_item_id = found[0]
+        intact = True
+        fields = differing_fields(expected, items[work_item_id]) if expected != items[work_item_id] else []
+        if fields:
+            intact = False
+            self.mismatched.append({'testrail_case_id': case_id, 'title': title, 'work_item_id': work_item_id,
+                                    'fields': fields})
+        actual_suites = sorted(suites.get(work_item_id, ()))
+        if expected_suite is None or expected_suite not in actual_suites:
+            intact = False
+            self.misplaced.append({'testrail_case_id': case_id, 'title': title, 'work_item_id': work_item_id,
+                                   'expected_suite': expected_suite, 'actual_suites': actual_suites})
+        self.intact += intact
+
+    def add_orphans(self, orphans: Iterable[Tuple[int, Optional[int]]]):
+        """Record (work item ID, tagged TestRail case ID) pairs that no case of the suite claimed"""
+        self.orphaned.extend({'work_item_id': work_item_id, 'testrail_case_id': case_id}
+                             for work_item_id, case_id in orphans)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'cases': self.cases,
+            'intact': self.intact,
+            'missing': len(self.missing),
+            'mismatched': len(self.mismatched),
+            'misplaced': len(self.misplaced),
+            'duplicated': len(self.duplicated),
+            'orphaned': len(self.orphaned),
+        }
+
+    def write(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'summary': self.summary(),
+                'missing': self.missing,
+                'mismatched': self.mismatched,
+                'misplaced': self.misplaced,
+                'duplicated': self.duplicated,
+                'orphaned': self.orphaned,
+            }, f, indent=2)
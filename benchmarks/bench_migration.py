@@ -0,0 +1,120 @@
+"""Measure end-to-end migration throughput against the local fake services.
+
+Runs ``TestRailMigrator.migrate()`` on synthetic suites of each size and
+reports cases/second, p50/p99 request latency and peak RSS. Run from the
+repository root:
+
+    python -m benchmarks.bench_migration --cases 1000 10000 100000 --latency 0.02
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+import requests
+
+from benchmarks.fake_services import PLAN_ID, ROOT_SUITE_ID, Faults, server_url, start_servers
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def serve(cases: int, faults: Dict[str, float], urls: multiprocessing.Queue):
+    """Run the fake services in their own process, so they don't count towards the migrator's RSS"""
+    testrail, ado = start_servers(cases, Faults(**faults))
+    urls.put((server_url(testrail), server_url(ado)))
+    threading.Event().wait()
+
+
+def run_once(testrail_url: str, ado_url: str, rate_limit: float, attachments: bool,
+             shared_steps: bool = False) -> Dict[str, Any]:
+    """Migrate the fake suite in a fresh process and return its measurements"""
+    import testrail_to_ado_migration as migration
+
+    migration.logger.setLevel(logging.WARNING)
+    migration.TESTRAIL_URL = f"{testrail_url}/"
+    migration.ADO_BASE_URL = ado_url
+    migration.TESTRAIL_RATE_LIMIT = migration.ADO_RATE_LIMIT = rate_limit
+    migration.TESTRAIL_BURST = migration.ADO_BURST = rate_limit
+    migration.MIGRATE_ATTACHMENTS = attachments
+
+    latencies = []
+
+    class TimedMigrator(migration.TestRailMigrator):
+        def make_request(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return super().make_request(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        migrator = TimedMigrator(ado_plan_id=PLAN_ID, ado_parent_suite_id=ROOT_SUITE_ID,
+                                 journal_path=os.path.join(workdir, "journal.sqlite3"), cache_mode='off',
+                                 shared_steps=shared_steps)
+        started = time.perf_counter()
+        totals = migrator.migrate() or {}
+        seconds = time.perf_counter() - started
+
+    return {
+        'seconds': seconds,
+        'cases_per_second': totals.get('created', 0) / seconds if seconds else 0.0,
+        'requests': len(latencies),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        # ru_maxrss is reported in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        **totals
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, nargs='*', default=[1000, 10000, 100000])
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument('--rate-limit', type=float, default=1000.0, help="client requests per second per service")
+    parser.add_argument('--attachments', action='store_true', help="also list attachments for every case")
+    parser.add_argument('--shared-steps', action='store_true', help="extract repeated steps as Shared Steps")
+    parser.add_argument('--report', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, args.jitter, args.throttle_rate, args.retry_after, args.error_rate)
+    urls = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(max(args.cases), faults.as_dict(), urls), daemon=True)
+    server.start()
+    testrail_url, ado_url = urls.get(timeout=30)
+
+    results = []
+    print(f"{'cases':>8} {'seconds':>9} {'cases/s':>9} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'peak RSS MB':>12} {'failed':>7}")
+    for count in args.cases:
+        requests.post(f"{ado_url}/_fake/reset", json={'cases': count, 'faults': faults.as_dict()})
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(run_once, testrail_url, ado_url, args.rate_limit, args.attachments,
+                                 args.shared_steps).result()
+        result['cases'] = count
+        result['server'] = requests.get(f"{ado_url}/_fake/stats").json()
+        results.append(result)
+        print(f"{count:>8} {result['seconds']:>9.1f} {result['cases_per_second']:>9,.0f} {result['requests']:>9} "
+              f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['peak_rss_mb']:>12.1f} "
+              f"{result.get('failed', 0):>7}")
+
+    server.terminate()
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'faults': faults.as_dict(), 'results': results}, f, indent=2)
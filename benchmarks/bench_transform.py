@@ -0,0 +1,65 @@
+"""Measure payload transform throughput on a synthetic TestRail export.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_transform --cases 100000
+"""
+import argparse
+import os
+import random
+import time
+
+from transform import transform_cases
+
+PRIORITY_MAPPING = {1: 4, 2: 3, 3: 2, 4: 1}
+AUTOMATION_STATUS_MAPPING = {0: "Not Automated", 1: "Automated", 2: "To Be Automated"}
+
+
+def synthetic_case(case_id: int, rng: random.Random, section_id: int = None, steps_per_case: int = 6) -> dict:
+    """Return one TestRail-shaped case with separated steps and HTML-heavy text"""
+    return {
+        'id': case_id,
+        'title': f"Verify checkout flow #{case_id} <edge & case>",
+        'section_id': case_id % 300 if section_id is None else section_id,
+        'priority_id': rng.randint(1, 4),
+        'custom_case_automated': rng.randint(0, 2),
+        'custom_preconds': "User is logged in as <b>admin</b> & cart is empty",
+        'custom_expected': "Order is \"confirmed\"",
+        'estimate': '5m',
+        'refs': f"JIRA-{case_id}",
+        'custom_steps_separated': [
+            {'content': f"Step {n}: click <button id=\"pay\"> & wait\nthen refresh",
+             'expected': f"Page shows <span>total {n * 10}</span>" if n % 2 else ''}
+            for n in range(1, steps_per_case + 1)
+        ]
+    }
+
+
+def synthetic_cases(count: int, steps_per_case: int = 6, seed: int = 7):
+    """Yield ``count`` synthetic cases"""
+    rng = random.Random(seed)
+    for case_id in range(1, count + 1):
+        yield synthetic_case(case_id, rng, steps_per_case=steps_per_case)
+
+
+def run(count: int, workers: int) -> float:
+    """Transform ``count`` synthetic cases and return cases per second"""
+    started = time.perf_counter()
+    produced = 0
+    for _ in transform_cases(synthetic_cases(count), PRIORITY_MAPPING, AUTOMATION_STATUS_MAPPING,
+                             "TestRail:C", workers=workers):
+        produced += 1
+    elapsed = time.perf_counter() - started
+    assert produced == count
+    return count / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=100000)
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    print(f"Transforming {args.cases} synthetic cases")
+    for workers in args.workers:
+        print(f"  {workers:>3} worker(s): {run(args.cases, workers):>10,.0f} cases/s")
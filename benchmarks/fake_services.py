@@ -0,0 +1,503 @@
+"""Local stand-ins for the TestRail and Azure DevOps APIs used by the migrator.
+
+Serves a synthetic TestRail suite and an in-memory ADO project, with
+configurable latency, 429/Retry-After throttling and server errors. Start it
+on its own from the repository root:
+
+    python -m benchmarks.fake_services --cases 10000 --latency 0.02 --throttle-rate 0.01
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+from benchmarks.bench_transform import synthetic_case
+
+# Shape of the synthetic suite
+CASES_PER_SECTION = 100
+ROOT_SECTIONS = 10          # sections beyond these are nested one level below them
+PLAN_ID = 3
+ROOT_SUITE_ID = 4
+ADO_PAGE_SIZE = 200         # suites / suite members per testplan listing page
+TESTRAIL_MAX_PAGE_SIZE = 250
+
+# Field definitions served by the TestRail and ADO schema endpoints
+TESTRAIL_SCHEMA = {
+    "get_case_fields": [
+        {"system_name": "custom_case_automated", "label": "Automated", "type_id": 6, "is_active": True,
+         "configs": [{"context": {"is_global": True},
+                      "options": {"items": "0, Not Automated\n1, Automated\n2, To Be Automated"}}]},
+        {"system_name": "custom_component", "label": "Component", "type_id": 1, "is_active": True,
+         "configs": [{"context": {"is_global": True}, "options": {}}]},
+    ],
+    "get_priorities": [{"id": priority, "name": name, "priority": priority}
+                       for priority, name in enumerate(("Low", "Medium", "High", "Critical"), 1)],
+    "get_case_types": [{"id": 1, "name": "Functional"}, {"id": 2, "name": "Regression"}],
+}
+ADO_TEST_CASE_FIELDS = [
+    {"referenceName": "System.Title", "alwaysRequired": True},
+    {"referenceName": "System.Description", "alwaysRequired": False},
+    {"referenceName": "System.Tags", "alwaysRequired": False},
+    {"referenceName": "System.State", "alwaysRequired": True, "defaultValue": "Design"},
+    {"referenceName": "Microsoft.VSTS.Common.Priority", "alwaysRequired": False, "defaultValue": 2,
+     "allowedValues": [1, 2, 3, 4]},
+    {"referenceName": "Microsoft.VSTS.TCM.Steps", "alwaysRequired": False},
+]
+ADO_FIELDS = [
+    {"referenceName": "System.Title", "type": "string"},
+    {"referenceName": "System.Description", "type": "html"},
+    {"referenceName": "System.Tags", "type": "plainText"},
+    {"referenceName": "System.State", "type": "string"},
+    {"referenceName": "System.Id", "type": "integer", "readOnly": True},
+    {"referenceName": "Microsoft.VSTS.Common.Priority", "type": "integer"},
+    {"referenceName": "Microsoft.VSTS.TCM.Steps", "type": "html"},
+]
+
+
+class Faults:
+    """Latency and failures injected into every API response"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: float = 1.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(vars(self))
+
+
+class ScriptedFault:
+    """Answers the next ``count`` requests matching ``method`` and the ``path`` regex with ``status``.
+
+    With ``after_handling`` the request takes effect first and only its
+    response is replaced, as when a response is lost. A ``status`` of 0 drops
+    the connection without any response.
+    """
+
+    def __init__(self, method: str, path: str, status: int, count: int = 1,
+                 retry_after: Optional[float] = None, after_handling: bool = False):
+        self.method = method
+        self.path = re.compile(path)
+        self.status = status
+        self.count = count
+        self.retry_after = retry_after
+        self.after_handling = after_handling
+
+
+class FakeState:
+    """Synthetic TestRail suite plus the ADO work items and suites written so far"""
+
+    def __init__(self, cases: int = 1000, faults: Faults = None, runs: int = 2):
+        self.lock = threading.Lock()
+        self.faults = faults or Faults()
+        self.reset(cases, runs=runs)
+
+    def reset(self, cases: int, faults: Optional[Dict[str, float]] = None, runs: int = 2):
+        with self.lock:
+            self.case_count = cases
+            self.run_count = runs
+            self.test_runs = {}
+            self.next_test_run_id = 1
+            self.section_count = max(1, cases // CASES_PER_SECTION)
+            self.suites = {ROOT_SUITE_ID: ("Root", None)}
+            self.suite_members = {}
+            self.next_suite_id = ROOT_SUITE_ID + 1
+            self.work_items = {}
+            self.next_work_item_id = 1000
+            self.stats = {"requests": 0, "throttled": 0, "errors": 0}
+            self.scripted = []
+            if faults:
+                self.faults = Faults(**faults)
+
+    def script(self, fault: ScriptedFault):
+        with self.lock:
+            self.scripted.append(fault)
+
+    def take_scripted(self, method: str, path: str, after_handling: bool) -> Optional[ScriptedFault]:
+        """Consume one use of the first scripted fault matching a request"""
+        with self.lock:
+            for fault in self.scripted:
+                if (fault.count and fault.method == method and fault.after_handling == after_handling
+                        and fault.path.search(path)):
+                    fault.count -= 1
+                    return fault
+        return None
+
+    # --- TestRail ---
+
+    def section(self, section_id: int) -> dict:
+        parent_id = None if section_id <= ROOT_SECTIONS else (section_id % ROOT_SECTIONS) + 1
+        return {"id": section_id, "name": f"Section {section_id}", "parent_id": parent_id,
+                "depth": 0 if parent_id is None else 1}
+
+    def case(self, case_id: int) -> dict:
+        section_id = 1 + (case_id - 1) * self.section_count // self.case_count
+        case = synthetic_case(case_id, random.Random(case_id), section_id=section_id)
+        case["updated_on"] = 1700000000 + case_id
+        case["type_id"] = 1 + case_id % 2
+        case["custom_component"] = f"Component {case_id % 7}"
+        return case
+
+    def run(self, run_id: int) -> dict:
+        return {"id": run_id, "name": f"Run {run_id}", "suite_id": 2,
+                "created_on": 1700000000 + run_id * 86400, "completed_on": 1700003600 + run_id * 86400}
+
+    def test(self, run_id: int, case_id: int) -> dict:
+        return {"id": run_id * 10000000 + case_id, "case_id": case_id, "run_id": run_id,
+                "title": f"Verify checkout flow #{case_id}"}
+
+    def result(self, run_id: int, case_id: int) -> dict:
+        return {"id": run_id * 10000000 + case_id, "test_id": run_id * 10000000 + case_id,
+                "status_id": 1 + case_id % 5, "elapsed": "1m 5s", "comment": f"Run {run_id} result",
+                "created_on": 1700000000 + run_id * 86400 + case_id}
+
+    # --- ADO ---
+
+    def create_work_item(self, operations: List[dict], work_item_type: str = "Test Case") -> dict:
+        fields = {op["path"].rsplit("/", 1)[-1]: op.get("value")
+                  for op in operations if op.get("path", "").startswith("/fields/")}
+        with self.lock:
+            work_item_id = self.next_work_item_id
+            self.next_work_item_id += 1
+            fields.update({"System.Id": work_item_id, "System.WorkItemType": work_item_type})
+            self.work_items[work_item_id] = fields
+        return {"id": work_item_id, "fields": fields}
+
+    def delete_work_item(self, work_item_id: int) -> int:
+        with self.lock:
+            if self.work_items.pop(work_item_id, None) is None:
+                return 404
+            for members in self.suite_members.values():
+                if work_item_id in members:
+                    members.remove(work_item_id)
+        return 204
+
+    def create_suite(self, name: str, parent_id: int) -> dict:
+        with self.lock:
+            suite_id = self.next_suite_id
+            self.next_suite_id += 1
+            self.suites[suite_id] = (name, parent_id)
+        return {"id": suite_id, "name": name}
+
+    def delete_suite(self, suite_id: int) -> int:
+        """Delete a suite with its child suites, as ADO does"""
+        with self.lock:
+            if suite_id not in self.suites:
+                return 404
+            doomed = [suite_id]
+            for sid in doomed:
+                doomed.extend(child for child, (_, parent) in self.suites.items() if parent == sid)
+            for sid in doomed:
+                self.suites.pop(sid, None)
+                self.suite_members.pop(sid, None)
+        return 204
+
+    def add_to_suite(self, suite_id: int, work_item_ids: List[int]) -> List[int]:
+        with self.lock:
+            members = self.suite_members.setdefault(suite_id, [])
+            added = [wid for wid in work_item_ids if wid in self.work_items and wid not in members]
+            members.extend(added)
+        return added
+
+    def query(self, wiql: str, top: int) -> List[int]:
+        last_id = int((re.search(r"\[System\.Id\] > (\d+)", wiql) or [0, 0])[1])
+        tags = re.findall(r"CONTAINS '([^']+)'", wiql)
+        types = re.findall(r"\[System\.WorkItemType\] = '([^']+)'", wiql)
+        with self.lock:
+            items = sorted(self.work_items.items())
+        matches = []
+        for work_item_id, fields in items:
+            if work_item_id <= last_id or (types and fields["System.WorkItemType"] not in types):
+                continue
+            item_tags = [tag.strip() for tag in (fields.get("System.Tags") or "").split(";")]
+            if tags and not any(tag in item_tags for tag in tags):
+                continue
+            matches.append(work_item_id)
+            if len(matches) >= top:
+                break
+        return matches
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Routes TestRail and ADO requests to the server's ``FakeState``"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> FakeState:
+        return self.server.state
+
+    def do_GET(self):
+        self.handle_api("GET")
+
+    def do_POST(self):
+        self.handle_api("POST")
+
+    def do_PATCH(self):
+        self.handle_api("PATCH")
+
+    def do_PUT(self):
+        self.handle_api("PUT")
+
+    def do_DELETE(self):
+        self.handle_api("DELETE")
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send(self, status: int, body: Any = None, headers: Dict[str, str] = None):
+        raw = body if isinstance(body, bytes) else json.dumps(body if body is not None else {}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream" if isinstance(body, bytes) else "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def handle_api(self, method: str):
+        body = self.read_body()
+        url = urlparse(self.path)
+        if url.path.startswith("/_fake/"):
+            return self.handle_control(url.path, body)
+
+        faults = self.state.faults
+        with self.state.lock:
+            self.state.stats["requests"] += 1
+        scripted = self.state.take_scripted(method, url.path, after_handling=False)
+        if scripted:
+            return self.send_scripted(scripted)
+        if faults.latency or faults.jitter:
+            time.sleep(faults.latency + random.uniform(0, faults.jitter))
+        roll = random.random()
+        if roll < faults.throttle_rate:
+            with self.state.lock:
+                self.state.stats["throttled"] += 1
+            return self.send(429, {"message": "throttled"}, {"Retry-After": str(faults.retry_after)})
+        if roll < faults.throttle_rate + faults.error_rate:
+            with self.state.lock:
+                self.state.stats["errors"] += 1
+            return self.send(503, {"message": "injected failure"})
+
+        try:
+            payload = json.loads(body) if body and self.headers.get("Content-Type", "").startswith("application/json") else body
+            if url.path.endswith("/index.php"):
+                status, result, headers = self.testrail(unquote(url.query))
+            else:
+                status, result, headers = self.ado(method, url.path, parse_qs(url.query), payload)
+        except Exception as e:
+            status, result, headers = 500, {"message": str(e)}, None
+        scripted = self.state.take_scripted(method, url.path, after_handling=True)
+        if scripted:
+            return self.send_scripted(scripted)
+        self.send(status, result, headers)
+
+    def send_scripted(self, fault: ScriptedFault):
+        if not fault.status:
+            self.close_connection = True
+            return
+        headers = {"Retry-After": str(fault.retry_after)} if fault.retry_after is not None else None
+        self.send(fault.status, {"message": "scripted failure"}, headers)
+
+    def handle_control(self, path: str, body: bytes):
+        if path == "/_fake/reset":
+            options = json.loads(body or b"{}")
+            self.state.reset(options.get("cases", self.state.case_count), options.get("faults"), options.get("runs", 2))
+            return self.send(200, {"cases": self.state.case_count})
+        if path == "/_fake/stats":
+            with self.state.lock:
+                stats = dict(self.state.stats, work_items=len(self.state.work_items), suites=len(self.state.suites),
+                             suite_members=sum(len(m) for m in self.state.suite_members.values()),
+                             test_runs=len(self.state.test_runs),
+                             test_results=sum(run["results"] for run in self.state.test_runs.values()))
+            return self.send(200, stats)
+        self.send(404, {"message": path})
+
+    def testrail(self, query: str) -> Tuple[int, Any, Optional[dict]]:
+        endpoint, *pairs = query.split("&")
+        params = dict(pair.split("=", 1) for pair in pairs if "=" in pair)
+        endpoint = endpoint.replace("/api/v2/", "", 1).lstrip("/")
+        limit = min(int(params.get("limit", TESTRAIL_MAX_PAGE_SIZE)), TESTRAIL_MAX_PAGE_SIZE)
+        offset = int(params.get("offset", 0))
+
+        if endpoint in TESTRAIL_SCHEMA:
+            return 200, TESTRAIL_SCHEMA[endpoint], None
+        if endpoint.startswith("get_sections/"):
+            total, key, row = self.state.section_count, "sections", self.state.section
+        elif endpoint.startswith("get_cases/"):
+            total, key, row = self.state.case_count, "cases", self.state.case
+        elif endpoint.startswith("get_runs/"):
+            total, key, row = self.state.run_count, "runs", self.state.run
+        elif endpoint.startswith(("get_tests/", "get_results_for_run/")):
+            run_id = int(endpoint.rsplit("/", 1)[1])
+            build = self.state.test if endpoint.startswith("get_tests/") else self.state.result
+            total, key = self.state.case_count, "tests" if endpoint.startswith("get_tests/") else "results"
+            row = lambda case_id: build(run_id, case_id)
+        elif endpoint.startswith("get_attachments_for_case/"):
+            return 200, {"offset": 0, "limit": limit, "size": 0, "_links": {"next": None}, "attachments": []}, None
+        else:
+            return 400, {"error": f"Unknown method '{endpoint}'"}, None
+
+        rows = [row(item_id) for item_id in range(offset + 1, min(offset + limit, total) + 1)]
+        next_link = None
+        if offset + limit < total:
+            next_params = "&".join(f"{k}={v}" for k, v in dict(params, offset=offset + limit).items())
+            next_link = f"/api/v2/{endpoint}&{next_params}"
+        return 200, {"offset": offset, "limit": limit, "size": len(rows),
+                     "_links": {"next": next_link, "prev": None}, key: rows}, None
+
+    def ado(self, method: str, path: str, query: Dict[str, List[str]], payload: Any) -> Tuple[int, Any, Optional[dict]]:
+        state = self.state
+        token = int((query.get("continuationToken") or ["0"])[0])
+
+        def page(rows: List[dict]) -> Tuple[int, Any, Optional[dict]]:
+            headers = None
+            if token + ADO_PAGE_SIZE < len(rows):
+                headers = {"x-ms-continuationtoken": str(token + ADO_PAGE_SIZE)}
+            return 200, {"value": rows[token:token + ADO_PAGE_SIZE]}, headers
+
+        if method == "GET" and "/_apis/projects/" in path:
+            return 200, {"name": "fake"}, None
+        if method == "GET" and path.endswith("/_apis/wit/workitemtypes/Test%20Case/fields"):
+            return 200, {"count": len(ADO_TEST_CASE_FIELDS), "value": ADO_TEST_CASE_FIELDS}, None
+        if method == "GET" and path.endswith("/_apis/wit/fields"):
+            return 200, {"count": len(ADO_FIELDS), "value": ADO_FIELDS}, None
+        if method == "GET" and re.search(r"/_apis/test/plans/\d+$", path):
+            return 200, {"id": PLAN_ID}, None
+        if method == "GET" and re.search(r"/_apis/testplan/Plans/\d+/suites$", path):
+            with state.lock:
+                suites = [{"id": sid, "name": name, "parentSuite": {"id": parent} if parent else None}
+                          for sid, (name, parent) in sorted(state.suites.items())]
+            return page(suites)
+        match = re.search(r"/_apis/testplan/Plans/\d+/suites/(\d+)$", path)
+        if match and method == "DELETE":
+            return state.delete_suite(int(match[1])), b"", None
+        match = re.search(r"/_apis/test/plans/\d+/suites/(\d+)/suites$", path)
+        if match and method == "GET":
+            parent_id = int(match[1])
+            with state.lock:
+                children = [{"id": sid, "name": name, "parent": {"id": parent}}
+                            for sid, (name, parent) in state.suites.items() if parent == parent_id]
+            return 200, {"value": children}, None
+        if match and method == "POST":
+            return 200, state.create_suite(payload["name"], int(match[1])), None
+        match = re.search(r"/_apis/test/plans/\d+/suites/(\d+)/testcases/([\d,]+)$", path)
+        if match and method == "POST":
+            added = state.add_to_suite(int(match[1]), [int(wid) for wid in match[2].split(",")])
+            return 200, {"value": [{"testCase": {"id": str(wid)}} for wid in added]}, None
+        match = re.search(r"/_apis/testplan/Plans/\d+/Suites/(\d+)/TestCase$", path)
+        if match and method == "POST":
+            added = state.add_to_suite(int(match[1]), [int(entry["workItem"]["id"]) for entry in payload])
+            return 200, {"value": [{"workItem": {"id": wid}} for wid in added]}, None
+        if match and method == "GET":
+            with state.lock:
+                members = [{"workItem": {"id": wid}} for wid in state.suite_members.get(int(match[1]), [])]
+            return page(members)
+        match = re.search(r"/_apis/testplan/Plans/\d+/Suites/(\d+)/TestPoint$", path)
+        if match and method == "GET":
+            with state.lock:
+                points = [{"id": wid + 5000000, "testCaseReference": {"id": wid}}
+                          for wid in state.suite_members.get(int(match[1]), [])]
+            return page(points)
+        if method == "POST" and path.endswith("/_apis/test/runs"):
+            with state.lock:
+                run_id = state.next_test_run_id
+                state.next_test_run_id += 1
+                state.test_runs[run_id] = {"name": payload["name"], "state": payload.get("state"), "results": 0}
+            return 200, {"id": run_id, "name": payload["name"]}, None
+        match = re.search(r"/_apis/test/Runs/(\d+)/results$", path)
+        if match and method == "POST":
+            with state.lock:
+                state.test_runs[int(match[1])]["results"] += len(payload)
+            return 200, {"count": len(payload), "value": [{"id": 100000 + n} for n in range(len(payload))]}, None
+        match = re.search(r"/_apis/test/runs/(\d+)$", path)
+        if match and method in ("PATCH", "DELETE"):
+            with state.lock:
+                if method == "DELETE":
+                    state.test_runs.pop(int(match[1]), None)
+                elif int(match[1]) in state.test_runs:
+                    state.test_runs[int(match[1])]["state"] = payload.get("state")
+            return (204, b"", None) if method == "DELETE" else (200, {"id": int(match[1])}, None)
+        if method == "POST" and path.endswith("/_apis/wit/$batch"):
+            results = [{"code": state.delete_work_item(int(urlparse(operation["uri"]).path.rsplit("/", 1)[-1])),
+                        "body": None}
+                       if operation["method"] == "DELETE" else
+                       {"code": 200, "body": json.dumps(state.create_work_item(operation["body"]))}
+                       for operation in payload]
+            return 200, {"count": len(results), "value": results}, None
+        match = re.search(r"/_apis/wit/workitems/\$([^/]+)$", path)
+        if match and method == "POST":
+            return 200, state.create_work_item(payload, unquote(match[1])), None
+        match = re.search(r"/_apis/wit/workitems/(\d+)$", path)
+        if match and method == "PATCH":
+            return 200, {"id": int(match[1])}, None
+        if method == "POST" and path.endswith("/_apis/wit/wiql"):
+            ids = state.query(payload["query"], int((query.get("$top") or ["20000"])[0]))
+            return 200, {"workItems": [{"id": wid} for wid in ids]}, None
+        if method == "POST" and path.endswith("/_apis/wit/workitemsbatch"):
+            with state.lock:
+                items = [{"id": wid, "fields": dict(state.work_items[wid])}
+                         for wid in payload["ids"] if wid in state.work_items]
+            return 200, {"count": len(items), "value": items}, None
+        if path.endswith("/_apis/wit/attachments") and method == "POST":
+            attachment_id = str(uuid.uuid4())
+            return 201, {"id": attachment_id, "url": f"{path}/{attachment_id}"}, None
+        if "/_apis/wit/attachments/" in path and method == "PUT":
+            return 201, {}, None
+        return 404, {"message": f"No fake for {method} {path}"}, None
+
+
+def start_servers(cases: int = 1000, faults: Faults = None,
+                  host: str = "127.0.0.1") -> Tuple[ThreadingHTTPServer, ThreadingHTTPServer]:
+    """Start the fake TestRail and ADO servers on free ports in background threads.
+
+    Each service gets its own port, so the migrator keeps a separate session
+    and rate limiter for each as it does against the real hosts.
+    """
+    state = FakeState(cases, faults)
+    servers = []
+    for _ in range(2):
+        server = ThreadingHTTPServer((host, 0), FakeHandler)
+        server.daemon_threads = True
+        server.state = state
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers[0], servers[1]
+
+
+def server_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="random extra latency, up to this many seconds")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds sent with each 429")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args()
+
+    testrail, ado = start_servers(args.cases, Faults(args.latency, args.jitter, args.throttle_rate,
+                                                     args.retry_after, args.error_rate))
+    print(f"TestRail: {server_url(testrail)}/")
+    print(f"ADO:      {server_url(ado)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,63 @@
+import threading
+from typing import Iterable, Optional
+
+
+def normalize_title(title: str) -> str:
+    """Normalize a test case title for comparison"""
+    return title.strip().lower()
+
+
+def parse_testrail_case_id(tags: str, prefix: str) -> Optional[int]:
+    """Extract the TestRail case ID from a work item's ``System.Tags`` value"""
+    for tag in (tags or '').split(';'):
+        tag = tag.strip()
+        if tag.startswith(prefix) and tag[len(prefix):].isdigit():
+            return int(tag[len(prefix):])
+    return None
+
+
+class MigratedCaseIndex:
+    """Hashed index of Test Case work items that already exist in ADO.
+
+    Items tagged with their source TestRail case are keyed by that case ID.
+    Untagged items, such as those created by older versions of the migrator,
+    are keyed by (normalized title, suite ID) instead, so cases that share a
+    title in different sections are not mistaken for each other. The members
+    of each listed suite are kept too, so adopted items already in their
+    suite are not added again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_case_id = {}
+        self.by_title_and_suite = {}
+        self.suite_members = {}
+
+    def __len__(self) -> int:
+        return len(self.by_case_id) + len(self.by_title_and_suite)
+
+    def add(self, work_item_id: int, testrail_case_id: Optional[int] = None,
+            title: Optional[str] = None, suite_ids: Iterable[int] = ()):
+        """Index an existing work item by case ID, or by title in each suite that holds it"""
+        with self.lock:
+            if testrail_case_id is not None:
+                self.by_case_id.setdefault(testrail_case_id, work_item_id)
+            elif title is not None:
+                for suite_id in suite_ids:
+                    self.by_title_and_suite.setdefault((normalize_title(title), suite_id), work_item_id)
+
+    def add_suite_members(self, suite_id: int, work_item_ids: Iterable[int]):
+        """Record the test cases a suite holds"""
+        with self.lock:
+            self.suite_members.setdefault(suite_id, set()).update(work_item_ids)
+
+    def in_suite(self, work_item_id: int, suite_id: int) -> bool:
+        """Whether a listed suite already holds a work item"""
+        return work_item_id in self.suite_members.get(suite_id, ())
+
+    def lookup(self, case: dict, suite_id: int) -> Optional[int]:
+        """Return the work item already migrated for a TestRail case, if any"""
+        work_item_id = self.by_case_id.get(case.get('id'))
+        if work_item_id is None and case.get('title'):
+            work_item_id = self.by_title_and_suite.get((normalize_title(case['title']), suite_id))
+        return work_item_id
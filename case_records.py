@@ -0,0 +1,153 @@
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from transform import parse_steps
+
+# TestRail case fields read when building a work item
+CASE_FIELDS = ('id', 'title', 'section_id', 'priority_id', 'type_id', 'custom_case_automated', 'custom_preconds',
+               'custom_expected', 'estimate', 'refs', 'updated_on')
+
+# Custom fields holding steps, which are kept parsed instead
+STEP_FIELDS = ('custom_steps', 'custom_steps_separated')
+
+
+class CaseRecord:
+    """Compact, read-only copy of the TestRail case fields the migrator maps.
+
+    Steps are parsed once into (action, expected result) pairs, and other
+    custom fields are kept only when they have a value; the raw case is not
+    kept. Records answer ``get`` and ``[]`` like the case dict they were built
+    from, so they can be passed wherever a case is expected.
+    """
+
+    __slots__ = CASE_FIELDS + ('steps', 'custom')
+
+    def __init__(self, steps: Tuple[Tuple[str, str], ...] = (), custom: Tuple[Tuple[str, Any], ...] = (),
+                 **fields):
+        for name in CASE_FIELDS:
+            setattr(self, name, fields.get(name))
+        self.steps = steps
+        self.custom = custom
+
+    @classmethod
+    def from_testrail(cls, case: dict) -> "CaseRecord":
+        custom = tuple((name, value) for name, value in case.items()
+                       if name.startswith('custom_') and name not in CASE_FIELDS and name not in STEP_FIELDS
+                       and value not in (None, '', []))
+        return cls(steps=tuple(parse_steps(case)), custom=custom, **{name: case.get(name) for name in CASE_FIELDS})
+
+    def __repr__(self) -> str:
+        return f"CaseRecord(id={self.id!r}, title={self.title!r})"
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self.__slots__:
+            value = getattr(self, key, None)
+        else:
+            value = next((value for name, value in self.custom if name == key), None)
+        return default if value is None else value
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def size(self) -> int:
+        """Approximate bytes held by the record"""
+        size = sys.getsizeof(self)
+        for name in CASE_FIELDS:
+            size += sys.getsizeof(getattr(self, name))
+        for action, expected in self.steps:
+            size += sys.getsizeof(action) + sys.getsizeof(expected)
+        for _, value in self.custom:
+            size += sys.getsizeof(value)
+        return size
+
+
+class SectionGrouper:
+    """Groups case records by section, spilling to a temporary SQLite index past a memory budget.
+
+    Records are kept in memory until their estimated size passes
+    ``budget_bytes``; then every buffered group is appended to the index and
+    memory starts over. Iterating yields each section's records, in the order
+    sections were first seen, reading spilled records back lazily.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.groups: Dict[Any, List[CaseRecord]] = {}
+        self.order: List[Any] = []
+        self.seen = set()
+        self.buffered_bytes = 0
+        self.sequence = 0
+        self.path: Optional[str] = None
+        self.conn: Optional[sqlite3.Connection] = None
+        self.spilled = 0
+
+    def __len__(self) -> int:
+        return self.sequence
+
+    def add(self, record: CaseRecord):
+        section_id = record.get('section_id')
+        if section_id not in self.seen:
+            self.seen.add(section_id)
+            self.order.append(section_id)
+        self.groups.setdefault(section_id, []).append(record)
+        self.sequence += 1
+        self.buffered_bytes += record.size()
+        if self.buffered_bytes > self.budget_bytes:
+            self.spill()
+
+    def spill(self):
+        """Move every buffered record to the on-disk index"""
+        if self.conn is None:
+            fd, self.path = tempfile.mkstemp(prefix='case-groups-', suffix='.sqlite3')
+            os.close(fd)
+            self.conn = sqlite3.connect(self.path, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=OFF")
+            self.conn.execute("PRAGMA synchronous=OFF")
+            self.conn.execute("CREATE TABLE records (section_key BLOB, seq INTEGER, record BLOB)")
+            self.conn.execute("CREATE INDEX records_by_section ON records (section_key, seq)")
+        rows = []
+        for section_id, records in self.groups.items():
+            key = pickle.dumps(section_id)
+            rows.extend((key, self.spilled + index, pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+                        for index, record in enumerate(records))
+            self.spilled += len(records)
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany("INSERT INTO records VALUES (?, ?, ?)", rows)
+        self.groups = {}
+        self.buffered_bytes = 0
+
+    def iter_section(self, section_id: Any) -> Iterator[CaseRecord]:
+        """Yield one section's records: spilled ones first, then those still in memory"""
+        if self.conn is not None:
+            cursor = self.conn.execute("SELECT record FROM records WHERE section_key = ? ORDER BY seq",
+                                       (pickle.dumps(section_id),))
+            for (blob,) in cursor:
+                yield pickle.loads(blob)
+        yield from self.groups.get(section_id, [])
+
+    def __iter__(self) -> Iterator[Tuple[Any, Iterator[CaseRecord]]]:
+        for section_id in self.order:
+            yield section_id, self.iter_section(section_id)
+
+    def close(self):
+        self.groups = {}
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,304 @@
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Progress gauges, in pipeline order
+PROGRESS_GAUGES = ("cases_fetched", "cases_transformed", "cases_created", "cases_updated", "cases_skipped",
+                   "cases_failed", "cases_linked", "attachments_linked")
+
+# Path segments replaced by placeholders so URLs group into endpoint templates
+ID_SEGMENT = re.compile(r"^(\d+(,\d+)*|[0-9a-f]{8}-[0-9a-f-]{27})$", re.IGNORECASE)
+
+
+def endpoint_template(url: str) -> str:
+    """Reduce a request URL to its endpoint, e.g. ``get_cases/{id}`` or ``_apis/wit/workitems/{id}``"""
+    parsed = urlparse(url)
+    path = parsed.path
+    if path.endswith("/index.php"):
+        # TestRail puts the API path in the query string: index.php?/api/v2/get_cases/1&suite_id=2
+        path = parsed.query.split("&", 1)[0].replace("/api/v2/", "", 1)
+    segments = [("{id}" if ID_SEGMENT.match(segment) else segment) for segment in path.strip("/").split("/")]
+    if "_apis" in segments:
+        # Drop the organization and project in front of ADO's API path
+        segments = segments[segments.index("_apis"):]
+    return "/".join(segments)
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets, as Prometheus expects"""
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, fraction: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket that holds it"""
+        target = self.count * fraction
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= target and seen:
+                return bound
+        # Beyond the last bucket; report its bound as a lower estimate
+        return LATENCY_BUCKETS[-1] if self.count else 0.0
+
+    def cumulative(self):
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            yield bound, seen
+
+
+class MigrationMetrics:
+    """Thread-safe request and progress metrics of one migration.
+
+    Requests are grouped by host, method and endpoint template. Every group
+    tracks a latency histogram, response status counts and bytes sent and
+    received; time spent waiting on rate limits and retry delays is tracked
+    per host. Progress gauges count cases through the pipeline and give the
+    ETA.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.latency: Dict[Tuple[str, str, str], Histogram] = {}
+        self.statuses: Dict[Tuple[str, str, str, str], int] = {}
+        self.bytes_sent: Dict[Tuple[str, str, str], int] = {}
+        self.bytes_received: Dict[Tuple[str, str, str], int] = {}
+        self.retries: Dict[Tuple[str, str, str], int] = {}
+        self.throttled_seconds: Dict[str, float] = {}
+        self.progress = {gauge: 0 for gauge in PROGRESS_GAUGES}
+        self.cases_expected = None
+        self.writes_started = None
+
+    def request_key(self, method: str, url: str) -> Tuple[str, str, str]:
+        return urlparse(url).netloc, method.upper(), endpoint_template(url)
+
+    def observe_request(self, key: Tuple[str, str, str], seconds: float, status: Any,
+                        sent: int = 0, received: int = 0):
+        """Record one HTTP attempt; ``status`` is the response code or an error name"""
+        with self.lock:
+            self.latency.setdefault(key, Histogram()).observe(seconds)
+            status_key = key + (str(status),)
+            self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+            self.bytes_sent[key] = self.bytes_sent.get(key, 0) + sent
+            self.bytes_received[key] = self.bytes_received.get(key, 0) + received
+
+    def observe_retry(self, key: Tuple[str, str, str]):
+        with self.lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def observe_throttle(self, host: str, seconds: float):
+        """Record time a request spent waiting on a rate limit or a retry delay"""
+        if seconds <= 0:
+            return
+        with self.lock:
+            self.throttled_seconds[host] = self.throttled_seconds.get(host, 0.0) + seconds
+
+    def add(self, gauge: str, amount: int = 1):
+        """Advance a progress gauge"""
+        if not amount:
+            return
+        with self.lock:
+            if gauge in ("cases_created", "cases_updated") and self.writes_started is None:
+                self.writes_started = time.time()
+            self.progress[gauge] += amount
+
+    def set_expected(self, cases: int):
+        """Record the number of cases to process once the TestRail listing is complete"""
+        with self.lock:
+            self.cases_expected = cases
+
+    def eta_seconds(self) -> Optional[float]:
+        """Seconds left at the write throughput observed so far.
+
+        Until the TestRail listing is complete, this covers only the cases
+        fetched so far.
+        """
+        with self.lock:
+            progress = dict(self.progress)
+            expected = self.cases_expected
+            writes_started = self.writes_started
+        done = (progress["cases_created"] + progress["cases_updated"]
+                + progress["cases_skipped"] + progress["cases_failed"])
+        remaining = (expected if expected is not None else progress["cases_fetched"]) - done
+        written = progress["cases_created"] + progress["cases_updated"]
+        if writes_started is None or not written:
+            return None
+        throughput = written / max(time.time() - writes_started, 1e-6)
+        return max(0.0, remaining) / throughput
+
+    def summary_line(self) -> str:
+        """One-line progress summary for the console"""
+        eta = self.eta_seconds()
+        with self.lock:
+            progress = dict(self.progress)
+            expected = self.cases_expected
+            writes_started = self.writes_started
+            throttled = sum(self.throttled_seconds.values())
+        written = progress["cases_created"] + progress["cases_updated"]
+        done = written + progress["cases_skipped"] + progress["cases_failed"]
+        rate = written / max(time.time() - writes_started, 1e-6) if writes_started is not None else 0.0
+        parts = [f"{done}/{expected if expected is not None else progress['cases_fetched']} cases",
+                 f"{progress['cases_created']} created", f"{progress['cases_updated']} updated",
+                 f"{progress['cases_skipped']} skipped", f"{progress['cases_failed']} failed",
+                 f"{progress['cases_linked']} linked", f"{rate:.0f}/s"]
+        if eta is not None:
+            parts.append(f"ETA {int(eta) // 60}m{int(eta) % 60:02d}s")
+        if throttled:
+            parts.append(f"throttled {throttled:.0f}s")
+        return " | ".join(parts)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return all metrics as a JSON-serializable dict"""
+        eta = self.eta_seconds()
+        with self.lock:
+            endpoints = []
+            for key, histogram in sorted(self.latency.items()):
+                host, method, endpoint = key
+                endpoints.append({
+                    "host": host,
+                    "method": method,
+                    "endpoint": endpoint,
+                    "requests": histogram.count,
+                    "seconds": round(histogram.total, 3),
+                    "p50_seconds": histogram.quantile(0.5),
+                    "p99_seconds": histogram.quantile(0.99),
+                    "statuses": {status: count for (h, m, e, status), count in self.statuses.items()
+                                 if (h, m, e) == key},
+                    "retries": self.retries.get(key, 0),
+                    "bytes_sent": self.bytes_sent.get(key, 0),
+                    "bytes_received": self.bytes_received.get(key, 0),
+                })
+            return {
+                "updated_at": time.time(),
+                "elapsed_seconds": round(time.time() - self.started, 1),
+                "progress": dict(self.progress),
+                "cases_expected": self.cases_expected,
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "throttled_seconds": {host: round(seconds, 3) for host, seconds in self.throttled_seconds.items()},
+                "endpoints": endpoints,
+            }
+
+    def render_prometheus(self) -> str:
+        """Return all metrics in the Prometheus text exposition format"""
+        def labels(**values) -> str:
+            return "{" + ",".join(f'{name}="{value}"' for name, value in values.items()) + "}"
+
+        eta = self.eta_seconds()
+        lines = ["# TYPE migration_request_seconds histogram"]
+        with self.lock:
+            for (host, method, endpoint), histogram in sorted(self.latency.items()):
+                base = dict(host=host, method=method, endpoint=endpoint)
+                for bound, count in histogram.cumulative():
+                    lines.append(f"migration_request_seconds_bucket{labels(**base, le=bound)} {count}")
+                lines.append(f"migration_request_seconds_bucket{labels(**base, le='+Inf')} {histogram.count}")
+                lines.append(f"migration_request_seconds_sum{labels(**base)} {histogram.total:.6f}")
+                lines.append(f"migration_request_seconds_count{labels(**base)} {histogram.count}")
+            lines.append("# TYPE migration_responses_total counter")
+            for (host, method, endpoint, status), count in sorted(self.statuses.items()):
+                lines.append(f"migration_responses_total{labels(host=host, method=method, endpoint=endpoint, status=status)} {count}")
+            lines.append("# TYPE migration_request_retries_total counter")
+            for (host, method, endpoint), count in sorted(self.retries.items()):
+                lines.append(f"migration_request_retries_total{labels(host=host, method=method, endpoint=endpoint)} {count}")
+            for name, totals in (("sent", self.bytes_sent), ("received", self.bytes_received)):
+                lines.append(f"# TYPE migration_bytes_{name}_total counter")
+                for (host, method, endpoint), count in sorted(totals.items()):
+                    lines.append(f"migration_bytes_{name}_total{labels(host=host, method=method, endpoint=endpoint)} {count}")
+            lines.append("# TYPE migration_throttled_seconds_total counter")
+            for host, seconds in sorted(self.throttled_seconds.items()):
+                lines.append(f"migration_throttled_seconds_total{labels(host=host)} {seconds:.6f}")
+            lines.append("# TYPE migration_progress gauge")
+            for gauge, value in self.progress.items():
+                lines.append(f"migration_progress{labels(stage=gauge)} {value}")
+            if self.cases_expected is not None:
+                lines.append(f"migration_cases_expected {self.cases_expected}")
+        if eta is not None:
+            lines.append(f"migration_eta_seconds {eta:.1f}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsReporter:
+    """Publishes a ``MigrationMetrics`` while a migration runs.
+
+    Writes a JSON snapshot to ``path`` every ``interval`` seconds (atomically,
+    through a temp file), and serves the Prometheus text format on
+    ``http://<host>:<port>/metrics`` when a port is given.
+    """
+
+    def __init__(self, metrics: MigrationMetrics, path: Optional[str] = None, port: Optional[int] = None,
+                 interval: float = 10.0, host: str = "127.0.0.1"):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+        self.server = None
+        if port is not None:
+            reporter = self
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.rstrip("/") not in ("/metrics", ""):
+                        self.send_error(404)
+                        return
+                    body = reporter.metrics.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+            self.server.daemon_threads = True
+
+    def start(self):
+        if self.server is not None:
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        if self.path:
+            self.thread = threading.Thread(target=self.run, name="metrics-file", daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """Write the current snapshot to the metrics file"""
+        if not self.path:
+            return
+        partial_path = self.path + ".partial"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            json.dump(self.metrics.snapshot(), f, indent=2)
+        os.replace(partial_path, self.path)
+
+    def stop(self):
+        """Stop publishing, after writing a final snapshot"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Steps a test case goes through during migration, in order
+STEP_CREATED = "created"      # work item exists in ADO
+STEP_IN_SUITE = "in_suite"    # work item has been added to its suite
+
+# Work item fields whose content decides whether a case needs to be re-synced
+HASHED_FIELDS = (
+    "/fields/System.Title",
+    "/fields/System.Description",
+    "/fields/Microsoft.VSTS.TCM.Steps",
+    "/fields/Microsoft.VSTS.Common.Priority",
+    "/fields/System.Tags",
+)
+
+
+def content_hash(work_item_payload: List[dict]) -> str:
+    """SHA-256 of the mapped ADO field values in a JSON-patch document"""
+    fields = {op["path"]: op.get("value") for op in work_item_payload if op.get("path") in HASHED_FIELDS}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class MigrationJournal:
+    """Durable SQLite checkpoint of migrated test cases.
+
+    Records TestRail case ID -> ADO work item ID, the target suite, the last
+    completed step, whether its attachments were linked and a content hash of
+    the mapped fields for every case, plus run-level state such as the delta
+    sync watermark and the suites each run created. Each write is committed
+    in its own transaction, so an interrupted run can be resumed from the
+    journal. All entries are mirrored in memory, making resume and
+    change checks O(1) per case.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cases (
+                testrail_case_id INTEGER PRIMARY KEY,
+                ado_work_item_id INTEGER NOT NULL,
+                suite_id INTEGER NOT NULL,
+                step TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(cases)")}
+        if "content_hash" not in columns:
+            self.conn.execute("ALTER TABLE cases ADD COLUMN content_hash TEXT")
+        if "attachments_done" not in columns:
+            # Journals written before attachments were checkpointed cannot tell; assume they were linked
+            self.conn.execute("ALTER TABLE cases ADD COLUMN attachments_done INTEGER NOT NULL DEFAULT 1")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cases_by_work_item ON cases (ado_work_item_id)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS suites (
+                suite_id INTEGER PRIMARY KEY,
+                plan_id INTEGER NOT NULL,
+                parent_id INTEGER,
+                run_id TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.entries = {}
+        self.case_by_work_item = {}
+        self.content_hashes = {}
+        self.attachments_pending = set()
+        for case_id, work_item_id, suite_id, step, digest, attachments_done in self.conn.execute(
+            "SELECT testrail_case_id, ado_work_item_id, suite_id, step, content_hash, attachments_done FROM cases"
+        ):
+            self.entries[case_id] = (work_item_id, suite_id, step)
+            self.case_by_work_item[work_item_id] = case_id
+            if digest:
+                self.content_hashes[case_id] = digest
+            if not attachments_done:
+                self.attachments_pending.add(case_id)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, testrail_case_id: int) -> Optional[Tuple[int, int, str]]:
+        """Return (work item ID, suite ID, step) for a case, or None if it was never created"""
+        return self.entries.get(testrail_case_id)
+
+    def record_created(self, testrail_case_id: int, work_item_id: int, suite_id: int,
+                       digest: Optional[str] = None, attachments_done: bool = False):
+        """Checkpoint a newly created work item; its attachments count as pending unless ``attachments_done``"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO cases "
+                    "(testrail_case_id, ado_work_item_id, suite_id, step, updated_at, content_hash, attachments_done) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (testrail_case_id, work_item_id, suite_id, STEP_CREATED, time.time(), digest, int(attachments_done))
+                )
+            self.entries[testrail_case_id] = (work_item_id, suite_id, STEP_CREATED)
+            self.case_by_work_item[work_item_id] = testrail_case_id
+            if digest:
+                self.content_hashes[testrail_case_id] = digest
+            if attachments_done:
+                self.attachments_pending.discard(testrail_case_id)
+            else:
+                self.attachments_pending.add(testrail_case_id)
+
+    def attachments_done(self, testrail_case_id: int) -> bool:
+        """Whether a created case's attachments were linked to its work item"""
+        return testrail_case_id not in self.attachments_pending
+
+    def record_attachments_done(self, testrail_case_id: int):
+        """Checkpoint that a case's attachments are linked to its work item"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute(
+                    "UPDATE cases SET attachments_done = 1, updated_at = ? WHERE testrail_case_id = ?",
+                    (time.time(), testrail_case_id)
+                )
+            self.attachments_pending.discard(testrail_case_id)
+
+    def content_hash(self, testrail_case_id: int) -> Optional[str]:
+        """Return the content hash last synced for a case"""
+        return self.content_hashes.get(testrail_case_id)
+
+    def record_content_hash(self, testrail_case_id: int, digest: str):
+        """Checkpoint the content hash of a case after its work item was updated"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute(
+                    "UPDATE cases SET content_hash = ?, updated_at = ? WHERE testrail_case_id = ?",
+                    (digest, time.time(), testrail_case_id)
+                )
+            self.content_hashes[testrail_case_id] = digest
+
+    def get_state(self, key: str) -> Optional[str]:
+        """Return a run-level value such as the last sync watermark"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str):
+        """Store a run-level value"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (key, value))
+
+    def states(self, prefix: str) -> Dict[str, str]:
+        """Return every run-level value whose key starts with ``prefix``"""
+        with self.lock:
+            rows = self.conn.execute("SELECT key, value FROM sync_state WHERE substr(key, 1, ?) = ?",
+                                     (len(prefix), prefix)).fetchall()
+        return dict(rows)
+
+    def record_suite_created(self, suite_id: int, plan_id: int, parent_id: Optional[int], run_id: str):
+        """Checkpoint a suite created by the run ``run_id``"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute("INSERT OR REPLACE INTO suites VALUES (?, ?, ?, ?, ?)",
+                                  (suite_id, plan_id, parent_id, run_id, time.time()))
+
+    def created_suites(self, run_id: str) -> Dict[int, Tuple[int, Optional[int]]]:
+        """Return suite ID -> (plan ID, parent suite ID) for every suite the run ``run_id`` created"""
+        with self.lock:
+            rows = self.conn.execute("SELECT suite_id, plan_id, parent_id FROM suites WHERE run_id = ?",
+                                     (run_id,)).fetchall()
+        return {suite_id: (plan_id, parent_id) for suite_id, plan_id, parent_id in rows}
+
+    def forget_suites(self, suite_ids: Iterable[int]):
+        """Drop the checkpoints of deleted suites"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany("DELETE FROM suites WHERE suite_id = ?", ((suite_id,) for suite_id in suite_ids))
+
+    def forget_work_items(self, work_item_ids: Iterable[int]):
+        """Drop the checkpoints of deleted work items, so their cases are migrated again"""
+        with self.lock:
+            case_ids = [self.case_by_work_item.pop(wid) for wid in work_item_ids if wid in self.case_by_work_item]
+            if not case_ids:
+                return
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany("DELETE FROM cases WHERE testrail_case_id = ?", ((case_id,) for case_id in case_ids))
+            for case_id in case_ids:
+                self.entries.pop(case_id, None)
+                self.content_hashes.pop(case_id, None)
+                self.attachments_pending.discard(case_id)
+
+    def record_in_suite(self, work_item_ids: Iterable[int], suite_id: int):
+        """Checkpoint suite membership for work items in one transaction"""
+        case_ids = [self.case_by_work_item[wid] for wid in work_item_ids if wid in self.case_by_work_item]
+        if not case_ids:
+            return
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany(
+                    "UPDATE cases SET step = ?, suite_id = ?, updated_at = ? WHERE testrail_case_id = ?",
+                    [(STEP_IN_SUITE, suite_id, now, case_id) for case_id in case_ids]
+                )
+            for case_id in case_ids:
+                work_item_id, _, _ = self.entries[case_id]
+                self.entries[case_id] = (work_item_id, suite_id, STEP_IN_SUITE)
+
+    def work_item_ids(self) -> List[int]:
+        """Return every migrated work item"""
+        return sorted(self.case_by_work_item)
+
+    def suite_ids(self) -> List[int]:
+        """Return every suite holding a migrated work item"""
+        return sorted({suite_id for _, suite_id, _ in self.entries.values()})
+
+    def pending_suite_additions(self) -> Dict[int, List[int]]:
+        """Return work items that were created but never added to their suite, by suite"""
+        pending = {}
+        for work_item_id, suite_id, step in self.entries.values():
+            if step == STEP_CREATED:
+                pending.setdefault(suite_id, []).append(work_item_id)
+        return pending
+
+    def reset(self):
+        """Discard every case checkpoint and run-level value.
+
+        Created suites are kept, so older runs can still be rolled back.
+        """
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute("DELETE FROM cases")
+                self.conn.execute("DELETE FROM sync_state")
+            self.entries.clear()
+            self.case_by_work_item.clear()
+            self.content_hashes.clear()
+            self.attachments_pending.clear()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
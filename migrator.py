@@ -24,44 +24,49 @@ ado_headers = {
     'Content-Type': 'application/json'
 }
 
+# Keep-alive sessions reuse one TCP+TLS connection per host; auth is attached once
+testrail_session = requests.Session()
+testrail_session.auth = testrail_auth
+testrail_session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+
+ado_session = requests.Session()
+ado_session.auth = ado_auth
+ado_session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+
 def normalize_suite_name(name):
     return name.strip().lower()
 
-print("Fetching sections from TestRail...")
-sections_response = requests.get(
-    f'{TESTRAIL_URL}index.php?/api/v2/get_sections/{TESTRAIL_PROJECT_ID}&suite_id={TESTRAIL_SUITE_ID}',
-    auth=testrail_auth
-)
+# TestRail returns at most 250 rows per page; follow _links.next to collect all of them
+def fetch_testrail_pages(endpoint, key):
+    url = f'{TESTRAIL_URL}index.php?/api/v2/{endpoint}&limit=250'
+    items = []
+    while url:
+        response = testrail_session.get(url)
 
-try:
-    sections_data = sections_response.json()
-except Exception as e:
-    print(f"❌ Error decoding TestRail sections response: {e}\n{sections_response.text}")
-    exit(1)
-
-if isinstance(sections_data, dict) and sections_data.get("error"):
-    print(f"❌ Error fetching sections: {sections_data['error']}")
-    exit(1)
+        try:
+            data = response.json()
+        except Exception as e:
+            print(f"❌ Error decoding TestRail {key} response: {e}\n{response.text}")
+            exit(1)
 
-sections = sections_data.get("sections", sections_data if isinstance(sections_data, list) else [])
+        if isinstance(data, dict) and data.get("error"):
+            print(f"❌ Error fetching {key}: {data['error']}")
+            exit(1)
 
-print("Fetching test cases from TestRail...")
-cases_response = requests.get(
-    f'{TESTRAIL_URL}index.php?/api/v2/get_cases/{TESTRAIL_PROJECT_ID}&suite_id={TESTRAIL_SUITE_ID}',
-    auth=testrail_auth
-)
+        if isinstance(data, list):
+            # Older TestRail versions return an unpaginated list
+            return items + data
 
-try:
-    cases_data = cases_response.json()
-except Exception as e:
-    print(f"❌ Error decoding TestRail cases response: {e}\n{cases_response.text}")
-    exit(1)
+        items.extend(data.get(key, []))
+        next_link = (data.get('_links') or {}).get('next')
+        url = f"{TESTRAIL_URL}index.php?/{next_link.lstrip('/')}" if next_link else None
+    return items
 
-if isinstance(cases_data, dict) and cases_data.get('error'):
-    print(f"❌ Error fetching test cases: {cases_data['error']}")
-    exit(1)
+print("Fetching sections from TestRail...")
+sections = fetch_testrail_pages(f'get_sections/{TESTRAIL_PROJECT_ID}&suite_id={TESTRAIL_SUITE_ID}', 'sections')
 
-cases = cases_data.get("cases", [])
+print("Fetching test cases from TestRail...")
+cases = fetch_testrail_pages(f'get_cases/{TESTRAIL_PROJECT_ID}&suite_id={TESTRAIL_SUITE_ID}', 'cases')
 
 cases_by_section = {}
 for case in cases:
@@ -73,7 +78,7 @@ existing_suites = {}
 
 def fetch_all_suites(parent_id):
     url = f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{ADO_PLAN_ID}/suites/{parent_id}/suites?api-version=6.0"
-    response = requests.get(url, auth=ado_auth)
+    response = ado_session.get(url)
     try:
         suites = response.json().get("value", [])
         for suite in suites:
@@ -99,9 +104,8 @@ for section in sections:
         print(f"✅ Using existing test suite: {section_name} (ID: {new_suite_id})")
     else:
         print(f"Creating test suite for section: {section_name}")
-        suite_response = requests.post(
+        suite_response = ado_session.post(
             f'https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{ADO_PLAN_ID}/suites/{ADO_STATIC_SUITE_PARENT_ID}/suites?api-version=6.0',
-            auth=ado_auth,
             headers=ado_headers,
             json={"name": section_name, "suiteType": "StaticTestSuite"}
         )
@@ -144,9 +148,8 @@ for section in sections:
             {"op": "add", "path": "/fields/Microsoft.VSTS.Common.Priority", "value": priority}
         ]
 
-        work_item_response = requests.post(
+        work_item_response = ado_session.post(
             f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/workitems/$Test%20Case?api-version=6.0",
-            auth=ado_auth,
             headers={"Content-Type": "application/json-patch+json"},
             json=work_item_payload
         )
@@ -166,9 +169,8 @@ for section in sections:
 
             print(f"✅ Created test case: https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_workitems/edit/{test_case_id}")
 
-            add_to_suite_response = requests.post(
+            add_to_suite_response = ado_session.post(
                 f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{ADO_PLAN_ID}/suites/{new_suite_id}/testcases/{test_case_id}?api-version=6.0",
-                auth=ado_auth,
                 headers=ado_headers
             )
 
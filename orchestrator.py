@@ -0,0 +1,130 @@
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+from testrail_to_ado_migration import TestRailMigrator, logger
+
+# Default number of suites migrated at the same time
+DEFAULT_WORKERS = 4
+
+# Fields every manifest entry must provide
+REQUIRED_FIELDS = ('testrail_project_id', 'testrail_suite_id', 'ado_plan_id', 'ado_parent_suite_id')
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """Load and validate a manifest of TestRail suite -> ADO plan mappings.
+
+    The manifest is a JSON object::
+
+        {
+            "workers": 4,
+            "migrations": [
+                {"name": "Checkout", "testrail_project_id": 1, "testrail_suite_id": 2,
+                 "ado_plan_id": 3, "ado_parent_suite_id": 4}
+            ]
+        }
+    """
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    migrations = manifest.get('migrations', [])
+    for index, spec in enumerate(migrations):
+        missing = [field for field in REQUIRED_FIELDS if field not in spec]
+        if missing:
+            raise ValueError(f"Manifest entry {index} is missing {', '.join(missing)}")
+        spec.setdefault('name', f"suite-{spec['testrail_suite_id']}")
+        spec.setdefault('journal_path', f"migration_journal.{spec['testrail_project_id']}-{spec['testrail_suite_id']}.sqlite3")
+        spec.setdefault('metrics_path', f"migration_metrics.{spec['testrail_project_id']}-{spec['testrail_suite_id']}.json")
+    return manifest
+
+
+def run_migration(spec: Dict[str, Any], rate_share: float, resume: bool, delta: bool) -> Dict[str, Any]:
+    """Migrate one suite in a worker process and return its totals"""
+    started = time.time()
+    migrator = TestRailMigrator(
+        resume=resume,
+        delta=delta,
+        testrail_project_id=spec['testrail_project_id'],
+        testrail_suite_id=spec['testrail_suite_id'],
+        ado_plan_id=spec['ado_plan_id'],
+        ado_parent_suite_id=spec['ado_parent_suite_id'],
+        journal_path=spec['journal_path'],
+        rate_share=rate_share,
+        metrics_path=spec['metrics_path']
+    )
+    totals = migrator.migrate()
+    return {
+        'name': spec['name'],
+        'status': 'completed' if totals is not None else 'aborted',
+        'seconds': round(time.time() - started, 1),
+        **(totals or {})
+    }
+
+
+def orchestrate(migrations: List[Dict[str, Any]], workers: int, resume: bool = False,
+                delta: bool = False) -> Dict[str, Any]:
+    """Run every migration in a process pool and combine their totals.
+
+    Each worker process gets an equal share of the configured TestRail and ADO
+    request rates, so the pool as a whole never exceeds the global limits.
+    """
+    workers = max(1, min(workers, len(migrations)))
+    rate_share = 1.0 / workers
+    started = time.time()
+    results = []
+
+    logger.info(f"Migrating {len(migrations)} suites with {workers} workers")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_migration, spec, rate_share, resume, delta): spec for spec in migrations}
+        for done, future in enumerate(as_completed(futures), 1):
+            spec = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"❌ Migration of '{spec['name']}' failed: {e}")
+                result = {'name': spec['name'], 'status': 'failed', 'error': str(e)}
+            results.append(result)
+
+            elapsed = time.time() - started
+            eta = elapsed / done * (len(migrations) - done)
+            logger.info(f"[{done}/{len(migrations)}] {result['name']}: {result['status']}, "
+                        f"created {result.get('created', 0)}, failed {result.get('failed', 0)} "
+                        f"(elapsed {elapsed:.0f}s, ETA {eta:.0f}s)")
+
+    totals = {key: sum(result.get(key, 0) for result in results)
+              for key in ('created', 'updated', 'failed', 'skipped', 'suite_rejections', 'attachments', 'sections')}
+    return {
+        'suites': len(migrations),
+        'completed': sum(1 for result in results if result['status'] == 'completed'),
+        'seconds': round(time.time() - started, 1),
+        'totals': totals,
+        'migrations': sorted(results, key=lambda result: result['name'])
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate many TestRail suites to Azure DevOps in parallel")
+    parser.add_argument('manifest', help="JSON manifest of suite -> plan mappings")
+    parser.add_argument('--workers', type=int, help=f"parallel suite migrations (default: manifest value or {DEFAULT_WORKERS})")
+    parser.add_argument('--resume', action='store_true', help="resume each suite from its journal")
+    parser.add_argument('--delta', action='store_true', help="run a delta sync for each suite")
+    parser.add_argument('--report', default='migration_summary.json', help="where to write the combined summary")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    summary = orchestrate(
+        manifest['migrations'],
+        args.workers or manifest.get('workers', DEFAULT_WORKERS),
+        resume=args.resume,
+        delta=args.delta
+    )
+
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    logger.info(f"\n✅ Orchestrated migration complete: {summary['completed']}/{summary['suites']} suites")
+    for key, value in summary['totals'].items():
+        logger.info(f"Total {key.replace('_', ' ')}: {value}")
+    logger.info(f"Summary written to {args.report}")
@@ -0,0 +1,77 @@
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Seconds per unit of a TestRail timespan such as "1h 30m 5s"
+TIMESPAN_UNITS = {'w': 7 * 24 * 3600, 'd': 24 * 3600, 'h': 3600, 'm': 60, 's': 1}
+TIMESPAN_PART = re.compile(r"(\d+(?:\.\d+)?)\s*([wdhms])", re.IGNORECASE)
+
+
+def parse_timespan(elapsed: Optional[str]) -> Optional[float]:
+    """Convert a TestRail timespan ("1h 30m 5s", "45s") to seconds"""
+    if not elapsed:
+        return None
+    parts = TIMESPAN_PART.findall(str(elapsed))
+    if not parts:
+        return None
+    return sum(float(value) * TIMESPAN_UNITS[unit.lower()] for value, unit in parts)
+
+
+def iso_timestamp(timestamp: Optional[float]) -> Optional[str]:
+    """Format a UNIX timestamp as the UTC ISO 8601 date ADO expects"""
+    if timestamp is None:
+        return None
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(timestamp))
+
+
+class TestPointIndex:
+    """Lookup table of ADO test points by (suite ID, test case work item ID).
+
+    Built once per migration from the plan's suites, so every TestRail result
+    resolves to its test point without a query of its own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.points: Dict[Tuple[int, int], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def add(self, point_id: int, work_item_id: int, suite_id: int):
+        """Index a test point; the first point of a test case (its first configuration) wins"""
+        with self.lock:
+            self.points.setdefault((int(suite_id), int(work_item_id)), int(point_id))
+
+    def lookup(self, work_item_id: int, suite_id: int) -> Optional[int]:
+        return self.points.get((int(suite_id), int(work_item_id)))
+
+
+def build_result(result: dict, title: str, work_item_id: int, point_id: int,
+                 outcome_mapping: Dict[Optional[int], str]) -> dict:
+    """Map a TestRail result to an entry for ADO's test run results API"""
+    elapsed = parse_timespan(result.get('elapsed'))
+    completed_on = result.get('created_on')
+    comment_parts = []
+    if result.get('comment'):
+        comment_parts.append(str(result['comment']))
+    if result.get('defects'):
+        comment_parts.append(f"Defects: {result['defects']}")
+    if result.get('version'):
+        comment_parts.append(f"Version: {result['version']}")
+
+    entry = {
+        "testCaseTitle": title,
+        "testCase": {"id": str(work_item_id)},
+        "testPoint": {"id": str(point_id)},
+        "outcome": outcome_mapping.get(result.get('status_id'), "None"),
+        "state": "Completed",
+        "comment": "\n".join(comment_parts)[:1000],
+    }
+    if elapsed is not None:
+        entry["durationInMs"] = int(elapsed * 1000)
+    if completed_on is not None:
+        entry["completedDate"] = iso_timestamp(completed_on)
+        entry["startedDate"] = iso_timestamp(completed_on - (elapsed or 0))
+    return entry
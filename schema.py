@@ -0,0 +1,220 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# TestRail custom field types (get_case_fields type_id)
+FIELD_TYPE_CHECKBOX = 5
+FIELD_TYPE_DROPDOWN = 6
+FIELD_TYPE_USER = 7
+FIELD_TYPE_MILESTONE = 9
+FIELD_TYPE_STEPS = 10
+FIELD_TYPE_STEP_RESULTS = 11
+FIELD_TYPE_MULTI_SELECT = 12
+
+# Custom fields the migrator maps explicitly, or that hold IDs with nothing useful to show
+MAPPED_CUSTOM_FIELDS = ('custom_preconds', 'custom_expected', 'custom_steps', 'custom_steps_separated',
+                        'custom_case_automated')
+SKIPPED_FIELD_TYPES = (FIELD_TYPE_USER, FIELD_TYPE_MILESTONE, FIELD_TYPE_STEPS, FIELD_TYPE_STEP_RESULTS)
+
+# Longest value ADO accepts in a single-line string field
+ADO_STRING_FIELD_LENGTH = 255
+
+
+def parse_options(items: Optional[str]) -> Dict[int, str]:
+    """Parse TestRail dropdown options ("1, Yes\\n2, No") into {id: label}"""
+    options = {}
+    for line in (items or '').splitlines():
+        key, _, label = line.partition(',')
+        try:
+            options[int(key.strip())] = label.strip()
+        except ValueError:
+            continue
+    return options
+
+
+class SchemaCache:
+    """Field definitions fetched from TestRail and ADO, kept in one JSON file.
+
+    Each entry records when it was fetched; ``load`` ignores entries older
+    than ``ttl`` seconds (a ``ttl`` of None accepts any age).
+    """
+
+    def __init__(self, path: str, ttl: Optional[float]):
+        self.path = path
+        self.ttl = ttl
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def load(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if not entry or (self.ttl is not None and time.time() - entry['fetched_at'] > self.ttl):
+            return None
+        return entry['data']
+
+    def store(self, key: str, data: Any):
+        """Record an entry and rewrite the file atomically"""
+        self.entries[key] = {'fetched_at': time.time(), 'data': data}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        partial_path = f"{self.path}.{os.getpid()}.partial"
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(partial_path, self.path)
+
+
+class CaseFieldLabels:
+    """How TestRail case types and unmapped custom fields are shown in a work item description.
+
+    Sent to the transform worker processes, so it holds only plain tables.
+    """
+
+    def __init__(self, case_types: Dict[int, str], custom_fields: List[Tuple[str, str, int, Dict[int, str]]]):
+        self.case_types = case_types
+        self.custom_fields = custom_fields
+
+    def describe(self, case: dict) -> List[Tuple[str, str]]:
+        """Return (label, text) pairs for a case's type and custom field values"""
+        described = []
+        case_type = self.case_types.get(case.get('type_id'))
+        if case_type:
+            described.append(('Type', case_type))
+        for system_name, label, type_id, options in self.custom_fields:
+            value = case.get(system_name)
+            if value is None or value == '' or value == []:
+                continue
+            if type_id == FIELD_TYPE_CHECKBOX:
+                text = 'Yes' if value else 'No'
+            elif type_id == FIELD_TYPE_DROPDOWN:
+                text = options.get(value, str(value))
+            elif type_id == FIELD_TYPE_MULTI_SELECT and isinstance(value, list):
+                text = ', '.join(options.get(item, str(item)) for item in value)
+            else:
+                text = str(value)
+            described.append((label, text))
+        return described
+
+
+class TestRailSchema:
+    """TestRail case fields, priorities and case types, and the mapping tables built from them"""
+
+    def __init__(self, data: Dict[str, Any], project_id: int):
+        self.case_fields = data.get('case_fields') or []
+        self.priorities = data.get('priorities') or []
+        self.case_types = data.get('case_types') or []
+        self.project_id = project_id
+
+    def field_config(self, field: dict) -> Optional[dict]:
+        """Return the field's configuration for this project, if it applies to it"""
+        for config in field.get('configs') or []:
+            context = config.get('context') or {}
+            if context.get('is_global') or self.project_id in (context.get('project_ids') or []):
+                return config
+        return None
+
+    def custom_field(self, system_name: str) -> Optional[dict]:
+        for field in self.case_fields:
+            if field.get('system_name') == system_name and field.get('is_active', True):
+                return field
+        return None
+
+    def priority_mapping(self, ado_priorities: List[int], default: Dict[int, int]) -> Dict[int, int]:
+        """Map TestRail priority IDs onto ADO priorities, most important to most important.
+
+        TestRail ranks priorities by ``priority`` (higher is more important);
+        ADO ranks them by value (1 is most important). With more TestRail
+        priorities than ADO values, neighbouring ranks share a value.
+        """
+        if not self.priorities or not ado_priorities:
+            return default
+        ranked = sorted(self.priorities, key=lambda priority: priority.get('priority', 0), reverse=True)
+        values = sorted(ado_priorities)
+        return {priority['id']: values[index * len(values) // len(ranked)] for index, priority in enumerate(ranked)}
+
+    def automation_status_mapping(self, default: Dict[int, str]) -> Dict[int, str]:
+        """Map the automation status dropdown's option IDs to their labels"""
+        field = self.custom_field('custom_case_automated')
+        config = self.field_config(field) if field else None
+        options = parse_options(((config or {}).get('options') or {}).get('items'))
+        return options or default
+
+    def field_labels(self) -> CaseFieldLabels:
+        """Build the labels of this project's case types and unmapped custom fields"""
+        custom_fields = []
+        for field in self.case_fields:
+            system_name = field.get('system_name') or ''
+            if (not system_name.startswith('custom_') or system_name in MAPPED_CUSTOM_FIELDS
+                    or field.get('type_id') in SKIPPED_FIELD_TYPES or not field.get('is_active', True)):
+                continue
+            config = self.field_config(field)
+            if config is None:
+                continue
+            custom_fields.append((system_name, field.get('label') or field.get('name') or system_name,
+                                  field.get('type_id'), parse_options((config.get('options') or {}).get('items'))))
+        return CaseFieldLabels({case_type['id']: case_type.get('name') for case_type in self.case_types},
+                               custom_fields)
+
+
+class WorkItemSchema:
+    """Field definitions of an ADO work item type, used to check JSON-patch documents before they are sent"""
+
+    def __init__(self, data: Dict[str, Any]):
+        types = {field['referenceName']: field for field in data.get('fields') or []}
+        self.fields: Dict[str, dict] = {}
+        self.allowed: Dict[str, set] = {}
+        self.required: List[str] = []
+        for field in data.get('type_fields') or []:
+            name = field['referenceName']
+            self.fields[name] = dict(types.get(name, {}), **field)
+            if field.get('allowedValues'):
+                self.allowed[name] = {str(value) for value in field['allowedValues']}
+            # System fields are filled in by ADO itself; only the title must come from the payload
+            if field.get('alwaysRequired') and field.get('defaultValue') in (None, '') and (
+                    name == 'System.Title' or not name.startswith('System.')):
+                self.required.append(name)
+
+    def __bool__(self) -> bool:
+        return bool(self.fields)
+
+    def allowed_values(self, name: str) -> List[str]:
+        return sorted(self.allowed.get(name, ()))
+
+    def validate(self, payload: List[dict]) -> List[str]:
+        """Return every problem ADO would reject the payload for; an empty list means it looks valid"""
+        if not self.fields:
+            return []
+        problems = []
+        present = set()
+        for operation in payload:
+            path = operation.get('path', '')
+            if not path.startswith('/fields/'):
+                continue
+            name = path[len('/fields/'):]
+            value = operation.get('value')
+            present.add(name)
+            field = self.fields.get(name)
+            if field is None:
+                problems.append(f"{name} is not a field of this work item type")
+                continue
+            if field.get('readOnly'):
+                problems.append(f"{name} is read-only")
+            if field.get('alwaysRequired') and value in (None, ''):
+                problems.append(f"{name} is required")
+            if name in self.allowed and str(value) not in self.allowed[name]:
+                problems.append(f"{name} value {value!r} is not one of {self.allowed_values(name)}")
+            field_type = field.get('type')
+            if field_type == 'integer' and not isinstance(value, int):
+                try:
+                    int(value)
+                except (TypeError, ValueError):
+                    problems.append(f"{name} value {value!r} is not an integer")
+            elif field_type == 'string' and value is not None and len(str(value)) > ADO_STRING_FIELD_LENGTH:
+                problems.append(f"{name} is {len(str(value))} characters long; at most {ADO_STRING_FIELD_LENGTH} are allowed")
+        for name in self.required:
+            if name not in present:
+                problems.append(f"{name} is required")
+        return problems
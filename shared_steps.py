@@ -0,0 +1,263 @@
+import hashlib
+import json
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from transform import SHARED_STEPS_RELATION, SHARED_STEPS_TEMPLATE, step_xml, steps_xml
+
+Step = Tuple[str, str]
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Collapse whitespace so steps that differ only in layout match"""
+    return ' '.join(str(text or '').split())
+
+
+def step_digest(action: str, expected: str) -> bytes:
+    """Identify a step by its normalized action and expected result"""
+    key = f"{normalize_text(action)}\x1f{normalize_text(expected)}".encode('utf-8')
+    return hashlib.blake2b(key, digest_size=16).digest()
+
+
+def block_digest(step_digests: Iterable[bytes]) -> bytes:
+    """Identify a sequence of steps by the digests of its steps"""
+    return hashlib.blake2b(b''.join(step_digests), digest_size=16).digest()
+
+
+class SharedBlock:
+    """A run of steps repeated across enough cases to become a Shared Steps work item"""
+
+    __slots__ = ('digest', 'steps', 'uses', 'work_item_id')
+
+    def __init__(self, digest: bytes, steps: Tuple[Step, ...], uses: int = 0):
+        self.digest = digest
+        self.steps = steps
+        self.uses = uses
+        self.work_item_id: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        return self.digest.hex()
+
+    def title(self) -> str:
+        return f"Shared steps: {normalize_text(self.steps[0][0])[:120] or self.key[:12]}"
+
+
+class SharedStepsPlan:
+    """The step blocks to replace with Shared Steps references, and the work items holding them.
+
+    Sent to the transform worker processes with every batch, so it only holds
+    the blocks' digests and work item IDs. Blocks without a work item (never
+    created, or not yet) are left inline.
+    """
+
+    def __init__(self, blocks: List[SharedBlock], work_item_url_prefix: str = ''):
+        self.blocks = blocks
+        self.work_item_url_prefix = work_item_url_prefix
+        self.refs: Dict[bytes, int] = {}
+        self.lengths: List[int] = []
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Workers only substitute; the block steps stay in the parent
+        return {'blocks': [], 'work_item_url_prefix': self.work_item_url_prefix,
+                'refs': self.refs, 'lengths': self.lengths}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+    def link(self, block: SharedBlock, work_item_id: int):
+        """Reference ``block`` through the Shared Steps work item ``work_item_id`` from now on"""
+        block.work_item_id = work_item_id
+        self.refs[block.digest] = work_item_id
+        self.lengths = sorted({len(b.steps) for b in self.blocks if b.digest in self.refs}, reverse=True)
+
+    def work_item_url(self, work_item_id: int) -> str:
+        return f"{self.work_item_url_prefix}{work_item_id}"
+
+    def substitute(self, steps: List[Step]) -> List[Union[Step, int]]:
+        """Replace linked blocks in ``steps``, longest match first, by their work item IDs"""
+        if not self.refs or len(steps) < self.lengths[-1]:
+            return steps
+        digests = [step_digest(action, expected) for action, expected in steps]
+        result = []
+        position = 0
+        while position < len(steps):
+            for length in self.lengths:
+                if position + length <= len(steps):
+                    ref = self.refs.get(block_digest(digests[position:position + length]))
+                    if ref is not None:
+                        result.append(ref)
+                        position += length
+                        break
+            else:
+                result.append(steps[position])
+                position += 1
+        return result
+
+    def work_item_payload(self, block: SharedBlock, tag: str) -> List[dict]:
+        """JSON-patch document that creates the Shared Steps work item for ``block``.
+
+        It is tagged with ``tag`` and with ``tag`` followed by the block's key,
+        so a later run can find it again.
+        """
+        return [
+            {"op": "add", "path": "/fields/System.Title", "value": block.title()},
+            {"op": "add", "path": "/fields/Microsoft.VSTS.TCM.Steps", "value": steps_xml(list(block.steps))},
+            {"op": "add", "path": "/fields/System.Tags", "value": f"{tag}; {tag}:{block.key}"},
+        ]
+
+    def report(self, tag: str = '', linked_only: bool = True) -> Dict[str, Any]:
+        """Estimate what extracting the blocks saves.
+
+        Per use, a block saves its inline steps XML minus the reference and
+        the link that replace it. The Shared Steps work items and the request
+        creating each one are counted against that. Unless ``linked_only`` is
+        false, blocks without a work item are left out.
+        """
+        entries = []
+        for block in self.blocks:
+            if linked_only and block.work_item_id is None:
+                continue
+            work_item_id = block.work_item_id or 0
+            inline = sum(len(step_xml(1, action, expected)) for action, expected in block.steps)
+            reference = len(SHARED_STEPS_TEMPLATE(id=1, ref=work_item_id)) + len(json.dumps({
+                "op": "add", "path": "/relations/-",
+                "value": {"rel": SHARED_STEPS_RELATION, "url": self.work_item_url(work_item_id)}
+            }))
+            cost = len(json.dumps(self.work_item_payload(block, tag)))
+            entries.append({
+                'key': block.key,
+                'work_item_id': block.work_item_id,
+                'title': block.title(),
+                'steps': len(block.steps),
+                'uses': block.uses,
+                'bytes_saved': block.uses * (inline - reference) - cost,
+            })
+        return {
+            'shared_steps': len(entries),
+            'steps_deduplicated': sum(entry['uses'] * entry['steps'] for entry in entries),
+            'bytes_saved': sum(entry['bytes_saved'] for entry in entries),
+            'requests_added': len(entries),
+            'blocks': sorted(entries, key=lambda entry: entry['bytes_saved'], reverse=True),
+        }
+
+
+class SharedStepsAnalyzer:
+    """Finds step blocks repeated across a TestRail export.
+
+    Every distinct step (after whitespace normalization) is interned once;
+    each case keeps only the sequence of its step numbers. ``plan`` then
+    counts, per case, every block of ``min_steps`` to ``max_steps`` steps made
+    only of steps that occur in at least ``min_uses`` cases, and picks the
+    blocks used by at least ``min_uses`` cases, preferring longer ones.
+    Common setup prefixes are the typical result.
+    """
+
+    def __init__(self, min_uses: int, min_steps: int = 2, max_steps: int = 10):
+        self.min_uses = max(2, min_uses)
+        self.min_steps = max(1, min_steps)
+        self.max_steps = max(self.min_steps, max_steps)
+        self.step_numbers: Dict[bytes, int] = {}
+        self.step_digests: List[bytes] = []
+        self.step_texts: List[Step] = []
+        self.step_uses = array('I')
+        self.sequences: List[array] = []
+        self.cases = 0
+
+    def add(self, steps: List[Step]):
+        """Record one case's steps"""
+        self.cases += 1
+        sequence = array('I')
+        for action, expected in steps:
+            digest = step_digest(action, expected)
+            number = self.step_numbers.get(digest)
+            if number is None:
+                number = self.step_numbers[digest] = len(self.step_texts)
+                self.step_digests.append(digest)
+                self.step_texts.append((action, expected))
+                self.step_uses.append(0)
+            sequence.append(number)
+        for number in set(sequence):
+            self.step_uses[number] += 1
+        if len(sequence) >= self.min_steps:
+            self.sequences.append(sequence)
+
+    def frequent_runs(self, sequence: array) -> Iterable[array]:
+        """Split a case's steps into runs of steps frequent enough to be shared"""
+        start = 0
+        for position, number in enumerate(sequence):
+            if self.step_uses[number] < self.min_uses:
+                if position - start >= self.min_steps:
+                    yield sequence[start:position]
+                start = position + 1
+        if len(sequence) - start >= self.min_steps:
+            yield sequence[start:]
+
+    def candidates(self) -> Counter:
+        """Count, once per case, every block that could be shared"""
+        counts = Counter()
+        for sequence in self.sequences:
+            blocks = set()
+            for run in self.frequent_runs(sequence):
+                for start in range(len(run) - self.min_steps + 1):
+                    for length in range(self.min_steps, min(self.max_steps, len(run) - start) + 1):
+                        blocks.add(tuple(run[start:start + length]))
+            counts.update(blocks)
+        return counts
+
+    def apply(self, selected: Dict[Tuple[int, ...], int]) -> Counter:
+        """Count how many cases each selected block replaces steps in, matching longest first"""
+        lengths = sorted({len(block) for block in selected}, reverse=True)
+        uses = Counter()
+        for sequence in self.sequences:
+            used = set()
+            steps = tuple(sequence)
+            position = 0
+            while position < len(steps):
+                for length in lengths:
+                    block = steps[position:position + length]
+                    if len(block) == length and block in selected:
+                        used.add(block)
+                        position += length
+                        break
+                else:
+                    position += 1
+            uses.update(used)
+        return uses
+
+    def plan(self, work_item_url_prefix: str = '') -> SharedStepsPlan:
+        counts = self.candidates()
+        ordered = sorted((block for block, uses in counts.items() if uses >= self.min_uses),
+                         key=lambda block: (len(block), counts[block]), reverse=True)
+
+        # A block is dropped when the longer blocks already chosen cover all but a few of its uses
+        selected: Dict[Tuple[int, ...], int] = {}
+        for block in ordered:
+            covered = sum(uses for chosen, uses in selected.items() if contains(chosen, block))
+            if counts[block] - covered >= self.min_uses:
+                selected[block] = counts[block]
+
+        # Matching longest first leaves some blocks with fewer uses than counted; drop those
+        while selected:
+            uses = self.apply(selected)
+            kept = {block: uses[block] for block in selected if uses[block] >= self.min_uses}
+            if len(kept) == len(selected):
+                selected = kept
+                break
+            selected = kept
+
+        blocks = [
+            SharedBlock(block_digest(self.step_digests[number] for number in block),
+                        tuple(self.step_texts[number] for number in block), uses)
+            for block, uses in sorted(selected.items(), key=lambda item: item[1] * len(item[0]), reverse=True)
+        ]
+        return SharedStepsPlan(blocks, work_item_url_prefix)
+
+
+def contains(outer: Tuple[int, ...], inner: Tuple[int, ...]) -> bool:
+    """Whether ``inner`` is a contiguous part of ``outer``"""
+    return any(outer[start:start + len(inner)] == inner for start in range(len(outer) - len(inner) + 1))
@@ -0,0 +1,214 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import multiprocessing.util
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+# Record attributes copied into every JSON line when a log call sets them through ``extra``
+STRUCTURED_FIELDS = ('case_id', 'suite_id', 'work_item_id', 'run_id', 'method', 'endpoint', 'status',
+                     'latency_ms', 'count')
+
+# IDs shown when a log line describes a list of them
+SAMPLE_IDS = 10
+
+# ASCII stand-ins for consoles that cannot encode the emoji used in messages
+ASCII_FALLBACKS = (('✅', '[SUCCESS]'), ('❌', '[ERROR]'), ('⚠️', '[WARNING]'))
+
+
+def sampled(**fields) -> dict:
+    """``extra`` for a high-volume, per-item info record.
+
+    Sampled records are rate limited before they reach the log queue and are
+    kept off the console.
+    """
+    fields['sampled'] = True
+    return fields
+
+
+def sample_ids(ids: Iterable, limit: int = SAMPLE_IDS) -> str:
+    """Describe a list of IDs by its first ``limit`` entries, for a log line of bounded length"""
+    ids = list(ids)
+    shown = ', '.join(str(item) for item in ids[:limit])
+    return f"{shown} and {len(ids) - limit} more" if len(ids) > limit else shown
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Passes at most ``per_second`` sampled records a second; everything else passes.
+
+    The number of records dropped since the last one let through is attached
+    to it as ``suppressed``.
+    """
+
+    def __init__(self, per_second: float):
+        super().__init__()
+        self.per_second = per_second
+        self.lock = threading.Lock()
+        self.window = 0
+        self.passed = 0
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False) or record.levelno >= logging.WARNING:
+            return True
+        with self.lock:
+            window = int(time.monotonic())
+            if window != self.window:
+                self.window = window
+                self.passed = 0
+            if self.passed >= self.per_second:
+                self.suppressed += 1
+                return False
+            self.passed += 1
+            record.suppressed, self.suppressed = self.suppressed, 0
+        return True
+
+
+class ConsoleFilter(logging.Filter):
+    """Keeps sampled per-item records off the console"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or not getattr(record, 'sampled', False)
+
+
+class SafeStreamHandler(logging.StreamHandler):
+    """Console handler that falls back to ASCII when the stream cannot encode a message"""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            message = self.format(record)
+            try:
+                self.stream.write(message + self.terminator)
+            except UnicodeEncodeError:
+                for symbol, text in ASCII_FALLBACKS:
+                    message = message.replace(symbol, text)
+                self.stream.write(message.encode('ascii', 'replace').decode('ascii') + self.terminator)
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler whose records are written by a background listener thread.
+
+    The listener is restarted in a forked worker process, whose copy of the
+    handler would otherwise enqueue records nobody writes.
+    """
+
+    def __init__(self, *handlers: logging.Handler):
+        super().__init__(queue.SimpleQueue())
+        self.handlers = handlers
+        self.pid = None
+        self.listener = None
+        self.start_listener()
+
+    def start_listener(self):
+        self.queue = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+        self.pid = os.getpid()
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.pid != os.getpid():
+            self.start_listener()
+            # Worker processes skip atexit handlers, but run multiprocessing finalizers
+            multiprocessing.util.Finalize(self, self.stop, exitpriority=10)
+        super().enqueue(record)
+
+    def stop(self):
+        """Write out every queued record and stop the listener"""
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+
+
+def configure_logging(log_path: str, sampled_per_second: float = 20,
+                      level: int = logging.INFO) -> BackgroundQueueHandler:
+    """Route all logging through a queue to a JSONL file and the console.
+
+    Callers only format and enqueue a record; a background thread writes it.
+    The console shows plain text without sampled per-item records, and the
+    file gets every record as JSON. Warnings and errors are never sampled.
+    """
+    file_handler = logging.FileHandler(log_path, encoding='utf-8')
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    console_handler = SafeStreamHandler()
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    console_handler.addFilter(ConsoleFilter())
+
+    handler = BackgroundQueueHandler(file_handler, console_handler)
+    handler.addFilter(SamplingFilter(sampled_per_second))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    atexit.register(handler.stop)
+    return handler
+
+
+class ConsoleProgress:
+    """Redraws a one-line progress summary on the console every ``interval`` seconds.
+
+    On a terminal the line is rewritten in place; otherwise it is logged.
+    """
+
+    def __init__(self, render: Callable[[], str], interval: float = 5.0,
+                 logger: Optional[logging.Logger] = None):
+        self.render = render
+        self.interval = interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.interactive = sys.stderr.isatty()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='console-progress', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.draw()
+
+    def draw(self):
+        line = self.render()
+        if self.interactive:
+            sys.stderr.write(f"\r\x1b[K{line}")
+            sys.stderr.flush()
+        else:
+            self.logger.info(line)
+
+    def stop(self):
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        if self.interactive:
+            sys.stderr.write("\n")
+            sys.stderr.flush()
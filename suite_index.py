@@ -0,0 +1,38 @@
+import threading
+from typing import Optional, Tuple
+
+
+def normalize_suite_name(name: str) -> str:
+    """Normalize suite name for comparison"""
+    return name.strip().lower()
+
+
+class SuiteIndex:
+    """In-memory index of a test plan's suite tree.
+
+    Suites are looked up by (normalized name, parent ID), so every lookup
+    during a migration is a dict hit instead of an ADO request.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_key = {}
+        self.names = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, key: Tuple[str, Optional[int]]) -> bool:
+        return key in self.by_key
+
+    def add(self, suite_id: int, name: str, parent_id: Optional[int]):
+        """Index a suite; children may be added before their parents"""
+        suite_id = int(suite_id)
+        parent_id = int(parent_id) if parent_id is not None else None
+        with self.lock:
+            self.by_key.setdefault((normalize_suite_name(name), parent_id), suite_id)
+            self.names[suite_id] = name
+
+    def get(self, name: str, parent_id: Optional[int]) -> Optional[int]:
+        """Return the ID of the suite with this name under the given parent"""
+        return self.by_key.get((normalize_suite_name(name), parent_id))
@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+# File name suffixes of a cache entry: the gzip-compressed pages (one raw
+# TestRail response per line) and a small JSON sidecar describing them
+PAGES_SUFFIX = ".jsonl.gz"
+META_SUFFIX = ".meta.json"
+
+
+def cache_key(endpoint: str, params: Optional[dict], base_url: str = "") -> str:
+    """Stable key of a TestRail listing request to the instance at ``base_url``"""
+    raw = json.dumps({"base_url": base_url.rstrip("/"), "endpoint": endpoint, "params": params or {}},
+                     sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class CacheWriter:
+    """Appends pages of one listing to a cache entry.
+
+    Pages go to a partial file that only replaces the entry on ``commit``, so
+    an interrupted export never leaves a truncated entry behind.
+    """
+
+    def __init__(self, cache: "TestRailCache", key: str, meta: Dict[str, Any]):
+        self.cache = cache
+        self.key = key
+        self.meta = meta
+        self.partial_path = cache.pages_path(key) + ".partial"
+        self.file = gzip.open(self.partial_path, "wt", encoding="utf-8", compresslevel=6)
+        self.pages = 0
+        self.rows = 0
+        self.max_updated_on = None
+
+    def write(self, data: Any, rows: List[dict]):
+        """Append one raw TestRail response holding ``rows``"""
+        self.file.write(json.dumps(data, separators=(",", ":")))
+        self.file.write("\n")
+        self.pages += 1
+        self.rows += len(rows)
+        for row in rows:
+            updated_on = row.get("updated_on") if isinstance(row, dict) else None
+            if updated_on is not None and (self.max_updated_on is None or updated_on > self.max_updated_on):
+                self.max_updated_on = updated_on
+
+    def commit(self):
+        """Publish the entry"""
+        self.file.close()
+        os.replace(self.partial_path, self.cache.pages_path(self.key))
+        self.meta.update(pages=self.pages, rows=self.rows, max_updated_on=self.max_updated_on,
+                         created_at=time.time())
+        with open(self.cache.meta_path(self.key), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+
+    def discard(self):
+        """Drop the partial entry"""
+        self.file.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+class TestRailCache:
+    """On-disk cache of raw TestRail listing pages.
+
+    Each entry is keyed by the TestRail instance, endpoint and parameters,
+    including the ``updated_after`` watermark of a delta request, so project
+    and suite IDs from different instances never collide. Entries are stored as
+    gzip-compressed JSONL, with a sidecar recording the newest ``updated_on`` seen.
+    Entries are read back lazily, one page at a time, so a cached suite
+    streams through the migrator just like a live export.
+    """
+
+    def __init__(self, directory: str, base_url: str = ""):
+        self.directory = directory
+        self.base_url = base_url
+        os.makedirs(directory, exist_ok=True)
+
+    def pages_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + PAGES_SUFFIX)
+
+    def meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + META_SUFFIX)
+
+    def meta(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return an entry's sidecar, or None if the entry does not exist"""
+        if not os.path.exists(self.pages_path(key)):
+            return None
+        try:
+            with open(self.meta_path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self, endpoint: str, params: Optional[dict], max_age: Optional[float] = None) -> Optional[str]:
+        """Return the key of a usable entry for a request, or None.
+
+        Entries older than ``max_age`` seconds are treated as missing.
+        """
+        key = cache_key(endpoint, params, self.base_url)
+        meta = self.meta(key)
+        if meta is None:
+            return None
+        if max_age is not None and time.time() - meta.get("created_at", 0) > max_age:
+            return None
+        return key
+
+    def read_pages(self, key: str) -> Iterator[Any]:
+        """Yield an entry's raw pages in order, decompressing one line at a time"""
+        with gzip.open(self.pages_path(key), "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def writer(self, endpoint: str, params: Optional[dict]) -> CacheWriter:
+        """Start writing a fresh entry for a request"""
+        return CacheWriter(self, cache_key(endpoint, params, self.base_url),
+                           {"base_url": self.base_url, "endpoint": endpoint, "params": params or {}})
+
+    def invalidate(self, endpoint_prefix: Optional[str] = None) -> int:
+        """Delete entries whose endpoint starts with ``endpoint_prefix`` (all if None); returns the count"""
+        removed = 0
+        if endpoint_prefix is None:
+            for name in os.listdir(self.directory):
+                if name.endswith((PAGES_SUFFIX, META_SUFFIX, ".partial")):
+                    os.remove(os.path.join(self.directory, name))
+                    removed += name.endswith(META_SUFFIX)
+            return removed
+        for name in os.listdir(self.directory):
+            if not name.endswith(META_SUFFIX):
+                continue
+            key = name[:-len(META_SUFFIX)]
+            meta = self.meta(key) or {}
+            if not str(meta.get("endpoint", "")).startswith(endpoint_prefix):
+                continue
+            for path in (self.pages_path(key), self.meta_path(key)):
+                if os.path.exists(path):
+                    os.remove(path)
+            removed += 1
+        return removed
@@ -2,8 +2,32 @@ import requests
 import json
 import time
 import logging
-import base64
-from typing import Dict, List, Optional, Any
+import argparse
+import email.utils
+import gzip
+import itertools
+import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple
+from urllib.parse import quote, urlparse
+
+from requests.adapters import HTTPAdapter
+
+from attachments import ATTACHMENT_CHUNK_SIZE, AttachmentRegistry, read_chunks, spool
+from audit import AUDITED_FIELDS, AuditReport, field_digests, payload_fields
+from case_index import MigratedCaseIndex, parse_testrail_case_id
+from case_records import CaseRecord, SectionGrouper
+from metrics import MetricsReporter, MigrationMetrics
+from migration_journal import MigrationJournal, content_hash
+from run_results import TestPointIndex, build_result, iso_timestamp
+from schema import SchemaCache, TestRailSchema, WorkItemSchema
+from shared_steps import SharedStepsAnalyzer, SharedStepsPlan
+from structured_logging import ConsoleProgress, configure_logging, sample_ids, sampled
+from suite_index import SuiteIndex, normalize_suite_name
+from testrail_cache import TestRailCache
+from transform import (AUTOMATION_STATUS_TAG_PREFIX, build_test_case_payload, parse_steps, steps_xml, transform_batch,
+                       transform_cases)
 
 # Configure logging with UTF-8 encoding support
 import sys
@@ -21,25 +45,12 @@ if os.name == 'nt':
         sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, errors='replace')
         sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, errors='replace')
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('migration.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # Unicode fallback function for cross-platform compatibility
-def safe_log(level, message):
-    """Safely log messages with Unicode fallback"""
-    try:
-        getattr(logger, level)(message)
-    except UnicodeEncodeError:
-        # Fallback: replace Unicode characters with ASCII equivalents
-        safe_message = message.replace('✅', '[SUCCESS]').replace('❌', '[ERROR]').replace('⚠️', '[WARNING]')
-        getattr(logger, level)(safe_message)
+def safe_log(level, message, **kwargs):
+    """Log a message; the console handler replaces characters the console cannot encode"""
+    getattr(logger, level)(message, **kwargs)
 
 # === CONFIGURATION ===
 # TestRail details
@@ -50,30 +61,260 @@ TESTRAIL_USER = "achal01@live.in"
 TESTRAIL_API_KEY = "WscprQ3NPh7EHWRqCe4b-B8CVwzSC/8gQ7NvfwKsc"
 
 # Azure DevOps details
+ADO_BASE_URL = "https://dev.azure.com"  # override to point the migrator at another server
 ADO_ORG = 'amaditya902'
 ADO_PROJECT = 'TestPro'
 ADO_PAT = '1ibVmwpy5iEWOE9KVPVWS3DW7cDucaQHqAxB2MBjyswNi79xTpiJJQQJ99BGACAAAAAAAAAAAAASAZDO2Oor'
 ADO_PLAN_ID = 3
 ADO_STATIC_SUITE_PARENT_ID = 4
+ADO_AREA_PATH = None  # restrict duplicate reconciliation to an area path, e.g. 'TestPro\\QA'
+
+# Rate limiting (per host, shared by every worker thread)
+TESTRAIL_RATE_LIMIT = 2  # requests per second to TestRail
+TESTRAIL_BURST = 5       # requests allowed back to back before throttling
+ADO_RATE_LIMIT = 10      # requests per second to Azure DevOps
+ADO_BURST = 20
+
+# Retries and adaptive throttling
+MAX_RETRIES = 5              # attempts after the first for throttled or failed requests
+RETRY_BACKOFF_BASE = 1.0     # seconds; doubled on every attempt, with jitter
+RETRY_BACKOFF_MAX = 60.0
+RATE_DECREASE_FACTOR = 0.5   # rate multiplier when a host signals pressure
+RATE_DECREASE_COOLDOWN = 2.0 # seconds after a cut during which further pressure signals are ignored
+RATE_RECOVERY_STEP = 0.02    # fraction of the configured rate regained per clean response
+MIN_RATE_LIMIT = 0.2         # requests per second a host is never throttled below
+RATE_LIMIT_LOW_WATERMARK = 0.1  # slow down once X-RateLimit-Remaining drops below this share of the limit
+
+# Concurrency
+ADO_WRITE_CONCURRENCY = 8  # parallel workers creating test cases in ADO
+
+# Attachments are streamed from TestRail into ADO on their own pool, so large
+# uploads never hold up work item creation
+MIGRATE_ATTACHMENTS = True
+ATTACHMENT_CONCURRENCY = 4   # parallel attachment downloads/uploads
+ATTACHMENT_TIMEOUT = 300     # seconds allowed per attachment request
+
+# Write cases section by section instead of in TestRail's listing order. The
+# whole listing is read first; grouped cases beyond CASE_MEMORY_BUDGET_MB are
+# spilled to a temporary on-disk index
+GROUP_CASES_BY_SECTION = False
+CASE_MEMORY_BUDGET_MB = 256
+
+# Create step blocks shared by at least SHARED_STEPS_MIN_USES test cases once, as
+# Shared Steps work items referenced from each case. The whole suite is
+# analyzed before any case is written
+EXTRACT_SHARED_STEPS = False
+SHARED_STEPS_MIN_USES = 20
+SHARED_STEPS_MIN_STEPS = 2
+SHARED_STEPS_MAX_STEPS = 10
+SHARED_STEPS_TAG = "TestRailSharedSteps"
+SHARED_STEPS_REPORT = "shared_steps_report.json"
+
+# Post-migration audit
+AUDIT_REPORT = "audit_report.json"  # missing, mismatched and misplaced test cases
+
+# Mirror nested TestRail sections as nested static suites (False puts every
+# section directly under the parent suite)
+MIRROR_SECTION_HIERARCHY = True
+
+# Worker processes that build work item payloads (steps XML, description, tags)
+# ahead of the writers; 0 builds them on the writer threads
+TRANSFORM_WORKERS = 0
+
+# Batched work item creation through the wit $batch API
+ADO_BATCH_CREATE = True    # False creates one work item per request
+ADO_BATCH_SIZE = 200       # ADO accepts at most 200 operations per $batch call
+ADO_BATCH_MAX_RETRIES = 3  # retry rounds for items that failed inside a batch
+
+# Bulk suite membership
+ADO_SUITE_ADD_CHUNK_SIZE = 200  # test case IDs added to a suite per request
+ADO_SUITE_ADD_API = "test"      # "test" (comma-separated IDs in the URL) or "testplan" (JSON body)
+
+# HTTP connection pooling (one keep-alive session per host)
+HTTP_POOL_SIZE = ADO_WRITE_CONCURRENCY + 4  # connections kept open per host
+
+# Every created work item is tagged with its TestRail case ID, so a create whose
+# outcome is unknown (timeout, dropped connection) can be looked up instead of repeated
+TESTRAIL_ID_TAG_PREFIX = "TestRail:C"
+
+# Every work item a run creates is also tagged with the run's ID, so the whole
+# run can be undone with --rollback
+RUN_ID_TAG_PREFIX = "TestRailMigration:"
+ROLLBACK_DESTROY = False  # True deletes work items permanently instead of moving them to the recycle bin
+
+# Look up Test Cases created by earlier runs before writing anything
+RECONCILE_EXISTING_CASES = True
+WIQL_PAGE_SIZE = 20000  # most IDs a single WIQL query may return
+
+# Test run and result migration (--runs)
+RESULTS_BATCH_SIZE = 1000       # results posted to an ADO test run per request
+RUN_MIGRATION_CONCURRENCY = 4   # TestRail runs migrated in parallel
+
+# Checkpoint journal used to resume interrupted migrations
+JOURNAL_PATH = "migration_journal.sqlite3"
+
+# Pagination
+TESTRAIL_PAGE_SIZE = 250  # maximum rows TestRail returns per page
+
+# Local cache of TestRail listings (sections, cases) for repeatable runs
+TESTRAIL_CACHE_DIR = ".testrail_cache"
+TESTRAIL_CACHE_MODE = "refresh"     # "off", "refresh" (fetch live and store), "use" (prefer cached) or "offline" (cache only)
+TESTRAIL_CACHE_MAX_AGE = 24 * 3600  # seconds a cached listing is reused in "use" mode
+
+# TestRail case fields, priorities and case types and the ADO Test Case field
+# definitions are fetched once per SCHEMA_CACHE_TTL seconds. Every payload is
+# checked against the ADO definitions before it is sent
+SCHEMA_CACHE_FILE = os.path.join(TESTRAIL_CACHE_DIR, "schema.json")
+SCHEMA_CACHE_TTL = 24 * 3600
+VALIDATE_PAYLOADS = True
 
-# Rate limiting
-REQUEST_DELAY = 1  # seconds between requests
+# Live metrics: a JSON snapshot rewritten every METRICS_FLUSH_INTERVAL seconds,
+# and optionally a Prometheus endpoint at http://127.0.0.1:METRICS_PORT/metrics
+METRICS_FILE = "migration_metrics.json"  # None disables the file
+METRICS_PORT = None
+METRICS_FLUSH_INTERVAL = 10
+
+# Where --dry-run writes the work item payloads it builds
+DRY_RUN_OUTPUT = "dry_run_payloads.jsonl.gz"
+
+# Logging: every record is written as a JSON line to LOG_FILE by a background thread.
+# Per-case and per-request info records are sampled to at most LOG_SAMPLED_PER_SECOND
+# and kept off the console, which shows a progress line every PROGRESS_INTERVAL seconds
+# instead; warnings and errors are always logged in full.
+LOG_FILE = "migration.jsonl"
+LOG_SAMPLED_PER_SECOND = 20
+PROGRESS_INTERVAL = 5
+
+configure_logging(LOG_FILE, LOG_SAMPLED_PER_SECOND)
 
 # === HEADERS ===
 testrail_auth = (TESTRAIL_USER, TESTRAIL_API_KEY)
 ado_auth = ('', ADO_PAT)
 
-# Create proper Basic Auth header for Azure DevOps
-credentials = base64.b64encode(f":{ADO_PAT}".encode()).decode()
+# Authentication is attached once to each host's session; requests only carry the content type
 ado_headers = {
-    'Content-Type': 'application/json',
-    'Authorization': f'Basic {credentials}'
+    'Content-Type': 'application/json'
 }
+ado_patch_headers = {
+    'Content-Type': 'application/json-patch+json'
+}
+
+class TokenBucket:
+    """Thread-safe token bucket that caps the request rate to one host.
+    
+    The rate adapts to server feedback: ``slow_down`` cuts it multiplicatively,
+    at most once per RATE_DECREASE_COOLDOWN, ``speed_up`` restores it additively
+    up to the configured maximum, and ``pause`` holds back every caller until a
+    Retry-After delay has passed.
+    """
+    
+    def __init__(self, rate: float, burst: float = 1):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.decreased_at = float('-inf')
+        self.lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """Take one token, blocking until it is available; returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+    
+    def pause(self, seconds: float):
+        """Hold back all requests to this host for the given number of seconds"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+    
+    def slow_down(self):
+        """Reduce the request rate after the server signalled pressure"""
+        with self.lock:
+            # Concurrent requests report the same pressure; it is answered with one cut
+            now = time.monotonic()
+            if now - self.decreased_at < RATE_DECREASE_COOLDOWN:
+                return
+            self.decreased_at = now
+            rate = max(MIN_RATE_LIMIT, self.rate * RATE_DECREASE_FACTOR)
+            if rate < self.rate:
+                logger.warning(f"⚠️ Throttling requests to {rate:.2f}/s")
+            self.rate = rate
+    
+    def speed_up(self):
+        """Recover part of the configured rate after a clean response"""
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_STEP)
+
 
 class TestRailMigrator:
-    def __init__(self):
-        self.existing_suites = {}
+    def __init__(self, resume: bool = False, delta: bool = False,
+                 testrail_project_id: int = None, testrail_suite_id: int = None,
+                 ado_plan_id: int = None, ado_parent_suite_id: int = None,
+                 journal_path: str = None, rate_share: float = 1.0, cache_mode: str = None,
+                 metrics_path: str = None, metrics_port: int = None, shared_steps: bool = None):
+        # Each migrator can target its own suite/plan pair; unset values fall
+        # back to the module configuration
+        self.testrail_project_id = TESTRAIL_PROJECT_ID if testrail_project_id is None else testrail_project_id
+        self.testrail_suite_id = TESTRAIL_SUITE_ID if testrail_suite_id is None else testrail_suite_id
+        self.ado_plan_id = ADO_PLAN_ID if ado_plan_id is None else ado_plan_id
+        self.ado_parent_suite_id = ADO_STATIC_SUITE_PARENT_ID if ado_parent_suite_id is None else ado_parent_suite_id
+        self.journal_path = journal_path or JOURNAL_PATH
+        # Fraction of the configured request rates this migrator may use, so that
+        # several migrators running side by side stay under the global limits
+        self.rate_share = rate_share
+        self.cache_mode = cache_mode or TESTRAIL_CACHE_MODE
+        self.cache = TestRailCache(TESTRAIL_CACHE_DIR, TESTRAIL_URL) if self.cache_mode != 'off' else None
+        self.metrics = MigrationMetrics()
+        self.metrics_path = metrics_path or METRICS_FILE
+        self.metrics_port = METRICS_PORT if metrics_port is None else metrics_port
+        self.extract_shared_steps = EXTRACT_SHARED_STEPS if shared_steps is None else shared_steps
+        self.shared_steps: Optional[SharedStepsPlan] = None
+        self.case_listing_read_at = None
+        # Set by migrate(); resumed and delta runs keep the ID of the run they continue
+        self.run_id: Optional[str] = None
+        
+        # A delta sync builds on the journal of earlier runs, so it always resumes
+        self.resume = resume or delta
+        self.delta = delta
+        self.journal = MigrationJournal(self.journal_path)
+        self.suite_index = SuiteIndex()
         self.added_test_cases = set()
+        self.case_index = MigratedCaseIndex()
+        self.added_test_cases_lock = threading.Lock()
+        self.total_cases_updated = 0
+        self.stats_lock = threading.Lock()
+        self.attachments = AttachmentRegistry()
+        self.attachment_pool = None
+        self.total_attachments_linked = 0
+        self.total_attachments_failed = 0
+        self.pending_suite_additions = {}
+        self.rejected_suite_additions = {}
+        # In-flight write jobs per suite, and the suites whose cases have all been handed to writers
+        self.suite_writes = {}
+        self.finished_suites = set()
+        self.suite_additions_lock = threading.Lock()
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+        self.rate_limiters = {
+            urlparse(TESTRAIL_URL).netloc: TokenBucket(TESTRAIL_RATE_LIMIT * rate_share, TESTRAIL_BURST * rate_share),
+            urlparse(ADO_BASE_URL).netloc: TokenBucket(ADO_RATE_LIMIT * rate_share, ADO_BURST * rate_share),
+        }
         self.priority_mapping = {
             1: 4,  # Low
             2: 3,  # Medium  
@@ -85,36 +326,175 @@ class TestRailMigrator:
             1: "Automated", 
             2: "To Be Automated"
         }
+        # Replaced by tables built from the TestRail and ADO field definitions in load_schema
+        self.field_labels = None
+        self.ado_schema = WorkItemSchema({})
+        self.result_outcome_mapping = {
+            1: "Passed",
+            2: "Blocked",
+            3: "NotExecuted",   # Untested
+            4: "Inconclusive",  # Retest
+            5: "Failed"
+        }
     
     def normalize_suite_name(self, name: str) -> str:
         """Normalize suite name for comparison"""
-        return name.strip().lower()
+        return normalize_suite_name(name)
     
-    def make_request(self, method: str, url: str, auth: tuple, headers: dict = None, 
-                    json_data: dict = None, timeout: int = 30) -> requests.Response:
-        """Make HTTP request with error handling and rate limiting"""
-        try:
-            time.sleep(REQUEST_DELAY)
-            response = requests.request(
-                method=method, 
-                url=url, 
-                auth=auth, 
-                headers=headers, 
-                json=json_data,
-                timeout=timeout
-            )
+    def session_for(self, url: str) -> requests.Session:
+        """Return the pooled keep-alive session for the URL's host, creating it on first use"""
+        host = urlparse(url).netloc
+        with self.sessions_lock:
+            session = self.sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update({
+                    'Accept': 'application/json',
+                    'Accept-Encoding': 'gzip, deflate',
+                    'Connection': 'keep-alive'
+                })
+                session.auth = testrail_auth if host == urlparse(TESTRAIL_URL).netloc else ado_auth
+                self.sessions[host] = session
+        return session
+    
+    def close_sessions(self):
+        """Close every pooled HTTP session"""
+        with self.sessions_lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+    
+    def make_request(self, method: str, url: str, headers: dict = None,
+                    json_data: Any = None, timeout: int = 30, idempotent: bool = None,
+                    data: Any = None, stream: bool = False) -> requests.Response:
+        """Make HTTP request with error handling, adaptive rate limiting and retries.
+        
+        Throttled responses (429, or 503 with Retry-After) never reached the
+        handler, so they are retried for every method after the delay the
+        server asked for; they also slow down and pause every request to the
+        host. Other 5xx responses, timeouts and connection errors are backed
+        off for this request alone, and only retried when it is idempotent,
+        which by default means anything but POST; callers that create work
+        items resolve those ambiguous failures themselves so a retry cannot
+        duplicate a test case.
+        
+        ``data`` sends a raw body instead of JSON; it must be bytes so it can be
+        re-sent on retry. With ``stream`` the body is left unread for the caller.
+        """
+        if idempotent is None:
+            idempotent = method.upper() != 'POST'
+        limiter = self.rate_limiter_for(url)
+        metrics_key = self.metrics.request_key(method, url)
+        host = metrics_key[0]
+        
+        for attempt in range(MAX_RETRIES + 1):
+            self.metrics.observe_throttle(host, limiter.acquire())
+            started = time.perf_counter()
+            try:
+                response = self.session_for(url).request(
+                    method=method, 
+                    url=url, 
+                    headers=headers, 
+                    json=json_data,
+                    data=data,
+                    timeout=timeout,
+                    stream=stream
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.metrics.observe_request(metrics_key, time.perf_counter() - started, type(e).__name__)
+                if not idempotent or attempt == MAX_RETRIES:
+                    logger.error(f"Request failed: {e}")
+                    raise
+                delay = self.backoff_delay(attempt)
+                logger.warning(f"⚠️ Request failed ({e}); retrying in {delay:.1f}s")
+                self.metrics.observe_retry(metrics_key)
+                time.sleep(delay)
+                continue
+            except requests.exceptions.RequestException as e:
+                self.metrics.observe_request(metrics_key, time.perf_counter() - started, type(e).__name__)
+                logger.error(f"Request failed: {e}")
+                raise
+            
+            body = response.request.body if response.request is not None else None
+            received = int(response.headers.get('Content-Length') or 0) if stream else len(response.content)
+            elapsed = time.perf_counter() - started
+            self.metrics.observe_request(metrics_key, elapsed, response.status_code,
+                                         len(body) if body else 0, received)
+            logger.info(f"{method.upper()} {metrics_key[2]} → {response.status_code} in {elapsed * 1000:.0f} ms",
+                        extra=sampled(method=method.upper(), endpoint=metrics_key[2], status=response.status_code,
+                                      latency_ms=round(elapsed * 1000, 1)))
+            
+            retry_after = self.retry_after_seconds(response)
+            throttled = response.status_code == 429 or (response.status_code == 503 and retry_after is not None)
+            transient = response.status_code in (500, 502, 503, 504) and idempotent
+            if (throttled or transient) and attempt < MAX_RETRIES:
+                delay = retry_after if retry_after is not None else self.backoff_delay(attempt)
+                logger.warning(f"⚠️ {response.status_code} from {urlparse(url).hostname}; retrying in {delay:.1f}s "
+                               f"(attempt {attempt + 2} of {MAX_RETRIES + 1})")
+                if throttled:
+                    limiter.slow_down()
+                    limiter.pause(delay)
+                else:
+                    time.sleep(delay)
+                response.close()
+                self.metrics.observe_retry(metrics_key)
+                continue
+            
+            self.observe_rate_limit_headers(limiter, response)
             return response
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed: {e}")
-            raise
+        return response
     
-    def fetch_testrail_data(self, endpoint: str, params: dict = None) -> dict:
-        """Fetch data from TestRail API with error handling"""
-        url = f'{TESTRAIL_URL}index.php?/api/v2/{endpoint}'
-        if params:
-            url += '&' + '&'.join([f'{k}={v}' for k, v in params.items()])
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter for the given retry attempt"""
+        return min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+    
+    def retry_after_seconds(self, response: requests.Response) -> Optional[float]:
+        """Parse a Retry-After header given either in seconds or as an HTTP date"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    
+    def observe_rate_limit_headers(self, limiter: TokenBucket, response: requests.Response):
+        """Adapt the host's request rate to ADO's X-RateLimit-* headers"""
+        headers = response.headers
+        delay = headers.get('X-RateLimit-Delay')
+        remaining = headers.get('X-RateLimit-Remaining')
+        limit = headers.get('X-RateLimit-Limit')
+        try:
+            # ADO is already delaying our requests, or the budget is nearly spent
+            under_pressure = (delay is not None and float(delay) > 0) or (
+                remaining is not None and limit and float(remaining) < float(limit) * RATE_LIMIT_LOW_WATERMARK
+            )
+        except ValueError:
+            under_pressure = False
         
-        response = self.make_request('GET', url, testrail_auth)
+        if under_pressure:
+            limiter.slow_down()
+        elif response.status_code < 400:
+            limiter.speed_up()
+    
+    def rate_limiter_for(self, url: str) -> TokenBucket:
+        """Return the token bucket shared by all requests to the URL's host"""
+        host = urlparse(url).netloc
+        limiter = self.rate_limiters.get(host)
+        if limiter is None:
+            limiter = self.rate_limiters.setdefault(host, TokenBucket(ADO_RATE_LIMIT * self.rate_share, ADO_BURST * self.rate_share))
+        return limiter
+    
+    def get_testrail_json(self, url: str) -> Any:
+        """GET a TestRail API URL and decode the JSON body"""
+        response = self.make_request('GET', url)
         
         try:
             data = response.json()
@@ -125,71 +505,264 @@ class TestRailMigrator:
         if isinstance(data, dict) and data.get("error"):
             logger.error(f"TestRail API error: {data['error']}")
             raise Exception(f"TestRail API error: {data['error']}")
+        if response.status_code != 200:
+            # An error body without a cursor must not pass for the last page of a listing
+            logger.error(f"TestRail request failed: {response.status_code} - {response.text}")
+            raise requests.exceptions.HTTPError(
+                f"TestRail request failed: {response.status_code} - {response.text}", response=response
+            )
         
         return data
     
+    def fetch_testrail_data(self, endpoint: str, params: dict = None) -> dict:
+        """Fetch data from TestRail API with error handling"""
+        url = f'{TESTRAIL_URL}index.php?/api/v2/{endpoint}'
+        if params:
+            url += '&' + '&'.join([f'{k}={v}' for k, v in params.items()])
+        
+        return self.get_testrail_json(url)
+    
+    def fetch_testrail_pages(self, endpoint: str, params: dict) -> Iterator[Any]:
+        """Yield each raw response of a paginated TestRail endpoint, prefetching the next page.
+        
+        Follows the ``_links.next`` cursor until it is exhausted. While the caller
+        processes one page, the request for the next one is already in flight.
+        Older TestRail versions return a bare list without pagination; that list
+        is yielded as a single page.
+        """
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='testrail-prefetch') as prefetcher:
+            data = self.fetch_testrail_data(endpoint, params)
+            while True:
+                if isinstance(data, list):
+                    yield data
+                    return
+                
+                next_link = (data.get('_links') or {}).get('next')
+                pending = None
+                if next_link:
+                    pending = prefetcher.submit(
+                        self.get_testrail_json, f"{TESTRAIL_URL}index.php?/{next_link.lstrip('/')}"
+                    )
+                
+                yield data
+                
+                if pending is None:
+                    return
+                data = pending.result()
+    
+    def iter_testrail_pages(self, endpoint: str, key: str, params: dict = None,
+                            cacheable: bool = True, max_age: float = None) -> Iterator[List[dict]]:
+        """Yield the rows of each page of a paginated TestRail endpoint.
+        
+        Depending on the cache mode, pages are served from the local cache or
+        fetched live and stored in it once the listing has been read in full.
+        A listing cached less than ``max_age`` seconds ago is reused in any
+        mode but "off". Listings that are never cached cannot be read offline.
+        """
+        params = dict(params or {})
+        params.setdefault('limit', TESTRAIL_PAGE_SIZE)
+        cache = self.cache if cacheable else None
+        if not cacheable and self.cache_mode == 'offline':
+            raise Exception(f"{endpoint} is never cached and cannot be read with --offline")
+        
+        if cache is not None and (self.cache_mode in ('use', 'offline') or max_age is not None):
+            if self.cache_mode == 'offline':
+                max_age = None
+            elif max_age is None:
+                max_age = TESTRAIL_CACHE_MAX_AGE
+            entry = cache.lookup(endpoint, params, max_age)
+            if entry:
+                logger.info(f"Reading {endpoint} from the local cache")
+                for data in cache.read_pages(entry):
+                    yield data if isinstance(data, list) else data.get(key, [])
+                return
+            if self.cache_mode == 'offline':
+                raise Exception(f"No cached TestRail export for {endpoint} {params}; run once without --offline")
+        
+        writer = cache.writer(endpoint, params) if cache is not None else None
+        completed = False
+        try:
+            for data in self.fetch_testrail_pages(endpoint, params):
+                rows = data if isinstance(data, list) else data.get(key, [])
+                if writer is not None:
+                    writer.write(data, rows)
+                yield rows
+            completed = True
+        finally:
+            if writer is not None:
+                if completed:
+                    writer.commit()
+                else:
+                    writer.discard()
+    
     def fetch_sections(self) -> List[dict]:
-        """Fetch sections from TestRail"""
+        """Fetch all sections from TestRail"""
         logger.info("Fetching sections from TestRail...")
-        data = self.fetch_testrail_data(
-            f'get_sections/{TESTRAIL_PROJECT_ID}',
-            {'suite_id': TESTRAIL_SUITE_ID}
-        )
-        sections = data.get("sections", data if isinstance(data, list) else [])
+        sections = []
+        for page in self.iter_testrail_pages(
+            f'get_sections/{self.testrail_project_id}', 'sections',
+            {'suite_id': self.testrail_suite_id}
+        ):
+            sections.extend(page)
         logger.info(f"Found {len(sections)} sections")
         return sections
     
-    def fetch_test_cases(self) -> List[dict]:
-        """Fetch test cases from TestRail"""
+    def fetch_test_cases(self, updated_after: Optional[int] = None, max_age: float = None) -> Iterator[CaseRecord]:
+        """Stream test cases from TestRail one at a time, page by page.
+        
+        Each case is reduced to a compact record of the fields that are mapped
+        to ADO, so the raw page can be released as soon as it is parsed. With
+        ``updated_after`` (a UNIX timestamp) only cases changed since then are
+        returned; ``max_age`` is passed on to ``iter_testrail_pages``.
+        """
         logger.info("Fetching test cases from TestRail...")
-        data = self.fetch_testrail_data(
-            f'get_cases/{TESTRAIL_PROJECT_ID}',
-            {'suite_id': TESTRAIL_SUITE_ID}
-        )
-        cases = data.get("cases", [])
-        logger.info(f"Found {len(cases)} test cases")
-        return cases
+        params = {'suite_id': self.testrail_suite_id}
+        if updated_after:
+            params['updated_after'] = updated_after
+            logger.info(f"Only fetching test cases updated after {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(updated_after))}")
+        total = 0
+        for page in self.iter_testrail_pages(f'get_cases/{self.testrail_project_id}', 'cases', params,
+                                             max_age=max_age):
+            total += len(page)
+            self.metrics.add('cases_fetched', len(page))
+            logger.info(f"Fetched {len(page)} test cases (total so far: {total})", extra=sampled(count=total))
+            yield from (CaseRecord.from_testrail(case) for case in page)
+        self.metrics.set_expected(total)
+        logger.info(f"Found {total} test cases")
     
-    def fetch_ado_suites(self, parent_id: int):
-        """Recursively fetch all ADO test suites"""
-        url = f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{ADO_PLAN_ID}/suites/{parent_id}/suites?api-version=6.0"
-        
+    def group_cases_by_section(self, cases: Iterator[CaseRecord]) -> Iterator[CaseRecord]:
+        """Re-order a case stream so each section's cases follow one another"""
+        grouper = SectionGrouper(CASE_MEMORY_BUDGET_MB * 1024 * 1024)
         try:
-            response = self.make_request('GET', url, ado_auth, ado_headers)
-            if response.status_code == 200:
-                suites = response.json().get("value", [])
-                for suite in suites:
-                    key = (self.normalize_suite_name(suite['name']), int(suite['parent']['id']))
-                    if key not in self.existing_suites:
-                        self.existing_suites[key] = suite['id']
-                        self.fetch_ado_suites(suite['id'])  # Recursively fetch child suites
-            elif response.status_code == 401:
+            for case in cases:
+                grouper.add(case)
+            if grouper.spilled:
+                logger.info(f"Grouped {len(grouper)} test cases by section ({grouper.spilled} spilled to disk)")
+            for _, section_cases in grouper:
+                yield from section_cases
+        finally:
+            grouper.close()
+    
+    def fetch_ado_suites(self):
+        """Index the plan's whole suite tree with a few paginated listing calls.
+        
+        Raises when the tree cannot be listed completely: mirroring sections
+        against a missing or partial index would create duplicate suites.
+        """
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/testplan/Plans/{self.ado_plan_id}/suites?api-version=7.0"
+        continuation_token = None
+        
+        while True:
+            page_url = f"{url}&continuationToken={continuation_token}" if continuation_token else url
+            response = self.make_request('GET', page_url, ado_headers)
+            if response.status_code == 401:
                 logger.error(f"Authentication failed for ADO API. Please check your PAT token and permissions.")
-                logger.error(f"Response: {response.status_code} - {response.text}")
-            else:
-                logger.warning(f"Failed to fetch suites: {response.status_code} - {response.text}")
-        except Exception as e:
-            logger.warning(f"Error fetching child suites for parent {parent_id}: {e}")
+                raise requests.exceptions.HTTPError(
+                    f"Failed to list suites of plan {self.ado_plan_id}: {response.status_code} - {response.text}",
+                    response=response
+                )
+            if response.status_code != 200:
+                if continuation_token:
+                    raise requests.exceptions.HTTPError(
+                        f"Failed to list suites of plan {self.ado_plan_id} past the first page: "
+                        f"{response.status_code} - {response.text}", response=response
+                    )
+                # Servers without the testplan API are walked one level at a time instead
+                logger.warning(f"Failed to list plan suites ({response.status_code}); falling back to per-suite discovery")
+                self.fetch_ado_child_suites(self.ado_parent_suite_id)
+                return
+            
+            for suite in response.json().get("value", []):
+                parent = suite.get('parentSuite') or {}
+                self.suite_index.add(suite['id'], suite['name'], parent.get('id'))
+            
+            continuation_token = response.headers.get('x-ms-continuationtoken')
+            if not continuation_token:
+                return
+    
+    def fetch_ado_child_suites(self, parent_id: int):
+        """Recursively fetch ADO test suites below a parent, one request per suite; raises if a listing fails"""
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{self.ado_plan_id}/suites/{parent_id}/suites?api-version=6.0"
+        
+        response = self.make_request('GET', url, ado_headers)
+        if response.status_code == 401:
+            logger.error(f"Authentication failed for ADO API. Please check your PAT token and permissions.")
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(
+                f"Failed to list child suites of suite {parent_id}: {response.status_code} - {response.text}",
+                response=response
+            )
+        for suite in response.json().get("value", []):
+            key = (self.normalize_suite_name(suite['name']), int(suite['parent']['id']))
+            if key not in self.suite_index:
+                self.suite_index.add(suite['id'], suite['name'], suite['parent']['id'])
+                self.fetch_ado_child_suites(suite['id'])  # Recursively fetch child suites
+    
+    def find_child_suite(self, section_name: str, parent_id: int) -> Optional[int]:
+        """Look a suite up by name among the parent's child suites as ADO has them now"""
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{self.ado_plan_id}/suites/{parent_id}/suites?api-version=6.0"
+        response = self.make_request('GET', url, ado_headers)
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(f"{response.status_code} - {response.text}", response=response)
+        name = self.normalize_suite_name(section_name)
+        for suite in response.json().get("value", []):
+            if self.normalize_suite_name(suite['name']) == name:
+                return int(suite['id'])
+        return None
+    
+    def record_suite_created(self, suite_id: int, section_name: str, parent_id: int):
+        """Index a suite this run created and checkpoint it for --rollback"""
+        self.suite_index.add(suite_id, section_name, parent_id)
+        if self.run_id:
+            self.journal.record_suite_created(suite_id, self.ado_plan_id, parent_id, self.run_id)
     
     def create_ado_suite(self, section_name: str, parent_id: int) -> Optional[int]:
-        """Create a new test suite in ADO"""
-        logger.info(f"Creating test suite: {section_name}")
+        """Create a new test suite in ADO.
+        
+        A POST is not idempotent, so when its outcome is unknown (server
+        error, timeout) the parent's child suites are checked for it before
+        trying again.
+        """
+        logger.info(f"Creating test suite: {section_name}", extra=sampled(suite_id=parent_id))
         
-        url = f'https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{ADO_PLAN_ID}/suites/{parent_id}/suites?api-version=6.0'
+        url = f'{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{self.ado_plan_id}/suites/{parent_id}/suites?api-version=6.0'
         payload = {
             "name": section_name,
             "suiteType": "StaticTestSuite"
         }
         
-        response = self.make_request('POST', url, ado_auth, ado_headers, payload)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = self.make_request('POST', url, ado_headers, payload)
+                if response.status_code not in (500, 502, 503, 504):
+                    break
+                logger.warning(f"⚠️ Creating suite '{section_name}' returned {response.status_code}")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                response = None
+            
+            if attempt == MAX_RETRIES:
+                break
+            try:
+                existing = self.find_child_suite(section_name, parent_id)
+            except requests.exceptions.RequestException as e:
+                # Without knowing whether the suite exists, another POST could duplicate it
+                safe_log('error', f"❌ Failed to create suite '{section_name}': could not check whether it exists ({e})")
+                return None
+            if existing:
+                logger.info(f"✅ Suite '{section_name}' was already created as {existing}", extra=sampled(suite_id=existing))
+                self.record_suite_created(existing, section_name, parent_id)
+                return existing
+            time.sleep(self.backoff_delay(attempt))
         
+        if response is None:
+            safe_log('error', f"❌ Failed to create suite '{section_name}': no response from ADO")
+            return None
         if response.status_code in [200, 201]:
             suite_data = response.json()
             if 'id' in suite_data:
                 suite_id = suite_data['id']
-                safe_log('info', f"✅ Created suite '{section_name}' with ID: {suite_id}")
-                key = (self.normalize_suite_name(section_name), parent_id)
-                self.existing_suites[key] = suite_id
+                safe_log('info', f"✅ Created suite '{section_name}' with ID: {suite_id}", extra=sampled(suite_id=suite_id))
+                self.record_suite_created(suite_id, section_name, parent_id)
                 return suite_id
         elif response.status_code == 401:
             safe_log('error', f"❌ Authentication failed when creating suite '{section_name}'. Please check your PAT token and permissions.")
@@ -198,107 +771,320 @@ class TestRailMigrator:
             safe_log('error', f"❌ Failed to create suite '{section_name}': {response.status_code} - {response.text}")
         return None
     
-    def format_steps(self, steps_data: str) -> str:
-        """Format test steps for ADO"""
-        if not steps_data:
-            return ""
+    def resolve_section_suite(self, section: dict, parent_suite_id: int, create: bool = True) -> Optional[int]:
+        """Find or create the suite for one section under its parent suite; with ``create`` false, only find it"""
+        section_name = section.get('name', 'Unnamed Section')
+        logger.info(f"=== Processing section: {section_name} ===", extra=sampled(suite_id=parent_suite_id))
         
-        # If steps are in JSON format, parse and format them
-        try:
-            if steps_data.startswith('['):
-                steps = json.loads(steps_data)
-                formatted_steps = []
-                for i, step in enumerate(steps, 1):
-                    content = step.get('content', '')
-                    expected = step.get('expected', '')
-                    formatted_steps.append(f"Step {i}: {content}")
-                    if expected:
-                        formatted_steps.append(f"Expected: {expected}")
-                return '\n'.join(formatted_steps)
-        except (json.JSONDecodeError, TypeError):
-            pass
+        # Check if suite already exists
+        suite_id = self.suite_index.get(section_name, parent_suite_id)
+        
+        if suite_id:
+            logger.info(f"✅ Using existing test suite: {section_name} (ID: {suite_id})", extra=sampled(suite_id=suite_id))
+            return suite_id
+        if not create:
+            logger.warning(f"⚠️ No test suite for section: {section_name}")
+            return None
+        
+        suite_id = self.create_ado_suite(section_name, parent_suite_id)
+        if not suite_id:
+            logger.error(f"❌ Failed to create/find suite for section: {section_name}")
+        return suite_id
+    
+    def mirror_section_tree(self, sections: List[dict], create: bool = True) -> Dict[int, int]:
+        """Mirror TestRail sections as static suites; returns section ID -> suite ID.
+        
+        The section tree is walked breadth-first. All sections at one depth are
+        resolved concurrently once their parents' suites exist, so creating the
+        tree takes one round of requests per level rather than one per section.
+        With ``create`` false, missing suites are left out instead of created.
+        """
+        section_ids = {section.get('id') for section in sections}
+        children = {}
+        for section in sections:
+            parent_id = section.get('parent_id') if MIRROR_SECTION_HIERARCHY else None
+            # Sections whose parent is not part of this suite hang off the root
+            children.setdefault(parent_id if parent_id in section_ids else None, []).append(section)
+        
+        suite_by_section = {}
+        level = children.get(None, [])
+        depth = 0
+        with ThreadPoolExecutor(max_workers=ADO_WRITE_CONCURRENCY, thread_name_prefix='ado-suites') as creators:
+            while level:
+                logger.info(f"Resolving {len(level)} suites at depth {depth}")
+                # Siblings with the same name share one suite, so they are resolved once
+                futures = {}
+                sections_by_key = {}
+                for section in level:
+                    parent_suite_id = (suite_by_section.get(section.get('parent_id'))
+                                       if section.get('parent_id') in section_ids and MIRROR_SECTION_HIERARCHY
+                                       else self.ado_parent_suite_id)
+                    key = (self.normalize_suite_name(section.get('name', 'Unnamed Section')), parent_suite_id)
+                    if key not in sections_by_key:
+                        futures[key] = creators.submit(self.resolve_section_suite, section, parent_suite_id, create)
+                    sections_by_key.setdefault(key, []).append(section)
+                
+                next_level = []
+                for key, future in futures.items():
+                    suite_id = future.result()
+                    for section in sections_by_key[key]:
+                        if not suite_id:
+                            skipped = len(children.get(section.get('id'), []))
+                            if skipped:
+                                logger.error(f"❌ Skipping {skipped} child sections of '{section.get('name')}'")
+                            continue
+                        suite_by_section[section.get('id')] = suite_id
+                        next_level.extend(children.get(section.get('id'), []))
+                level = next_level
+                depth += 1
+        return suite_by_section
+    
+    def format_steps(self, steps_data: Any) -> str:
+        """Format TestRail steps as the ADO steps XML"""
+        return steps_xml(parse_steps({'custom_steps': steps_data}))
+    
+    def claim_test_case(self, case: dict, suite_id: int) -> bool:
+        """Reserve a case for creation; returns False if it already exists or was already added"""
+        case_title = case.get('title', 'Untitled Test Case')
+        
+        existing = self.case_index.lookup(case, suite_id)
+        if existing:
+            logger.warning(f"⚠️ Skipping test case already in ADO as {existing}: {case_title}")
+            return False
+        
+        # Cases are identified by their TestRail ID; only ID-less cases fall back to title + suite
+        key = case['id'] if case.get('id') is not None else (case_title, suite_id)
+        with self.added_test_cases_lock:
+            if key in self.added_test_cases:
+                logger.warning(f"⚠️ Skipping duplicate test case: {case_title}")
+                return False
+            
+            self.added_test_cases.add(key)
+        return True
+    
+    def load_schema(self):
+        """Build the field mapping tables and the payload validator from TestRail and ADO field definitions.
+        
+        Definitions are fetched once per SCHEMA_CACHE_TTL and kept in
+        SCHEMA_CACHE_FILE; offline runs take cached ones of any age. Whatever
+        cannot be loaded falls back to the built-in mappings, unvalidated.
+        """
+        offline = self.cache_mode == 'offline'
+        cache = SchemaCache(SCHEMA_CACHE_FILE, None if offline else SCHEMA_CACHE_TTL)
+        
+        testrail_key = f"testrail:{TESTRAIL_URL}:{self.testrail_project_id}"
+        testrail_data = cache.load(testrail_key)
+        if testrail_data is None and not offline:
+            logger.info("Fetching TestRail field definitions...")
+            try:
+                testrail_data = {
+                    'case_fields': self.fetch_testrail_data('get_case_fields'),
+                    'priorities': self.fetch_testrail_data('get_priorities'),
+                    'case_types': self.fetch_testrail_data('get_case_types'),
+                }
+                cache.store(testrail_key, testrail_data)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not read TestRail field definitions ({e}); using the built-in mappings")
+        
+        ado_key = f"ado:{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}:Test Case"
+        ado_data = cache.load(ado_key)
+        if ado_data is None and not offline:
+            logger.info("Fetching ADO Test Case field definitions...")
+            base = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/wit"
+            type_fields = self.make_request(
+                'GET', f"{base}/workitemtypes/Test%20Case/fields?$expand=allowedValues&api-version=7.0", ado_headers
+            )
+            fields = self.make_request('GET', f"{base}/fields?api-version=7.0", ado_headers)
+            if type_fields.status_code == 200 and fields.status_code == 200:
+                ado_data = {
+                    'type_fields': type_fields.json().get('value', []),
+                    'fields': [{'referenceName': field['referenceName'], 'type': field.get('type'),
+                                'readOnly': field.get('readOnly', False)}
+                               for field in fields.json().get('value', [])],
+                }
+                cache.store(ado_key, ado_data)
+            else:
+                logger.warning(f"⚠️ Could not read ADO field definitions ({type_fields.status_code}, "
+                               f"{fields.status_code}); payloads are sent unvalidated")
+        
+        self.ado_schema = WorkItemSchema(ado_data or {})
+        testrail_schema = TestRailSchema(testrail_data or {}, self.testrail_project_id)
+        ado_priorities = [int(value) for value in self.ado_schema.allowed_values('Microsoft.VSTS.Common.Priority')]
+        self.priority_mapping = testrail_schema.priority_mapping(ado_priorities or [1, 2, 3, 4], self.priority_mapping)
+        self.automation_status_mapping = testrail_schema.automation_status_mapping(self.automation_status_mapping)
+        if testrail_data:
+            self.field_labels = testrail_schema.field_labels()
+            logger.info(f"Mapping {len(self.priority_mapping)} priorities, {len(self.automation_status_mapping)} "
+                        f"automation statuses and {len(self.field_labels.custom_fields)} custom fields")
+    
+    def validate_payload(self, case: dict, payload: List[dict]) -> bool:
+        """Check a payload against the ADO field definitions, logging why ADO would reject it"""
+        if not VALIDATE_PAYLOADS:
+            return True
+        problems = self.ado_schema.validate(payload)
+        if problems:
+            logger.error(f"❌ Test case '{case.get('title', 'Untitled Test Case')}' was not sent; "
+                         f"ADO would reject it: {'; '.join(problems)}", extra={'case_id': case.get('id')})
+        return not problems
+    
+    def analyze_shared_steps(self) -> SharedStepsPlan:
+        """Find step blocks repeated across every test case of the TestRail suite"""
+        logger.info("Analyzing test case steps for shared blocks...")
+        analyzer = SharedStepsAnalyzer(SHARED_STEPS_MIN_USES, SHARED_STEPS_MIN_STEPS, SHARED_STEPS_MAX_STEPS)
+        for page in self.iter_testrail_pages(f'get_cases/{self.testrail_project_id}', 'cases',
+                                             {'suite_id': self.testrail_suite_id}):
+            for case in page:
+                analyzer.add(parse_steps(case))
+        self.case_listing_read_at = time.time()
+        plan = analyzer.plan(f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/workItems/")
+        logger.info(f"Found {len(plan.blocks)} step blocks shared by at least {analyzer.min_uses} "
+                    f"of {analyzer.cases} test cases")
+        return plan
+    
+    def find_shared_steps(self) -> Dict[str, int]:
+        """Map block keys to the Shared Steps work items earlier runs created for them"""
+        work_item_ids = self.query_work_item_ids(
+            f"[System.WorkItemType] = 'Shared Steps' AND [System.Tags] CONTAINS '{SHARED_STEPS_TAG}'"
+        )
+        found = {}
+        for item in self.fetch_work_items(work_item_ids, ["System.Id", "System.Tags"]):
+            for tag in item.get('fields', {}).get('System.Tags', '').split(';'):
+                tag = tag.strip()
+                if tag.startswith(f"{SHARED_STEPS_TAG}:"):
+                    found[tag[len(SHARED_STEPS_TAG) + 1:].lower()] = item['id']
+        return found
+    
+    def create_shared_steps(self, plan: SharedStepsPlan, create: bool = True):
+        """Create a Shared Steps work item per block, reusing those created by earlier runs.
+        
+        A block whose work item cannot be created, or with ``create`` false does
+        not exist yet, is left inline in its cases.
+        """
+        existing = self.find_shared_steps() if RECONCILE_EXISTING_CASES and plan.blocks else {}
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/workitems/$Shared%20Steps?api-version=6.0"
+        for block in plan.blocks:
+            work_item_id = self.journal.get_state(f'shared_steps:{block.key}') or existing.get(block.key)
+            if work_item_id:
+                plan.link(block, int(work_item_id))
+                continue
+            if not create:
+                continue
+            
+            try:
+                response = self.make_request('POST', url, ado_patch_headers,
+                                             self.stamp_run(plan.work_item_payload(block, SHARED_STEPS_TAG)))
+            except requests.exceptions.RequestException as e:
+                logger.error(f"❌ Failed to create shared steps '{block.title()}': {e}")
+                continue
+            if response.status_code not in [200, 201]:
+                logger.error(f"❌ Failed to create shared steps '{block.title()}': {response.status_code} → {response.text}")
+                continue
+            
+            work_item_id = response.json()['id']
+            self.journal.set_state(f'shared_steps:{block.key}', str(work_item_id))
+            plan.link(block, work_item_id)
+            logger.info(f"✅ Created shared steps {work_item_id}: {block.title()} "
+                        f"({len(block.steps)} steps, used by {block.uses} test cases)",
+                        extra={'work_item_id': work_item_id, 'count': block.uses})
+    
+    def write_shared_steps_report(self, plan: SharedStepsPlan, linked_only: bool = True) -> Dict[str, Any]:
+        """Write what extracting shared steps saves to SHARED_STEPS_REPORT and log the totals"""
+        report = plan.report(SHARED_STEPS_TAG, linked_only)
+        with open(SHARED_STEPS_REPORT, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Shared steps: {report['shared_steps']} work items replace {report['steps_deduplicated']} "
+                    f"inline steps, saving about {report['bytes_saved'] / 1024:,.0f} KiB of test case payloads "
+                    f"for {report['requests_added']} extra requests → {SHARED_STEPS_REPORT}")
+        return report
+    
+    def stamp_run(self, work_item_payload: List[dict]) -> List[dict]:
+        """Return a copy of a JSON-patch document that also tags the work item with the run ID.
+        
+        Applied only to what is sent when this run creates a work item, so
+        content hashes stay the same from run to run.
+        """
+        if not self.run_id:
+            return work_item_payload
+        tag = f"{RUN_ID_TAG_PREFIX}{self.run_id}"
+        stamped = [dict(operation, value=f"{operation['value']}; {tag}" if operation.get('value') else tag)
+                   if operation.get('path') == '/fields/System.Tags' else operation
+                   for operation in work_item_payload]
+        if not any(operation.get('path') == '/fields/System.Tags' for operation in work_item_payload):
+            stamped.append({"op": "add", "path": "/fields/System.Tags", "value": tag})
+        return stamped
+    
+    def merge_tags(self, work_item_payload: List[dict], current_tags: str) -> List[dict]:
+        """Return a copy of a JSON-patch document whose tags keep the work item's other tags.
         
-        # Return as plain text if not JSON
-        return str(steps_data)
+        Setting System.Tags replaces them all. Only the tags derived from the
+        case are replaced; the run ID of the run that created the work item
+        and tags added in ADO are kept.
+        """
+        derived = (TESTRAIL_ID_TAG_PREFIX, AUTOMATION_STATUS_TAG_PREFIX)
+        kept = [tag for tag in (tag.strip() for tag in (current_tags or '').split(';'))
+                if tag and not tag.startswith(derived)]
+        return [dict(operation, value='; '.join(kept + ([operation['value']] if operation.get('value') else [])))
+                if operation.get('path') == '/fields/System.Tags' else operation
+                for operation in work_item_payload]
+    
+    def build_test_case_payload(self, case: dict) -> List[dict]:
+        """Build the JSON-patch document that creates a TestRail case as an ADO Test Case"""
+        self.metrics.add('cases_transformed')
+        return build_test_case_payload(
+            case, self.priority_mapping, self.automation_status_mapping, TESTRAIL_ID_TAG_PREFIX, self.shared_steps,
+            self.field_labels
+        )
     
     def create_ado_test_case(self, case: dict, suite_id: int) -> bool:
         """Create a test case in ADO"""
         case_title = case.get('title', 'Untitled Test Case')
         
         # Skip if already added
-        if case_title in self.added_test_cases:
-            logger.warning(f"⚠️ Skipping duplicate test case: {case_title}")
+        if not self.claim_test_case(case, suite_id):
             return False
         
-        self.added_test_cases.add(case_title)
-        
-        # Extract all relevant fields from TestRail
-        description = case.get('custom_preconds', '')
-        steps = self.format_steps(case.get('custom_steps', ''))
-        expected_result = case.get('custom_expected', '')
-        priority_id = case.get('priority_id', 2)  # Default to Medium
-        automation_status = case.get('custom_case_automated', 0)
-        case_type = case.get('type_id', '')
-        template = case.get('template_id', '')
-        estimate = case.get('estimate', '')
-        milestone = case.get('milestone_id', '')
-        references = case.get('refs', '')
-        
-        # Map priority from TestRail to ADO
-        ado_priority = self.priority_mapping.get(priority_id, 3)
-        automation_text = self.automation_status_mapping.get(automation_status, "Not Automated")
-        
-        # Build comprehensive description
-        description_parts = []
-        if description:
-            description_parts.append(f"<b>Prerequisites:</b><br>{description}")
-        if expected_result:
-            description_parts.append(f"<b>Expected Result:</b><br>{expected_result}")
-        
-        description_parts.append(f"<b>Automation Status:</b> {automation_text}")
-        
-        if estimate:
-            description_parts.append(f"<b>Estimate:</b> {estimate}")
-        if references:
-            description_parts.append(f"<b>References:</b> {references}")
-        
-        full_description = "<br><br>".join(description_parts)
-        
-        # Create work item payload
-        work_item_payload = [
-            {"op": "add", "path": "/fields/System.Title", "value": case_title},
-            {"op": "add", "path": "/fields/System.Description", "value": full_description},
-            {"op": "add", "path": "/fields/Microsoft.VSTS.Common.Priority", "value": ado_priority}
-        ]
-        
-        # Add steps if available
-        if steps:
-            work_item_payload.append({
-                "op": "add", 
-                "path": "/fields/Microsoft.VSTS.TCM.Steps", 
-                "value": steps
-            })
-        
-        # Add tags for automation status
-        work_item_payload.append({
-            "op": "add",
-            "path": "/fields/System.Tags",
-            "value": f"AutomationStatus:{automation_text.replace(' ', '')}"
-        })
-        
-        logger.info(f"Creating test case: {case_title}")
-        
-        # Create the work item
-        url = f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/workitems/$Test%20Case?api-version=6.0"
-        headers = {
-            "Content-Type": "application/json-patch+json",
-            "Authorization": ado_headers["Authorization"]
-        }
+        work_item_payload = self.build_test_case_payload(case)
+        if not self.validate_payload(case, work_item_payload):
+            return False
+        
+        logger.info(f"Creating test case: {case_title}", extra=sampled(case_id=case.get('id'), suite_id=suite_id))
+        
+        # Create the work item. A POST is not idempotent, so when its outcome is
+        # unknown ADO is asked whether the case landed before trying again.
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/workitems/$Test%20Case?api-version=6.0"
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = self.make_request('POST', url, ado_patch_headers, self.stamp_run(work_item_payload))
+                if response.status_code not in (500, 502, 503, 504):
+                    break
+                logger.warning(f"⚠️ Creating '{case_title}' returned {response.status_code}")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                response = None
+            
+            if case.get('id') is None or attempt == MAX_RETRIES:
+                break
+            try:
+                existing = self.find_migrated_work_items([case['id']]).get(case['id'])
+            except requests.exceptions.RequestException as e:
+                # Sending it again could duplicate the case, so it is left for a later run to reconcile
+                logger.error(f"❌ Failed to create work item '{case_title}': could not check whether it was "
+                             f"created ({e}); not retrying it", extra={'case_id': case['id'], 'suite_id': suite_id})
+                return False
+            if existing:
+                logger.info(f"✅ Test case '{case_title}' was already created as {existing}",
+                            extra=sampled(case_id=case['id'], suite_id=suite_id, work_item_id=existing))
+                self.record_test_case_created(case, existing, suite_id, work_item_payload)
+                return True
+            time.sleep(self.backoff_delay(attempt))
         
-        response = self.make_request('POST', url, ado_auth, headers, work_item_payload)
+        if response is None:
+            logger.error(f"❌ Failed to create work item '{case_title}': no response from ADO",
+                         extra={'case_id': case.get('id'), 'suite_id': suite_id})
+            return False
         
         if response.status_code not in [200, 201]:
-            logger.error(f"❌ Failed to create work item: {response.status_code} → {response.text}")
+            logger.error(f"❌ Failed to create work item: {response.status_code} → {response.text}",
+                         extra={'case_id': case.get('id'), 'suite_id': suite_id, 'status': response.status_code})
             return False
         
         try:
@@ -310,35 +1096,574 @@ class TestRailMigrator:
                 logger.error(f"❌ Created item is not a Test Case (got: {work_item_type})")
                 return False
             
-            logger.info(f"✅ Created test case: https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_workitems/edit/{test_case_id}")
+            logger.info(f"✅ Created test case: {ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_workitems/edit/{test_case_id}",
+                        extra=sampled(case_id=case.get('id'), suite_id=suite_id, work_item_id=test_case_id))
             
-            # Add test case to suite
-            return self.add_test_case_to_suite(test_case_id, suite_id)
+            self.record_test_case_created(case, test_case_id, suite_id, work_item_payload)
+            return True
             
         except json.JSONDecodeError as e:
             logger.error(f"❌ Failed to parse JSON response: {e}\nResponse: {response.text}")
             return False
     
+    def create_ado_test_cases_batch(self, batch: List[Tuple[dict, int]], payloads: Future = None) -> int:
+        """Create test cases through the work item $batch API; returns how many succeeded.
+        
+        ``batch`` holds up to ADO_BATCH_SIZE (case, suite_id) pairs. ``payloads``
+        optionally resolves to their JSON-patch documents, built ahead of time by
+        the transform process pool. Each result is mapped back to its source case
+        by position. Items that fail with a throttling or server error are
+        retried on their own, up to ADO_BATCH_MAX_RETRIES times; the rest of the
+        batch is not re-sent. After a failure that may have created items, they
+        are looked up by their TestRail ID first; items without one, or all of
+        them if the lookup fails, are not retried, so no retry can duplicate a
+        test case.
+        """
+        built = payloads.result() if payloads is not None else [None] * len(batch)
+        if payloads is not None:
+            self.metrics.add('cases_transformed', len(built))
+        pending = [(case, suite_id, payload or self.build_test_case_payload(case))
+                   for (case, suite_id), payload in zip(batch, built) if self.claim_test_case(case, suite_id)]
+        pending = [(case, suite_id, payload) for case, suite_id, payload in pending
+                   if self.validate_payload(case, payload)]
+        
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/_apis/wit/$batch?api-version=6.0"
+        item_uri = f"/{ADO_PROJECT}/_apis/wit/workitems/$Test%20Case?api-version=6.0"
+        created = 0
+        # Whether the last attempt may have created some of the pending items
+        outcome_unknown = False
+        
+        for attempt in range(ADO_BATCH_MAX_RETRIES + 1):
+            if not pending:
+                break
+            if attempt and outcome_unknown:
+                # Items whose earlier outcome was unknown may have been created after all
+                untraceable = [case for case, _, _ in pending if case.get('id') is None]
+                if untraceable:
+                    logger.error(f"❌ Not retrying {len(untraceable)} test cases without a TestRail ID: "
+                                 f"there is no way to check whether they were created",
+                                 extra={'count': len(untraceable)})
+                    pending = [(case, suite_id, payload) for case, suite_id, payload in pending
+                               if case.get('id') is not None]
+                try:
+                    existing = self.find_migrated_work_items([case['id'] for case, _, _ in pending])
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"❌ Not retrying {len(pending)} test cases: could not check whether they were "
+                                 f"created ({e})", extra={'count': len(pending)})
+                    break
+                still_pending = []
+                for case, suite_id, payload in pending:
+                    if case.get('id') in existing:
+                        self.record_test_case_created(case, existing[case['id']], suite_id, payload)
+                        created += 1
+                    else:
+                        still_pending.append((case, suite_id, payload))
+                pending = still_pending
+                if not pending:
+                    break
+            if attempt:
+                logger.warning(f"⚠️ Retrying {len(pending)} failed test cases from batch (attempt {attempt + 1})")
+            
+            logger.info(f"Creating {len(pending)} test cases in one batch", extra=sampled(count=len(pending)))
+            operations = [{
+                "method": "PATCH",
+                "uri": item_uri,
+                "headers": {"Content-Type": "application/json-patch+json"},
+                "body": self.stamp_run(payload)
+            } for _, _, payload in pending]
+            
+            try:
+                response = self.make_request('POST', url, ado_headers, operations)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                outcome_unknown = True
+                time.sleep(self.backoff_delay(attempt))
+                continue
+            if response.status_code != 200:
+                logger.error(f"❌ Work item batch request failed: {response.status_code} → {response.text}")
+                if response.status_code != 429 and response.status_code < 500:
+                    break
+                # A throttled batch was never processed; a server error may have been part-way
+                outcome_unknown = response.status_code != 429
+                continue
+            
+            results = response.json().get("value", [])
+            # Items that failed with a server error, or are missing from a truncated response, may exist
+            outcome_unknown = len(results) < len(pending)
+            retry = []
+            for (case, suite_id, payload), result in zip(pending, results):
+                case_title = case.get('title', 'Untitled Test Case')
+                code = result.get("code")
+                if code not in [200, 201]:
+                    logger.error(f"❌ Failed to create work item '{case_title}': {code} → {result.get('body')}",
+                                 extra={'case_id': case.get('id'), 'suite_id': suite_id, 'status': code})
+                    if code == 429 or (code or 500) >= 500:
+                        retry.append((case, suite_id, payload))
+                        outcome_unknown = outcome_unknown or code != 429
+                    continue
+                
+                try:
+                    body = json.loads(result.get("body") or "{}")
+                except json.JSONDecodeError as e:
+                    logger.error(f"❌ Failed to parse batch result for '{case_title}': {e}")
+                    continue
+                
+                test_case_id = body.get('id')
+                work_item_type = body.get('fields', {}).get('System.WorkItemType', '')
+                if work_item_type != "Test Case":
+                    logger.error(f"❌ Created item is not a Test Case (got: {work_item_type})")
+                    continue
+                
+                logger.info(f"✅ Created test case: {ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_workitems/edit/{test_case_id}",
+                            extra=sampled(case_id=case.get('id'), suite_id=suite_id, work_item_id=test_case_id))
+                self.record_test_case_created(case, test_case_id, suite_id, payload)
+                created += 1
+            
+            # Results missing from a truncated response are retried as well
+            pending = retry + pending[len(results):]
+        
+        return created
+    
+    def read_work_items(self, work_item_ids: List[int], fields: List[str]) -> List[dict]:
+        """Read the fields of up to ADO_BATCH_SIZE work items with one workitemsbatch call; raises if it fails.
+        
+        Work items that no longer exist are left out.
+        """
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/workitemsbatch?api-version=6.0"
+        payload = {"ids": work_item_ids, "fields": fields, "errorPolicy": "omit"}
+        response = self.make_request('POST', url, ado_headers, payload, idempotent=True)
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(
+                f"Failed to read work items: {response.status_code} - {response.text}", response=response
+            )
+        return [item for item in response.json().get('value', []) if item]
+    
+    def fetch_work_items(self, work_item_ids: List[int], fields: List[str]) -> List[dict]:
+        """Read work item fields in bulk through workitemsbatch, ADO_BATCH_SIZE IDs per call"""
+        chunks = [work_item_ids[start:start + ADO_BATCH_SIZE] for start in range(0, len(work_item_ids), ADO_BATCH_SIZE)]
+        if len(chunks) <= 1:
+            return self.read_work_items(chunks[0], fields) if chunks else []
+        with ThreadPoolExecutor(max_workers=ADO_WRITE_CONCURRENCY, thread_name_prefix='ado-reader') as readers:
+            return [item for items in readers.map(self.read_work_items, chunks, itertools.repeat(fields))
+                    for item in items]
+    
+    def iter_work_items(self, work_item_ids: List[int], fields: List[str]) -> Iterator[List[dict]]:
+        """Yield work items chunk by chunk as concurrent workitemsbatch reads complete.
+        
+        At most twice ADO_WRITE_CONCURRENCY chunks are read ahead, so only a
+        bounded number of work items is held at a time.
+        """
+        with ThreadPoolExecutor(max_workers=ADO_WRITE_CONCURRENCY, thread_name_prefix='ado-reader') as readers:
+            in_flight = set()
+            for start in range(0, len(work_item_ids), ADO_BATCH_SIZE):
+                if len(in_flight) >= ADO_WRITE_CONCURRENCY * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                in_flight.add(readers.submit(self.read_work_items, work_item_ids[start:start + ADO_BATCH_SIZE], fields))
+            for future in as_completed(in_flight):
+                yield future.result()
+    
+    def query_work_item_ids(self, condition: str) -> List[int]:
+        """Return the IDs of every work item matching a WIQL condition, paging past the WIQL result cap.
+        
+        Raises when a page cannot be read, so a partial result is never taken
+        for the whole.
+        """
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/wiql?$top={WIQL_PAGE_SIZE}&api-version=6.0"
+        work_item_ids = []
+        last_id = 0
+        while True:
+            query = (f"SELECT [System.Id] FROM WorkItems WHERE [System.TeamProject] = @project "
+                     f"AND ({condition}) AND [System.Id] > {last_id} ORDER BY [System.Id]")
+            response = self.make_request('POST', url, ado_headers, {"query": query}, idempotent=True)
+            if response.status_code != 200:
+                raise requests.exceptions.HTTPError(
+                    f"WIQL query failed: {response.status_code} - {response.text}", response=response
+                )
+            page = [item['id'] for item in response.json().get('workItems', [])]
+            work_item_ids.extend(page)
+            if len(page) < WIQL_PAGE_SIZE:
+                return work_item_ids
+            last_id = page[-1]
+    
+    def find_migrated_work_items(self, case_ids: List[int]) -> Dict[int, int]:
+        """Map TestRail case IDs to Test Case work items already tagged with them in ADO"""
+        wanted = set(case_ids)
+        if not wanted:
+            return {}
+        
+        clauses = ' OR '.join(f"[System.Tags] CONTAINS '{TESTRAIL_ID_TAG_PREFIX}{case_id}'" for case_id in wanted)
+        work_item_ids = self.query_work_item_ids(f"[System.WorkItemType] = 'Test Case' AND ({clauses})")
+        
+        found = {}
+        for item in self.fetch_work_items(work_item_ids, ["System.Id", "System.Tags"]):
+            case_id = parse_testrail_case_id(item.get('fields', {}).get('System.Tags', ''), TESTRAIL_ID_TAG_PREFIX)
+            if case_id in wanted:
+                found[case_id] = item['id']
+        return found
+    
+    def iter_suite_test_case_ids(self, suite_id: int) -> Iterator[int]:
+        """Yield the IDs of every test case in a suite, following continuation tokens.
+        
+        Raises when a page cannot be read, so a partial listing is never taken
+        for the whole suite.
+        """
+        url = (f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/testplan/Plans/{self.ado_plan_id}"
+               f"/Suites/{suite_id}/TestCase?witFields=System.Id&api-version=7.0")
+        continuation_token = None
+        while True:
+            page_url = f"{url}&continuationToken={continuation_token}" if continuation_token else url
+            response = self.make_request('GET', page_url, ado_headers)
+            if response.status_code != 200:
+                raise requests.exceptions.HTTPError(
+                    f"Failed to list test cases of suite {suite_id}: {response.status_code} - {response.text}",
+                    response=response
+                )
+            for entry in response.json().get('value', []):
+                yield int(entry['workItem']['id'])
+            continuation_token = response.headers.get('x-ms-continuationtoken')
+            if not continuation_token:
+                return
+    
+    def build_case_index(self, suite_ids: Iterable[int] = ()):
+        """Index Test Cases created by earlier runs, with one WIQL query and bulk hydration.
+        
+        The members of ``suite_ids`` are listed as well, so adopted cases that
+        are already in their suite are not added to it again.
+        """
+        logger.info("Indexing existing test cases in ADO...")
+        condition = "[System.WorkItemType] = 'Test Case'"
+        if ADO_AREA_PATH:
+            condition += f" AND [System.AreaPath] UNDER '{ADO_AREA_PATH}'"
+        work_item_ids = self.query_work_item_ids(condition)
+        items = self.fetch_work_items(work_item_ids, ["System.Id", "System.Title", "System.Tags"])
+        
+        untagged = {}
+        for item in items:
+            fields = item.get('fields', {})
+            case_id = parse_testrail_case_id(fields.get('System.Tags', ''), TESTRAIL_ID_TAG_PREFIX)
+            if case_id is not None:
+                self.case_index.add(item['id'], testrail_case_id=case_id)
+            else:
+                untagged[item['id']] = fields.get('System.Title', '')
+        
+        # Untagged items predate TestRail ID tags; key them by title within each suite holding them.
+        # Without any existing items there is nothing to adopt, so no suite needs listing.
+        listed = (set(suite_ids) | (set(self.suite_index.names) if untagged else set())) if items else set()
+        if listed:
+            def suite_members(suite_id: int) -> Tuple[int, List[int]]:
+                return suite_id, list(self.iter_suite_test_case_ids(suite_id))
+            
+            suites_by_item = {}
+            with ThreadPoolExecutor(max_workers=ADO_WRITE_CONCURRENCY, thread_name_prefix='ado-reader') as readers:
+                for suite_id, member_ids in readers.map(suite_members, sorted(listed)):
+                    self.case_index.add_suite_members(suite_id, member_ids)
+                    for work_item_id in member_ids:
+                        if work_item_id in untagged:
+                            suites_by_item.setdefault(work_item_id, []).append(suite_id)
+            for work_item_id, item_suite_ids in suites_by_item.items():
+                self.case_index.add(work_item_id, title=untagged[work_item_id], suite_ids=item_suite_ids)
+        
+        logger.info(f"Indexed {len(items)} existing test cases ({len(untagged)} without a TestRail ID tag)")
+    
+    def record_test_case_created(self, case: dict, test_case_id: int, suite_id: int,
+                                 work_item_payload: List[dict]):
+        """Checkpoint a created work item and queue it for bulk addition to its suite"""
+        if case.get('id') is not None:
+            self.journal.record_created(case['id'], test_case_id, suite_id, content_hash(work_item_payload))
+        self.metrics.add('cases_created')
+        self.queue_suite_addition(test_case_id, suite_id)
+        if self.attachment_pool is not None and case.get('id') is not None:
+            self.attachment_pool.submit(self.migrate_case_attachments, case, test_case_id)
+    
+    def update_ado_test_case(self, case: dict, test_case_id: int, work_item_payload: List[dict]) -> bool:
+        """Overwrite the mapped fields of an already migrated test case"""
+        case_title = case.get('title', 'Untitled Test Case')
+        logger.info(f"Updating test case {test_case_id}: {case_title}",
+                    extra=sampled(case_id=case.get('id'), work_item_id=test_case_id))
+        
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/workitems/{test_case_id}?api-version=6.0"
+        # Links the case already has would be rejected as duplicates, so only fields are patched
+        fields = [operation for operation in work_item_payload if operation['path'] != '/relations/-']
+        if not self.validate_payload(case, fields):
+            return False
+        try:
+            current = self.read_work_items([test_case_id], ["System.Tags"])
+        except requests.exceptions.RequestException:
+            current = []
+        if not current:
+            logger.error(f"❌ Failed to update work item {test_case_id}: could not read its current tags",
+                         extra={'case_id': case.get('id'), 'work_item_id': test_case_id})
+            return False
+        fields = self.merge_tags(fields, current[0].get('fields', {}).get('System.Tags', ''))
+        response = self.make_request('PATCH', url, ado_patch_headers, fields)
+        
+        if response.status_code != 200:
+            logger.error(f"❌ Failed to update work item {test_case_id}: {response.status_code} → {response.text}",
+                         extra={'case_id': case.get('id'), 'work_item_id': test_case_id, 'status': response.status_code})
+            return False
+        
+        self.journal.record_content_hash(case['id'], content_hash(work_item_payload))
+        with self.stats_lock:
+            self.total_cases_updated += 1
+        self.metrics.add('cases_updated')
+        logger.info(f"✅ Updated test case: {ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_workitems/edit/{test_case_id}",
+                    extra=sampled(case_id=case.get('id'), work_item_id=test_case_id))
+        return True
+    
+    def fetch_case_attachments(self, case_id: int) -> List[dict]:
+        """List the attachments of a TestRail case"""
+        attachments = []
+        for page in self.iter_testrail_pages(f'get_attachments_for_case/{case_id}', 'attachments', cacheable=False):
+            attachments.extend(page)
+        return attachments
+    
+    def download_testrail_attachment(self, attachment_id: Any) -> Tuple[Any, str, int]:
+        """Stream a TestRail attachment to a temp file; returns (file, SHA-256, size)"""
+        url = f'{TESTRAIL_URL}index.php?/api/v2/get_attachment/{attachment_id}'
+        response = self.make_request('GET', url, timeout=ATTACHMENT_TIMEOUT, stream=True)
+        with response:
+            if response.status_code != 200:
+                raise Exception(f"TestRail returned {response.status_code} for attachment {attachment_id}")
+            return spool(response.iter_content(ATTACHMENT_CHUNK_SIZE))
+    
+    def upload_ado_attachment(self, file_name: str, f: Any, size: int) -> str:
+        """Upload a file as an ADO work item attachment and return its URL.
+        
+        Small files are sent in one request. Larger ones go through the chunked
+        upload API, reading and sending one chunk at a time.
+        """
+        base_url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/attachments"
+        query = f"fileName={quote(file_name)}&api-version=6.0"
+        octet_headers = {'Content-Type': 'application/octet-stream'}
+        
+        # A repeated upload only leaves an unreferenced blob, so uploads are safe to retry
+        if size <= ATTACHMENT_CHUNK_SIZE:
+            response = self.make_request('POST', f"{base_url}?{query}", octet_headers, data=f.read(),
+                                         timeout=ATTACHMENT_TIMEOUT, idempotent=True)
+            if response.status_code not in (200, 201):
+                raise Exception(f"ADO rejected attachment '{file_name}': {response.status_code} → {response.text}")
+            return response.json()['url']
+        
+        response = self.make_request('POST', f"{base_url}?uploadType=Chunked&{query}", octet_headers,
+                                     data=b'', idempotent=True)
+        if response.status_code not in (200, 201):
+            raise Exception(f"ADO refused chunked upload of '{file_name}': {response.status_code} → {response.text}")
+        upload = response.json()
+        
+        for offset, chunk in read_chunks(f):
+            response = self.make_request(
+                'PUT', f"{base_url}/{upload['id']}?uploadType=Chunked&{query}",
+                {**octet_headers, 'Content-Range': f"bytes {offset}-{offset + len(chunk) - 1}/{size}"},
+                data=chunk, timeout=ATTACHMENT_TIMEOUT
+            )
+            if response.status_code not in (200, 201):
+                raise Exception(f"ADO rejected chunk at {offset} of '{file_name}': {response.status_code} → {response.text}")
+        return upload['url']
+    
+    def migrate_attachment(self, attachment: dict) -> str:
+        """Copy one TestRail attachment to ADO, uploading each distinct file only once"""
+        attachment_id = attachment['id']
+        url = self.attachments.url_for_attachment(attachment_id)
+        if url:
+            return url
+        
+        spooled, digest, size = self.download_testrail_attachment(attachment_id)
+        with spooled:
+            upload, owner = self.attachments.claim(digest)
+            if owner:
+                try:
+                    upload.set_result(self.upload_ado_attachment(attachment.get('name') or str(attachment_id), spooled, size))
+                except Exception as e:
+                    self.attachments.release(digest, e)
+                    raise
+                logger.info(f"✅ Uploaded attachment '{attachment.get('name')}' ({size} bytes)", extra=sampled())
+        url = upload.result()
+        self.attachments.remember_attachment(attachment_id, url)
+        return url
+    
+    def migrate_case_attachments(self, case: dict, test_case_id: int) -> int:
+        """Upload a case's attachments and link them to its work item; returns the number linked.
+        
+        All links are added with one request; once it went through, the
+        journal records the case's attachments as done, so a resumed run
+        does not link them twice.
+        """
+        try:
+            attachments = self.fetch_case_attachments(case['id'])
+        except Exception as e:
+            logger.error(f"❌ Could not list attachments of case {case['id']}: {e}")
+            with self.stats_lock:
+                self.total_attachments_failed += 1
+            return 0
+        
+        urls = []
+        failed = 0
+        for attachment in attachments:
+            try:
+                url = self.migrate_attachment(attachment)
+            except Exception as e:
+                logger.error(f"❌ Failed to migrate attachment '{attachment.get('name')}' of case {case['id']}: {e}")
+                failed += 1
+                continue
+            # ADO rejects a second relation to the same attachment
+            if url not in urls:
+                urls.append(url)
+        
+        if urls:
+            relations = [
+                {"op": "add", "path": "/relations/-", "value": {
+                    "rel": "AttachedFile",
+                    "url": url,
+                    "attributes": {"comment": f"Migrated from TestRail case C{case['id']}"}
+                }}
+                for url in urls
+            ]
+            url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/workitems/{test_case_id}?api-version=6.0"
+            response = self.make_request('PATCH', url, ado_patch_headers, relations)
+            if response.status_code != 200:
+                logger.error(f"❌ Failed to link attachments to work item {test_case_id}: {response.status_code} → {response.text}")
+                failed += len(urls)
+                urls = []
+            else:
+                self.journal.record_attachments_done(case['id'])
+        elif not failed:
+            self.journal.record_attachments_done(case['id'])
+        
+        with self.stats_lock:
+            self.total_attachments_linked += len(urls)
+            self.total_attachments_failed += failed
+        self.metrics.add('attachments_linked', len(urls))
+        return len(urls)
+    
     def add_test_case_to_suite(self, test_case_id: int, suite_id: int) -> bool:
         """Add test case to ADO test suite"""
-        url = f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{ADO_PLAN_ID}/suites/{suite_id}/testcases/{test_case_id}?api-version=6.0"
+        return not self.add_test_cases_to_suite([test_case_id], suite_id)
+    
+    def add_test_cases_to_suite(self, test_case_ids: List[int], suite_id: int) -> List[int]:
+        """Add many test cases to an ADO test suite in one request; returns the rejected IDs.
+        
+        ADO leaves test cases the suite already holds out of its response, so
+        IDs missing from it only count as rejected if the suite listing does
+        not have them either.
+        """
+        if ADO_SUITE_ADD_API == "testplan":
+            url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/testplan/Plans/{self.ado_plan_id}/Suites/{suite_id}/TestCase?api-version=7.0"
+            payload = [{"workItem": {"id": test_case_id}} for test_case_id in test_case_ids]
+        else:
+            ids = ','.join(str(test_case_id) for test_case_id in test_case_ids)
+            url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{self.ado_plan_id}/suites/{suite_id}/testcases/{ids}?api-version=6.0"
+            payload = None
         
-        response = self.make_request('POST', url, ado_auth, ado_headers)
+        try:
+            response = self.make_request('POST', url, ado_headers, payload)
+        except requests.exceptions.RequestException:
+            return list(test_case_ids)
         
         if response.status_code not in [200, 201]:
-            logger.error(f"❌ Failed to add test case {test_case_id} to suite {suite_id}: {response.status_code} → {response.text}")
-            return False
+            logger.error(f"❌ Failed to add {len(test_case_ids)} test cases to suite {suite_id}: {response.status_code} → {response.text}")
+            return list(test_case_ids)
         
-        logger.info(f"✅ Added test case {test_case_id} to suite {suite_id}")
-        return True
+        try:
+            added = response.json().get("value", [])
+        except (json.JSONDecodeError, AttributeError):
+            added = []
+        accepted = set()
+        for entry in added:
+            test_case = entry.get("testCase") or entry.get("workItem") or {}
+            if test_case.get("id") is not None:
+                accepted.add(int(test_case["id"]))
+        
+        rejected = [test_case_id for test_case_id in test_case_ids if int(test_case_id) not in accepted]
+        if rejected:
+            try:
+                members = set(self.iter_suite_test_case_ids(suite_id))
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"⚠️ Could not check which of {len(rejected)} test cases suite {suite_id} "
+                               f"already holds: {e}")
+                members = set()
+            rejected = [test_case_id for test_case_id in rejected if int(test_case_id) not in members]
+        self.metrics.add('cases_linked', len(test_case_ids) - len(rejected))
+        logger.info(f"✅ Added {len(test_case_ids) - len(rejected)} test cases to suite {suite_id}",
+                    extra=sampled(suite_id=suite_id, count=len(test_case_ids) - len(rejected)))
+        if rejected:
+            logger.error(f"❌ Suite {suite_id} rejected {len(rejected)} test cases: {sample_ids(rejected)}",
+                         extra={'suite_id': suite_id, 'count': len(rejected)})
+        return rejected
+    
+    def queue_suite_addition(self, test_case_id: int, suite_id: int):
+        """Queue a test case for suite membership, flushing the suite once its chunk is full"""
+        with self.suite_additions_lock:
+            pending = self.pending_suite_additions.setdefault(suite_id, [])
+            pending.append(test_case_id)
+            full = len(pending) >= ADO_SUITE_ADD_CHUNK_SIZE
+        if full:
+            self.flush_suite_additions(suite_id)
+    
+    def flush_suite_additions(self, suite_id: Optional[int] = None):
+        """Send queued suite memberships for one suite, or for every suite if none is given"""
+        with self.suite_additions_lock:
+            suite_ids = list(self.pending_suite_additions) if suite_id is None else [suite_id]
+            batches = [(sid, self.pending_suite_additions.pop(sid, [])) for sid in suite_ids]
+        
+        for sid, test_case_ids in batches:
+            for start in range(0, len(test_case_ids), ADO_SUITE_ADD_CHUNK_SIZE):
+                chunk = test_case_ids[start:start + ADO_SUITE_ADD_CHUNK_SIZE]
+                rejected = self.add_test_cases_to_suite(chunk, sid)
+                self.journal.record_in_suite(set(chunk).difference(rejected), sid)
+                if rejected:
+                    with self.suite_additions_lock:
+                        self.rejected_suite_additions.setdefault(sid, []).extend(rejected)
+    
+    def track_suite_writes(self, future: Future, suite_ids: Iterable[int]):
+        """Count a job writing cases of ``suite_ids`` until it finishes"""
+        suite_ids = set(suite_ids)
+        with self.suite_additions_lock:
+            for suite_id in suite_ids:
+                self.suite_writes[suite_id] = self.suite_writes.get(suite_id, 0) + 1
+        future.add_done_callback(lambda _: self.suite_writes_done(suite_ids))
+    
+    def suite_writes_done(self, suite_ids: Iterable[int]):
+        """Flush the memberships of finished suites whose last write job just completed"""
+        with self.suite_additions_lock:
+            for suite_id in suite_ids:
+                self.suite_writes[suite_id] -= 1
+            ready = [suite_id for suite_id in suite_ids
+                     if not self.suite_writes[suite_id] and suite_id in self.finished_suites]
+        for suite_id in ready:
+            self.flush_suite_additions(suite_id)
+    
+    def finish_suite(self, suite_id: int) -> bool:
+        """Mark every case of a suite as handed to writers; returns whether its memberships can be flushed now.
+        
+        Otherwise the suite is flushed by its last write job as it completes.
+        """
+        with self.suite_additions_lock:
+            self.finished_suites.add(suite_id)
+            return not self.suite_writes.get(suite_id)
+    
+    def retry_rejected_suite_additions(self) -> Dict[int, List[int]]:
+        """Re-send only the previously rejected suite memberships; returns those still rejected"""
+        with self.suite_additions_lock:
+            retries, self.rejected_suite_additions = self.rejected_suite_additions, {}
+        
+        for suite_id, test_case_ids in retries.items():
+            logger.info(f"Retrying {len(test_case_ids)} rejected test cases for suite {suite_id}")
+            for start in range(0, len(test_case_ids), ADO_SUITE_ADD_CHUNK_SIZE):
+                chunk = test_case_ids[start:start + ADO_SUITE_ADD_CHUNK_SIZE]
+                rejected = self.add_test_cases_to_suite(chunk, suite_id)
+                self.journal.record_in_suite(set(chunk).difference(rejected), suite_id)
+                if rejected:
+                    self.rejected_suite_additions.setdefault(suite_id, []).extend(rejected)
+        return self.rejected_suite_additions
     
     def test_ado_authentication(self) -> bool:
         """Test Azure DevOps authentication and permissions"""
         logger.info("Testing Azure DevOps authentication...")
         
         # Test basic project access
-        url = f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/projects/{ADO_PROJECT}?api-version=6.0"
-        response = self.make_request('GET', url, ado_auth, ado_headers)
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/projects/{ADO_PROJECT}?api-version=6.0"
+        response = self.make_request('GET', url, ado_headers)
         
         if response.status_code == 401:
             logger.error("❌ Authentication failed. Please check your Personal Access Token (PAT).")
@@ -351,88 +1676,799 @@ class TestRailMigrator:
             return False
         
         # Test test plan access
-        url = f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{ADO_PLAN_ID}?api-version=6.0"
-        response = self.make_request('GET', url, ado_auth, ado_headers)
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/test/plans/{self.ado_plan_id}?api-version=6.0"
+        response = self.make_request('GET', url, ado_headers)
         
         if response.status_code != 200:
-            logger.error(f"❌ Failed to access test plan {ADO_PLAN_ID}: {response.status_code} - {response.text}")
+            logger.error(f"❌ Failed to access test plan {self.ado_plan_id}: {response.status_code} - {response.text}")
             return False
         
         logger.info("✅ Azure DevOps authentication successful!")
         return True
     
-    def migrate(self):
-        """Main migration method"""
+    def collect_case_results(self, in_flight: Dict[Future, List[dict]]) -> Tuple[int, int]:
+        """Wait for at least one in-flight job to finish; returns (created, failed).
+        
+        Each job covers a list of cases and its result is either a bool (single
+        case) or the number of cases it created (batch).
+        """
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        created = failed = 0
+        for future in done:
+            cases = in_flight.pop(future)
+            try:
+                succeeded = int(future.result())
+            except Exception as e:
+                titles = ', '.join(f"'{case.get('title', 'Unknown')}'" for case in cases[:3])
+                logger.error(f"❌ Error creating test case(s) {titles}: {e}")
+                succeeded = 0
+            created += succeeded
+            failed += len(cases) - succeeded
+        return created, failed
+    
+    def build_test_point_index(self) -> TestPointIndex:
+        """Index the test points of every suite holding migrated cases, one paginated listing per suite"""
+        points = TestPointIndex()
+        
+        def index_suite(suite_id: int):
+            url = (f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/testplan/Plans/{self.ado_plan_id}"
+                   f"/Suites/{suite_id}/TestPoint?api-version=7.0")
+            continuation_token = None
+            while True:
+                page_url = f"{url}&continuationToken={continuation_token}" if continuation_token else url
+                response = self.make_request('GET', page_url, ado_headers)
+                if response.status_code != 200:
+                    logger.warning(f"Failed to list test points of suite {suite_id}: {response.status_code} - {response.text}")
+                    return
+                for point in response.json().get('value', []):
+                    test_case = point.get('testCaseReference') or {}
+                    if test_case.get('id') is not None:
+                        points.add(point['id'], test_case['id'], suite_id)
+                continuation_token = response.headers.get('x-ms-continuationtoken')
+                if not continuation_token:
+                    return
+        
+        logger.info("Indexing test points of migrated suites...")
+        with ThreadPoolExecutor(max_workers=ADO_WRITE_CONCURRENCY, thread_name_prefix='ado-reader') as readers:
+            list(readers.map(index_suite, self.journal.suite_ids()))
+        logger.info(f"Indexed {len(points)} test points")
+        return points
+    
+    def fetch_runs(self) -> List[dict]:
+        """Fetch the suite's test runs from TestRail"""
+        logger.info("Fetching test runs from TestRail...")
+        runs = []
+        for page in self.iter_testrail_pages(
+            f'get_runs/{self.testrail_project_id}', 'runs', {'suite_id': self.testrail_suite_id}
+        ):
+            runs.extend(page)
+        logger.info(f"Found {len(runs)} test runs")
+        return runs
+    
+    def create_ado_test_run(self, run: dict) -> Optional[int]:
+        """Create an ADO test run in the plan for a TestRail run"""
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/test/runs?api-version=6.0"
+        comment = f"Migrated from TestRail run R{run['id']}"
+        if run.get('description'):
+            comment += f"\n{run['description']}"
+        payload = {
+            "name": run.get('name') or f"R{run['id']}",
+            "plan": {"id": str(self.ado_plan_id)},
+            "isAutomated": False,
+            "state": "InProgress",
+            "comment": comment[:1000]
+        }
+        if run.get('created_on'):
+            payload["startedDate"] = iso_timestamp(run['created_on'])
+        
+        response = self.make_request('POST', url, ado_headers, payload)
+        if response.status_code not in [200, 201]:
+            logger.error(f"❌ Failed to create test run '{payload['name']}': {response.status_code} → {response.text}")
+            return None
+        return response.json()['id']
+    
+    def add_test_run_results(self, ado_run_id: int, results: List[dict]) -> bool:
+        """Post a batch of results to an ADO test run in one request"""
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/test/Runs/{ado_run_id}/results?api-version=6.0"
+        response = self.make_request('POST', url, ado_headers, results)
+        if response.status_code not in [200, 201]:
+            logger.error(f"❌ Failed to add {len(results)} results to test run {ado_run_id}: {response.status_code} → {response.text}")
+            return False
+        return True
+    
+    def complete_ado_test_run(self, ado_run_id: int, run: dict) -> bool:
+        """Mark an ADO test run completed"""
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/test/runs/{ado_run_id}?api-version=6.0"
+        payload = {"state": "Completed"}
+        if run.get('completed_on'):
+            payload["completedDate"] = iso_timestamp(run['completed_on'])
+        response = self.make_request('PATCH', url, ado_headers, payload)
+        if response.status_code != 200:
+            logger.error(f"❌ Failed to complete test run {ado_run_id}: {response.status_code} → {response.text}")
+            return False
+        return True
+    
+    def delete_ado_test_run(self, ado_run_id: int) -> bool:
+        """Delete a partially migrated or rolled back ADO test run"""
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/test/runs/{ado_run_id}?api-version=6.0"
+        response = self.make_request('DELETE', url, ado_headers)
+        if response.status_code not in (200, 204, 404):
+            logger.warning(f"Failed to delete test run {ado_run_id}: {response.status_code} - {response.text}")
+            return False
+        return True
+    
+    def migrate_test_run(self, run: dict, points: TestPointIndex) -> Optional[Tuple[int, int]]:
+        """Copy one TestRail run and its results to ADO; returns (results posted, results unmapped).
+        
+        Results are streamed page by page and posted RESULTS_BATCH_SIZE at a
+        time. Each resolves to its test point through the test's case ID, the
+        journal and the point index, without a query of its own. Returns None
+        for runs already migrated by an earlier run; a run left incomplete is
+        deleted and migrated again.
+        """
+        state_key = f"run:{run['id']}"
+        saved = self.journal.get_state(state_key)
+        if saved:
+            saved = json.loads(saved)
+            if saved.get('completed'):
+                return None
+            logger.warning(f"⚠️ Re-migrating interrupted run R{run['id']}")
+            self.delete_ado_test_run(saved['ado_run_id'])
+        
+        # Results reference tests, which map to cases
+        tests = {}
+        for page in self.iter_testrail_pages(f"get_tests/{run['id']}", 'tests', cacheable=False):
+            for test in page:
+                tests[test['id']] = (test.get('case_id'), test.get('title') or '')
+        
+        ado_run_id = self.create_ado_test_run(run)
+        if ado_run_id is None:
+            raise Exception(f"could not create a test run for R{run['id']}")
+        self.journal.set_state(state_key, json.dumps({'ado_run_id': ado_run_id, 'completed': False}))
+        
+        posted = unmapped = 0
+        batch = []
+        for page in self.iter_testrail_pages(f"get_results_for_run/{run['id']}", 'results', cacheable=False):
+            for result in page:
+                case_id, title = tests.get(result.get('test_id'), (None, ''))
+                entry = self.journal.get(case_id) if case_id is not None else None
+                point_id = points.lookup(entry[0], entry[1]) if entry else None
+                if point_id is None:
+                    unmapped += 1
+                    continue
+                batch.append(build_result(result, title, entry[0], point_id, self.result_outcome_mapping))
+                if len(batch) >= RESULTS_BATCH_SIZE:
+                    if not self.add_test_run_results(ado_run_id, batch):
+                        raise Exception(f"could not add results to test run {ado_run_id}")
+                    posted += len(batch)
+                    batch = []
+        if batch:
+            if not self.add_test_run_results(ado_run_id, batch):
+                raise Exception(f"could not add results to test run {ado_run_id}")
+            posted += len(batch)
+        
+        if not self.complete_ado_test_run(ado_run_id, run):
+            raise Exception(f"could not complete test run {ado_run_id}")
+        self.journal.set_state(state_key, json.dumps({'ado_run_id': ado_run_id, 'completed': True}))
+        logger.info(f"✅ Migrated run '{run.get('name')}' as test run {ado_run_id}: {posted} results"
+                    + (f", {unmapped} without a migrated test case" if unmapped else ""))
+        return posted, unmapped
+    
+    def migrate_runs(self) -> Optional[Dict[str, Any]]:
+        """Migrate the suite's TestRail runs and results; returns the totals, or None if aborted.
+        
+        Test cases must have been migrated first: their journal maps TestRail
+        cases to work items and suites.
+        """
+        try:
+            logger.info("Starting TestRail runs and results migration...")
+            if self.cache_mode == 'offline':
+                logger.error("❌ Run migration aborted: TestRail tests and results are not cached; run without --offline.")
+                return None
+            if not self.test_ado_authentication():
+                logger.error("❌ Run migration aborted due to authentication failure.")
+                return None
+            if not len(self.journal):
+                logger.error(f"❌ No migrated test cases in {self.journal_path}; migrate the test cases first.")
+                return None
+            
+            points = self.build_test_point_index()
+            runs = self.fetch_runs()
+            
+            totals = {'runs': 0, 'runs_skipped': 0, 'runs_failed': 0, 'results': 0, 'results_unmapped': 0}
+            with ThreadPoolExecutor(max_workers=RUN_MIGRATION_CONCURRENCY, thread_name_prefix='run-writer') as writers:
+                futures = {writers.submit(self.migrate_test_run, run, points): run for run in runs}
+                for future in as_completed(futures):
+                    run = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"❌ Failed to migrate run '{run.get('name')}': {e}")
+                        totals['runs_failed'] += 1
+                        continue
+                    if result is None:
+                        totals['runs_skipped'] += 1
+                        continue
+                    totals['runs'] += 1
+                    totals['results'] += result[0]
+                    totals['results_unmapped'] += result[1]
+            
+            logger.info(f"\n✅ Run migration complete!")
+            logger.info(f"Total test runs migrated: {totals['runs']}")
+            logger.info(f"Total results migrated: {totals['results']}")
+            if totals['runs_skipped']:
+                logger.info(f"Total test runs skipped (already migrated): {totals['runs_skipped']}")
+            if totals['results_unmapped']:
+                logger.warning(f"⚠️ Results without a migrated test case: {totals['results_unmapped']}")
+            if totals['runs_failed']:
+                logger.error(f"❌ Test runs failed: {totals['runs_failed']}")
+            return totals
+        finally:
+            self.close_sessions()
+            self.journal.close()
+    
+    def dry_run(self, output_path: str = DRY_RUN_OUTPUT) -> Dict[str, Any]:
+        """Build every work item payload without calling ADO and write them to a gzip JSONL file.
+        
+        Combined with the "use" or "offline" cache modes this exercises the
+        whole TestRail -> ADO mapping from disk.
+        """
+        try:
+            logger.info("Starting dry run; nothing will be written to ADO...")
+            self.load_schema()
+            sections = self.fetch_sections()
+            started = time.time()
+            total = 0
+            invalid = 0
+            
+            # Shared steps are only estimated; without work items the payloads keep every step inline
+            reuse_within = None
+            if self.extract_shared_steps:
+                self.write_shared_steps_report(self.analyze_shared_steps(), linked_only=False)
+                reuse_within = time.time() - self.case_listing_read_at + 60
+            
+            # transform_cases consumes its own copy of the stream, so each
+            # payload can be paired with the case it was built from
+            cases, transform_input = itertools.tee(self.fetch_test_cases(max_age=reuse_within))
+            payloads = transform_cases(transform_input, self.priority_mapping, self.automation_status_mapping,
+                                       TESTRAIL_ID_TAG_PREFIX, workers=TRANSFORM_WORKERS or 1,
+                                       field_labels=self.field_labels)
+            with gzip.open(output_path, 'wt', encoding='utf-8') as out:
+                for case, payload in zip(cases, payloads):
+                    record = {
+                        'testrail_case_id': case.get('id'),
+                        'section_id': case.get('section_id'),
+                        'payload': payload
+                    }
+                    if not self.validate_payload(case, payload):
+                        record['problems'] = self.ado_schema.validate(payload)
+                        invalid += 1
+                    out.write(json.dumps(record) + '\n')
+                    total += 1
+            
+            seconds = time.time() - started
+            logger.info(f"✅ Dry run built {total} payloads in {seconds:.1f}s "
+                        f"({total / seconds if seconds else 0:.0f} cases/s) → {output_path}")
+            if invalid:
+                logger.warning(f"⚠️ {invalid} payloads would be rejected by ADO")
+            return {'cases': total, 'invalid': invalid, 'sections': len(sections), 'seconds': round(seconds, 1)}
+        finally:
+            self.close_sessions()
+            self.journal.close()
+    
+    def audit(self, report_path: str = AUDIT_REPORT) -> Optional[Dict[str, Any]]:
+        """Compare the migrated work items with the TestRail suite and write the differences to ``report_path``.
+        
+        Suite membership is listed page by page and work items are read back
+        concurrently through workitemsbatch; each is kept only as a digest of
+        its audited fields. TestRail cases are then streamed through the same
+        mapping as a migration and compared digest to digest, so nothing is
+        written to ADO and neither side is held in full. Returns the totals, or
+        None if the audit was aborted.
+        """
+        try:
+            logger.info("Starting post-migration audit; nothing will be written to ADO...")
+            if not self.test_ado_authentication():
+                logger.error("❌ Audit aborted due to authentication failure.")
+                return None
+            self.load_schema()
+            
+            sections = self.fetch_sections()
+            logger.info("Fetching existing test suites from ADO...")
+            self.fetch_ado_suites()
+            suite_by_section = self.mirror_section_tree(sections, create=False)
+            
+            # Steps are expected as references to the Shared Steps work items that already exist
+            reuse_within = None
+            if self.extract_shared_steps:
+                self.shared_steps = self.analyze_shared_steps()
+                self.create_shared_steps(self.shared_steps, create=False)
+                reuse_within = time.time() - self.case_listing_read_at + 60
+            
+            suite_ids = sorted(set(suite_by_section.values()) | set(self.journal.suite_ids()))
+            logger.info(f"Listing the test cases of {len(suite_ids)} suites...")
+            suites_by_item = {}
+            
+            def suite_members(suite_id: int) -> Tuple[int, List[int]]:
+                return suite_id, list(self.iter_suite_test_case_ids(suite_id))
+            
+            with ThreadPoolExecutor(max_workers=ADO_WRITE_CONCURRENCY, thread_name_prefix='ado-reader') as readers:
+                for suite_id, member_ids in readers.map(suite_members, suite_ids):
+                    for work_item_id in member_ids:
+                        suites_by_item.setdefault(work_item_id, set()).add(suite_id)
+            
+            # Work items in the suites, or recorded by the journal wherever they ended up
+            work_item_ids = sorted(set(suites_by_item) | set(self.journal.work_item_ids()))
+            logger.info(f"Reading back {len(work_item_ids)} work items...")
+            tag_prefixes = (TESTRAIL_ID_TAG_PREFIX, AUTOMATION_STATUS_TAG_PREFIX)
+            items = {}
+            items_by_case = {}
+            case_by_item = {}
+            for chunk in self.iter_work_items(work_item_ids, ["System.Id", *AUDITED_FIELDS]):
+                for item in chunk:
+                    fields = item.get('fields', {})
+                    items[item['id']] = field_digests(fields, tag_prefixes)
+                    case_id = parse_testrail_case_id(fields.get('System.Tags', ''), TESTRAIL_ID_TAG_PREFIX)
+                    if case_id is not None:
+                        items_by_case.setdefault(case_id, []).append(item['id'])
+                        case_by_item[item['id']] = case_id
+            
+            report = AuditReport()
+            claimed = set()
+            cases, transform_input = itertools.tee(self.fetch_test_cases(max_age=reuse_within))
+            payloads = transform_cases(transform_input, self.priority_mapping, self.automation_status_mapping,
+                                       TESTRAIL_ID_TAG_PREFIX, workers=TRANSFORM_WORKERS or 1,
+                                       shared_steps=self.shared_steps, field_labels=self.field_labels)
+            for case, payload in zip(cases, payloads):
+                case_id = case.get('id')
+                entry = self.journal.get(case_id)
+                candidates = items_by_case.get(case_id) or ([entry[0]] if entry else [])
+                claimed.update(candidates)
+                report.check(case_id, case.get('title', ''), field_digests(payload_fields(payload), tag_prefixes),
+                             suite_by_section.get(case.get('section_id')), candidates, items, suites_by_item)
+            report.add_orphans((work_item_id, case_by_item.get(work_item_id))
+                               for work_item_id in sorted(set(items) - claimed))
+            
+            report.write(report_path)
+            summary = report.summary()
+            logger.info(f"\n✅ Audit complete: {summary['intact']} of {summary['cases']} test cases intact → {report_path}")
+            for key in ('missing', 'mismatched', 'misplaced', 'duplicated', 'orphaned'):
+                if summary[key]:
+                    logger.warning(f"⚠️ {key.capitalize()}: {summary[key]}")
+            return summary
+        finally:
+            self.close_sessions()
+            self.journal.close()
+    
+    def delete_work_items_batch(self, work_item_ids: List[int]) -> List[int]:
+        """Delete up to ADO_BATCH_SIZE work items through the $batch API; returns the IDs now gone.
+        
+        Work items that were already deleted count as deleted. Items that fail
+        with a throttling or server error are retried on their own, up to
+        ADO_BATCH_MAX_RETRIES times.
+        """
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/_apis/wit/$batch?api-version=6.0"
+        query = "?destroy=true&api-version=6.0" if ROLLBACK_DESTROY else "?api-version=6.0"
+        deleted = []
+        pending = list(work_item_ids)
+        
+        for attempt in range(ADO_BATCH_MAX_RETRIES + 1):
+            if not pending:
+                break
+            if attempt:
+                logger.warning(f"⚠️ Retrying {len(pending)} failed work item deletions (attempt {attempt + 1})")
+            operations = [{"method": "DELETE", "uri": f"/{ADO_PROJECT}/_apis/wit/workitems/{work_item_id}{query}"}
+                          for work_item_id in pending]
+            
+            try:
+                response = self.make_request('POST', url, ado_headers, operations, idempotent=True)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                time.sleep(self.backoff_delay(attempt))
+                continue
+            if response.status_code != 200:
+                logger.error(f"❌ Work item batch delete failed: {response.status_code} → {response.text}")
+                if response.status_code != 429 and response.status_code < 500:
+                    break
+                continue
+            
+            results = response.json().get("value", [])
+            retry = []
+            for work_item_id, result in zip(pending, results):
+                code = result.get("code")
+                if code in (200, 204, 404):
+                    deleted.append(work_item_id)
+                    continue
+                logger.error(f"❌ Failed to delete work item {work_item_id}: {code} → {result.get('body')}",
+                             extra={'work_item_id': work_item_id, 'status': code})
+                if code == 429 or (code or 500) >= 500:
+                    retry.append(work_item_id)
+            pending = retry + pending[len(results):]
+        
+        logger.info(f"Deleted {len(deleted)} work items in one batch", extra=sampled(count=len(deleted)))
+        return deleted
+    
+    def delete_ado_suite(self, suite_id: int, plan_id: int) -> bool:
+        """Delete a test suite; one that is already gone counts as deleted"""
+        url = f"{ADO_BASE_URL}/{ADO_ORG}/{ADO_PROJECT}/_apis/testplan/Plans/{plan_id}/suites/{suite_id}?api-version=7.0"
+        response = self.make_request('DELETE', url, ado_headers)
+        if response.status_code not in (200, 204, 404):
+            logger.error(f"❌ Failed to delete suite {suite_id}: {response.status_code} → {response.text}",
+                         extra={'suite_id': suite_id, 'status': response.status_code})
+            return False
+        logger.info(f"✅ Deleted suite {suite_id}", extra=sampled(suite_id=suite_id))
+        return True
+    
+    def rollback(self, run_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Delete what a migration run created; returns the totals, or None if aborted.
+        
+        The run's work items (test cases and shared steps) are found by their
+        run ID tag with one WIQL query and deleted ADO_BATCH_SIZE at a time,
+        several batches at once, all under the ADO rate limit. The suites the
+        run created are then deleted deepest first, one level at a time.
+        Without ``run_id`` the run recorded in the journal is rolled back,
+        together with the test runs migrated on top of it, and the journal is
+        cleared once everything is gone. Nothing is deleted if the run's work
+        items cannot be listed, and the journal is kept if the run created
+        nothing, e.g. when it only adopted the work items of an earlier run.
+        """
+        try:
+            current_run_id = self.journal.get_state('run_id')
+            run_id = run_id or current_run_id
+            if not run_id:
+                logger.error(f"❌ No run ID given and none recorded in {self.journal_path}.")
+                return None
+            logger.info(f"Rolling back migration run {run_id}...")
+            if not self.test_ado_authentication():
+                logger.error("❌ Rollback aborted due to authentication failure.")
+                return None
+            started = time.time()
+            totals = {'run_id': run_id, 'test_runs': 0, 'work_items': 0, 'work_items_failed': 0,
+                      'suites': 0, 'suites_failed': 0}
+            
+            try:
+                work_item_ids = self.query_work_item_ids(f"[System.Tags] CONTAINS '{RUN_ID_TAG_PREFIX}{run_id}'")
+            except requests.exceptions.RequestException as e:
+                logger.error(f"❌ Rollback of run {run_id} failed: could not list its work items ({e}); "
+                             f"nothing was deleted")
+                return None
+            suites = self.journal.created_suites(run_id)
+            if not work_item_ids and not suites:
+                logger.warning(f"⚠️ Run {run_id} created no work items or suites. Work items it adopted keep the "
+                               f"{RUN_ID_TAG_PREFIX} tag of the run that created them; roll that run back by its ID.")
+            
+            # Test runs are not tagged; only the journal of the run knows them
+            if run_id == current_run_id:
+                for saved in self.journal.states('run:').values():
+                    totals['test_runs'] += self.delete_ado_test_run(json.loads(saved)['ado_run_id'])
+            
+            logger.info(f"Deleting {len(work_item_ids)} work items...")
+            chunks = [work_item_ids[start:start + ADO_BATCH_SIZE] for start in range(0, len(work_item_ids), ADO_BATCH_SIZE)]
+            with ThreadPoolExecutor(max_workers=ADO_WRITE_CONCURRENCY, thread_name_prefix='ado-deleter') as deleters:
+                for deleted in deleters.map(self.delete_work_items_batch, chunks):
+                    self.journal.forget_work_items(deleted)
+                    totals['work_items'] += len(deleted)
+            totals['work_items_failed'] = len(work_item_ids) - totals['work_items']
+            
+            # A suite's children go before it, so every deletion targets a suite that still exists
+            levels = {}
+            for suite_id in suites:
+                depth = 0
+                parent_id = suites[suite_id][1]
+                while parent_id in suites:
+                    depth += 1
+                    parent_id = suites[parent_id][1]
+                levels.setdefault(depth, []).append(suite_id)
+            
+            def delete_suite(suite_id: int) -> Tuple[int, bool]:
+                return suite_id, self.delete_ado_suite(suite_id, suites[suite_id][0])
+            
+            with ThreadPoolExecutor(max_workers=ADO_WRITE_CONCURRENCY, thread_name_prefix='ado-deleter') as deleters:
+                for depth in sorted(levels, reverse=True):
+                    logger.info(f"Deleting {len(levels[depth])} suites at depth {depth}")
+                    deleted = [suite_id for suite_id, ok in deleters.map(delete_suite, levels[depth]) if ok]
+                    self.journal.forget_suites(deleted)
+                    totals['suites'] += len(deleted)
+            totals['suites_failed'] = len(suites) - totals['suites']
+            
+            failed = totals['work_items_failed'] + totals['suites_failed']
+            if run_id == current_run_id and not failed and (work_item_ids or suites):
+                self.journal.reset()
+            
+            seconds = time.time() - started
+            logger.info(f"\n✅ Rollback of run {run_id} complete in {seconds:.1f}s!")
+            logger.info(f"Total work items deleted: {totals['work_items']}")
+            logger.info(f"Total suites deleted: {totals['suites']}")
+            if totals['test_runs']:
+                logger.info(f"Total test runs deleted: {totals['test_runs']}")
+            if failed:
+                logger.error(f"❌ Could not delete {totals['work_items_failed']} work items and "
+                             f"{totals['suites_failed']} suites; run the rollback again to retry")
+            totals['seconds'] = round(seconds, 1)
+            return totals
+        finally:
+            self.close_sessions()
+            self.journal.close()
+    
+    def migrate(self) -> Optional[Dict[str, Any]]:
+        """Main migration method; returns the run's totals, or None if it was aborted"""
+        reporter = MetricsReporter(self.metrics, self.metrics_path, self.metrics_port, METRICS_FLUSH_INTERVAL)
+        reporter.start()
+        progress = ConsoleProgress(self.metrics.summary_line, PROGRESS_INTERVAL, logger)
+        progress.start()
         try:
             logger.info("Starting TestRail to ADO migration...")
             
             # Test ADO authentication first
             if not self.test_ado_authentication():
                 logger.error("❌ Migration aborted due to authentication failure.")
-                return
+                return None
+            self.load_schema()
             
-            # Fetch data from TestRail
-            sections = self.fetch_sections()
-            cases = self.fetch_test_cases()
+            if self.resume:
+                logger.info(f"Resuming from journal {self.journal_path} ({len(self.journal)} test cases already created)")
+                # Finish suite memberships that were interrupted mid-flight
+                for suite_id, test_case_ids in self.journal.pending_suite_additions().items():
+                    for test_case_id in test_case_ids:
+                        self.queue_suite_addition(test_case_id, suite_id)
+            elif len(self.journal):
+                logger.warning(f"⚠️ Starting a fresh migration; discarding {len(self.journal)} journal entries (use --resume to continue)")
+                self.journal.reset()
             
-            # Group cases by section
-            cases_by_section = {}
-            for case in cases:
-                section_id = case.get('section_id')
-                if section_id:
-                    cases_by_section.setdefault(section_id, []).append(case)
+            # Everything created from here on is tagged with the run ID
+            self.run_id = (self.journal.get_state('run_id') if self.resume else None) or \
+                f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+            self.journal.set_state('run_id', self.run_id)
+            logger.info(f"Run ID: {self.run_id} (undo with --rollback {self.run_id})")
+            
+            # A delta sync only reads cases changed since the last successful sync
+            sync_started = int(time.time())
+            watermark = self.journal.get_state('last_sync') if self.delta else None
+            
+            # Fetch sections from TestRail; cases are streamed below
+            sections = self.fetch_sections()
             
             # Fetch existing ADO suites
             logger.info("Fetching existing test suites from ADO...")
-            self.fetch_ado_suites(ADO_STATIC_SUITE_PARENT_ID)
-            logger.info(f"Found {len(self.existing_suites)} existing suites")
+            self.fetch_ado_suites()
+            logger.info(f"Found {len(self.suite_index)} existing suites")
+            
+            # Resolve a suite for each section
+            suite_by_section = self.mirror_section_tree(sections)
             
-            # Process each section
+            if RECONCILE_EXISTING_CASES:
+                self.build_case_index(suite_by_section.values())
+            
+            # Repeated step blocks become Shared Steps work items before any case references them
+            if self.extract_shared_steps:
+                self.shared_steps = self.analyze_shared_steps()
+                self.create_shared_steps(self.shared_steps)
+                self.write_shared_steps_report(self.shared_steps)
+            
+            # Stream test cases into ADO as TestRail pages arrive, writing
+            # them through a bounded pool of workers
             total_cases_created = 0
             total_cases_failed = 0
+            total_cases_skipped = 0
+            total_cases_seen = 0
+            max_in_flight = ADO_WRITE_CONCURRENCY * 2
             
-            for section in sections:
-                section_name = section.get('name', 'Unnamed Section')
-                section_id = section.get('id')
-                
-                logger.info(f"\n=== Processing section: {section_name} ===")
-                
-                # Check if suite already exists
-                key = (self.normalize_suite_name(section_name), ADO_STATIC_SUITE_PARENT_ID)
-                
-                if key in self.existing_suites:
-                    suite_id = self.existing_suites[key]
-                    logger.info(f"✅ Using existing test suite: {section_name} (ID: {suite_id})")
-                else:
-                    suite_id = self.create_ado_suite(section_name, ADO_STATIC_SUITE_PARENT_ID)
+            transformer = ProcessPoolExecutor(max_workers=TRANSFORM_WORKERS) if TRANSFORM_WORKERS > 0 else None
+            if MIGRATE_ATTACHMENTS and self.cache_mode == 'offline':
+                logger.warning("⚠️ Offline run; attachments are not migrated")
+            elif MIGRATE_ATTACHMENTS:
+                self.attachment_pool = ThreadPoolExecutor(max_workers=ATTACHMENT_CONCURRENCY, thread_name_prefix='attachments')
+            
+            def submit_batch(batch: List[Tuple[dict, int]]) -> Future:
+                payloads = None
+                if transformer is not None:
+                    payloads = transformer.submit(
+                        transform_batch, [case for case, _ in batch], self.priority_mapping,
+                        self.automation_status_mapping, TESTRAIL_ID_TAG_PREFIX, self.shared_steps, self.field_labels
+                    )
+                future = writers.submit(self.create_ado_test_cases_batch, batch, payloads)
+                self.track_suite_writes(future, (suite_id for _, suite_id in batch))
+                return future
+            
+            with ThreadPoolExecutor(max_workers=ADO_WRITE_CONCURRENCY, thread_name_prefix='ado-writer') as writers:
+                in_flight = {}
+                batch = []
+                current_suite_id = None
+                unplaced = {}
+                # The case listing the shared steps analysis just read is reused from the cache
+                reuse_within = time.time() - self.case_listing_read_at + 60 if self.case_listing_read_at else None
+                cases = self.fetch_test_cases(int(watermark) if watermark else None, max_age=reuse_within)
+                if GROUP_CASES_BY_SECTION:
+                    cases = self.group_cases_by_section(cases)
+                for case in cases:
+                    total_cases_seen += 1
+                    suite_id = suite_by_section.get(case.get('section_id'))
                     if not suite_id:
-                        logger.error(f"❌ Failed to create/find suite for section: {section_name}")
+                        # The section's suite could not be created, so there is nowhere to put the case
+                        unplaced[case.get('section_id')] = unplaced.get(case.get('section_id'), 0) + 1
+                        total_cases_failed += 1
+                        self.metrics.add('cases_failed')
+                        continue
+                    
+                    # Cases arrive grouped by section; a section's suite is flushed
+                    # once the stream has moved past it and its writes are done
+                    if current_suite_id is not None and suite_id != current_suite_id:
+                        if self.finish_suite(current_suite_id):
+                            writers.submit(self.flush_suite_additions, current_suite_id)
+                    current_suite_id = suite_id
+                    
+                    # Creations and delta updates alike wait for a free slot,
+                    # so only a bounded number of payloads is held in memory
+                    if len(in_flight) >= max_in_flight:
+                        created, failed = self.collect_case_results(in_flight)
+                        total_cases_created += created
+                        total_cases_failed += failed
+                        self.metrics.add('cases_failed', failed)
+                    
+                    # Work already checkpointed by an earlier run is skipped without calling ADO;
+                    # in a delta sync it is updated if its mapped content changed
+                    entry = self.journal.get(case.get('id')) if self.resume else None
+                    if entry:
+                        if self.attachment_pool is not None and not self.journal.attachments_done(case['id']):
+                            # The run that created the work item stopped before linking its attachments
+                            self.attachment_pool.submit(self.migrate_case_attachments, case, entry[0])
+                        if self.delta:
+                            payload = self.build_test_case_payload(case)
+                            if content_hash(payload) != self.journal.content_hash(case['id']):
+                                in_flight[writers.submit(self.update_ado_test_case, case, entry[0], payload)] = [case]
+                                continue
+                        total_cases_skipped += 1
+                        self.metrics.add('cases_skipped')
                         continue
+                    
+                    # Cases created by an earlier run are adopted instead of written again
+                    existing = self.case_index.lookup(case, suite_id)
+                    if existing:
+                        if case.get('id') is not None:
+                            # Whoever created it also handled its attachments
+                            self.journal.record_created(case['id'], existing, suite_id,
+                                                        content_hash(self.build_test_case_payload(case)),
+                                                        attachments_done=True)
+                        if self.case_index.in_suite(existing, suite_id):
+                            self.journal.record_in_suite([existing], suite_id)
+                        else:
+                            # Matched by tag, so its suite membership may not have been added yet
+                            self.queue_suite_addition(existing, suite_id)
+                        total_cases_skipped += 1
+                        self.metrics.add('cases_skipped')
+                        continue
+                    
+                    if not ADO_BATCH_CREATE:
+                        future = writers.submit(self.create_ado_test_case, case, suite_id)
+                        self.track_suite_writes(future, [suite_id])
+                        in_flight[future] = [case]
+                        continue
+                    
+                    batch.append((case, suite_id))
+                    if len(batch) >= ADO_BATCH_SIZE:
+                        in_flight[submit_batch(batch)] = [c for c, _ in batch]
+                        batch = []
                 
-                # Process test cases in this section
-                section_cases = cases_by_section.get(section_id, [])
-                logger.info(f"Processing {len(section_cases)} test cases in section '{section_name}'")
+                if batch:
+                    in_flight[submit_batch(batch)] = [c for c, _ in batch]
                 
-                for case in section_cases:
-                    try:
-                        if self.create_ado_test_case(case, suite_id):
-                            total_cases_created += 1
-                        else:
-                            total_cases_failed += 1
-                    except Exception as e:
-                        logger.error(f"❌ Error creating test case '{case.get('title', 'Unknown')}': {e}")
-                        total_cases_failed += 1
+                while in_flight:
+                    created, failed = self.collect_case_results(in_flight)
+                    total_cases_created += created
+                    total_cases_failed += failed
+                    self.metrics.add('cases_failed', failed)
+            
+            if transformer is not None:
+                transformer.shutdown()
+            
+            section_names = {section.get('id'): section.get('name', 'Unnamed Section') for section in sections}
+            for section_id, count in unplaced.items():
+                logger.error(f"❌ {count} test cases of section '{section_names.get(section_id, section_id)}' were "
+                             f"not migrated: the section has no suite", extra={'count': count})
+            
+            self.flush_suite_additions()
+            rejected = self.retry_rejected_suite_additions()
+            total_suite_rejections = sum(len(ids) for ids in rejected.values())
+            
+            if self.attachment_pool is not None:
+                logger.info("Waiting for attachment uploads to finish...")
+                self.attachment_pool.shutdown(wait=True)
+                self.attachment_pool = None
+            
+            # Cases the watermark moves past are never read again, so it only
+            # advances once every case was created, updated or skipped
+            # (updates are counted with creations)
+            if self.delta and not total_cases_failed and total_cases_created + total_cases_skipped == total_cases_seen:
+                self.journal.set_state('last_sync', str(sync_started))
+            elif self.delta:
+                logger.warning(f"⚠️ Delta sync watermark not advanced: "
+                               f"{total_cases_seen - total_cases_created - total_cases_skipped} test cases were not synced")
             
             # Summary
+            progress.stop()
             logger.info(f"\n✅ Migration complete!")
-            logger.info(f"Total test cases created: {total_cases_created}")
+            # Successful delta updates are counted by the writers alongside creations
+            logger.info(f"Total test cases created: {total_cases_created - self.total_cases_updated}")
+            if self.delta:
+                logger.info(f"Total test cases updated: {self.total_cases_updated}")
             logger.info(f"Total test cases failed: {total_cases_failed}")
+            if total_cases_skipped:
+                logger.info(f"Total test cases skipped (already migrated): {total_cases_skipped}")
+            if MIGRATE_ATTACHMENTS:
+                logger.info(f"Total attachments linked: {self.total_attachments_linked} "
+                            f"({len(self.attachments)} distinct files uploaded)")
+                if self.total_attachments_failed:
+                    logger.error(f"❌ Attachments failed: {self.total_attachments_failed}")
+            if total_suite_rejections:
+                logger.error(f"❌ Test cases rejected by their suite: {total_suite_rejections} in "
+                             f"{len(rejected)} suites ({sample_ids(rejected)})")
             logger.info(f"Total sections processed: {len(sections)}")
+            for host, seconds in self.metrics.snapshot()['throttled_seconds'].items():
+                logger.info(f"Time spent throttled by {host}: {seconds:.1f}s")
+            if self.metrics_path:
+                logger.info(f"Request metrics written to {self.metrics_path}")
+            
+            return {
+                'run_id': self.run_id,
+                'created': total_cases_created - self.total_cases_updated,
+                'updated': self.total_cases_updated,
+                'failed': total_cases_failed,
+                'skipped': total_cases_skipped,
+                'suite_rejections': total_suite_rejections,
+                'attachments': self.total_attachments_linked,
+                'sections': len(sections)
+            }
             
         except Exception as e:
             logger.error(f"❌ Migration failed with error: {e}")
             raise
+        finally:
+            progress.stop()
+            reporter.stop()
+            if self.attachment_pool is not None:
+                self.attachment_pool.shutdown(wait=False)
+            self.close_sessions()
+            self.journal.close()
 
 if __name__ == "__main__":
-    migrator = TestRailMigrator()
-    migrator.migrate()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Migrate TestRail test cases to Azure DevOps")
+    parser.add_argument('--resume', action='store_true',
+                        help=f"skip work already recorded in {JOURNAL_PATH} by an interrupted run")
+    parser.add_argument('--delta', action='store_true',
+                        help="only sync test cases changed in TestRail since the last sync, updating edited ones")
+    parser.add_argument('--cache', choices=('off', 'refresh', 'use', 'offline'), default=TESTRAIL_CACHE_MODE,
+                        help=f"how TestRail listings are cached in {TESTRAIL_CACHE_DIR} (default: {TESTRAIL_CACHE_MODE})")
+    parser.add_argument('--offline', action='store_const', const='offline', dest='cache',
+                        help="read TestRail listings only from the local cache")
+    parser.add_argument('--clear-cache', action='store_true', help="delete cached TestRail listings first")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help="serve Prometheus metrics on this port while migrating")
+    parser.add_argument('--runs', action='store_true',
+                        help="migrate TestRail runs and results of already migrated test cases")
+    parser.add_argument('--shared-steps', action='store_true', default=EXTRACT_SHARED_STEPS,
+                        help=f"create step blocks shared by {SHARED_STEPS_MIN_USES}+ test cases as Shared Steps work items")
+    parser.add_argument('--dry-run', action='store_true',
+                        help=f"build work item payloads into {DRY_RUN_OUTPUT} without writing to ADO")
+    parser.add_argument('--rollback', nargs='?', const='', metavar='RUN_ID',
+                        help="delete the work items and suites a run created (default: the run in the journal)")
+    parser.add_argument('--audit', action='store_true',
+                        help=f"compare migrated work items with TestRail and report differences in {AUDIT_REPORT}")
+    args = parser.parse_args()
+    
+    if args.clear_cache:
+        if os.path.exists(SCHEMA_CACHE_FILE):
+            os.remove(SCHEMA_CACHE_FILE)
+        removed = TestRailCache(TESTRAIL_CACHE_DIR).invalidate()
+        logger.info(f"Cleared {removed} cached TestRail listings")
+    
+    migrator = TestRailMigrator(resume=args.resume, delta=args.delta, cache_mode=args.cache,
+                                metrics_port=args.metrics_port, shared_steps=args.shared_steps)
+    if args.dry_run:
+        migrator.dry_run()
+    elif args.audit:
+        migrator.audit()
+    elif args.rollback is not None:
+        migrator.rollback(args.rollback or None)
+    elif args.runs:
+        migrator.migrate_runs()
+    else:
+        migrator.migrate()
\ No newline at end of file
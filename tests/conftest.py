@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+
+# The migration modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_services import (PLAN_ID, ROOT_SUITE_ID, Faults, ScriptedFault, server_url,  # noqa: E402
+                                      start_servers)
+
+
+class FakeMigration:
+    """The fake TestRail and ADO services, and migrators pointed at them"""
+
+    def __init__(self, migration, state, directory: str):
+        self.migration = migration
+        self.state = state
+        self.directory = directory
+        self.journal_path = os.path.join(directory, "journal.sqlite3")
+
+    def reset(self, cases: int, **faults):
+        self.state.reset(cases, Faults(**faults).as_dict())
+
+    def fail(self, method: str, path: str, status: int, count: int = 1, retry_after: float = None,
+             after_handling: bool = False):
+        """Answer the next ``count`` matching requests with ``status``; 0 drops the connection"""
+        self.state.script(ScriptedFault(method, path, status, count, retry_after, after_handling))
+
+    def migrator(self, **kwargs):
+        kwargs.setdefault('journal_path', self.journal_path)
+        kwargs.setdefault('cache_mode', 'off')
+        return self.migration.TestRailMigrator(ado_plan_id=PLAN_ID, ado_parent_suite_id=ROOT_SUITE_ID, **kwargs)
+
+    def test_case_ids(self):
+        with self.state.lock:
+            return sorted(wid for wid, fields in self.state.work_items.items()
+                          if fields["System.WorkItemType"] == "Test Case")
+
+    def suite_members(self):
+        with self.state.lock:
+            return {suite_id: list(members) for suite_id, members in self.state.suite_members.items() if members}
+
+
+@pytest.fixture(scope="session")
+def fake_servers():
+    testrail, ado = start_servers(0)
+    yield testrail, ado
+    for server in (testrail, ado):
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def fake(fake_servers, monkeypatch, tmp_path):
+    """Runs the migrator against the fake services from ``benchmarks``, with fast retries and no rate limit"""
+    import testrail_to_ado_migration as migration
+
+    testrail, ado = fake_servers
+    ado.state.reset(0, Faults().as_dict())
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(migration, 'TESTRAIL_URL', f"{server_url(testrail)}/")
+    monkeypatch.setattr(migration, 'ADO_BASE_URL', server_url(ado))
+    for name in ('TESTRAIL_RATE_LIMIT', 'TESTRAIL_BURST', 'ADO_RATE_LIMIT', 'ADO_BURST'):
+        monkeypatch.setattr(migration, name, 1000)
+    monkeypatch.setattr(migration, 'RETRY_BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(migration, 'MIGRATE_ATTACHMENTS', False)
+    monkeypatch.setattr(migration, 'METRICS_FILE', None)
+    return FakeMigration(migration, ado.state, str(tmp_path))
@@ -0,0 +1,122 @@
+import pytest
+
+from migration_journal import STEP_CREATED, STEP_IN_SUITE, MigrationJournal, content_hash
+from transform import build_test_case_payload
+
+PRIORITY_MAPPING = {1: 4, 2: 3, 3: 2, 4: 1}
+AUTOMATION_STATUS_MAPPING = {0: "Not Automated", 1: "Automated"}
+
+
+def payload(case: dict):
+    return build_test_case_payload(case, PRIORITY_MAPPING, AUTOMATION_STATUS_MAPPING, "TestRail:C")
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "journal.sqlite3")
+
+
+def test_resume_restores_entries_from_disk(journal_path):
+    journal = MigrationJournal(journal_path)
+    journal.record_created(1, 101, 10)
+    journal.record_created(2, 102, 10)
+    journal.record_in_suite([101], 10)
+    journal.set_state("run_id", "run-1")
+    journal.close()
+
+    resumed = MigrationJournal(journal_path)
+    assert len(resumed) == 2
+    assert resumed.get(1) == (101, 10, STEP_IN_SUITE)
+    assert resumed.get(2) == (102, 10, STEP_CREATED)
+    assert resumed.get(3) is None
+    assert resumed.pending_suite_additions() == {10: [102]}
+    assert resumed.get_state("run_id") == "run-1"
+    resumed.close()
+
+
+def test_reset_discards_cases_and_run_state(journal_path):
+    journal = MigrationJournal(journal_path)
+    journal.record_created(1, 101, 10)
+    journal.set_state("run_id", "run-1")
+    journal.reset()
+    journal.close()
+
+    resumed = MigrationJournal(journal_path)
+    assert len(resumed) == 0
+    assert resumed.get(1) is None
+    assert resumed.get_state("run_id") is None
+    resumed.close()
+
+
+def test_content_hashes_survive_resume(journal_path):
+    journal = MigrationJournal(journal_path)
+    journal.record_created(1, 101, 10, digest="a")
+    journal.record_created(2, 102, 10)
+    journal.record_content_hash(2, "b")
+    journal.close()
+
+    resumed = MigrationJournal(journal_path)
+    assert resumed.content_hash(1) == "a"
+    assert resumed.content_hash(2) == "b"
+    assert resumed.content_hash(3) is None
+    resumed.close()
+
+
+def test_content_hash_detects_field_changes():
+    case = {'id': 1, 'title': "Login", 'priority_id': 2, 'custom_steps_separated': [
+        {'content': "Open the page", 'expected': "It loads"}]}
+    digest = content_hash(payload(case))
+
+    assert content_hash(payload(dict(case))) == digest
+    assert content_hash(payload(dict(case, title="Log in"))) != digest
+    assert content_hash(payload(dict(case, priority_id=1))) != digest
+    edited = dict(case, custom_steps_separated=[{'content': "Open the page", 'expected': "It renders"}])
+    assert content_hash(payload(edited)) != digest
+
+
+def test_content_hash_ignores_unhashed_operations():
+    document = payload({'id': 1, 'title': "Login"})
+    linked = document + [{"op": "add", "path": "/relations/-", "value": {"rel": "x", "url": "y"}}]
+    assert content_hash(linked) == content_hash(document)
+
+
+def test_resume_redoes_pending_attachments(journal_path):
+    journal = MigrationJournal(journal_path)
+    journal.record_created(1, 101, 10)
+    journal.record_created(2, 102, 10)
+    journal.record_created(3, 103, 10, attachments_done=True)
+    journal.record_attachments_done(2)
+    journal.close()
+
+    resumed = MigrationJournal(journal_path)
+    assert not resumed.attachments_done(1)
+    assert resumed.attachments_done(2)
+    assert resumed.attachments_done(3)
+    resumed.close()
+
+
+def test_reset_keeps_created_suites(journal_path):
+    journal = MigrationJournal(journal_path)
+    journal.record_suite_created(10, 3, 4, "run-1")
+    journal.record_suite_created(11, 3, 10, "run-1")
+    journal.record_suite_created(12, 3, 4, "run-2")
+    journal.reset()
+    journal.forget_suites([11])
+    journal.close()
+
+    resumed = MigrationJournal(journal_path)
+    assert resumed.created_suites("run-1") == {10: (3, 4)}
+    assert resumed.created_suites("run-2") == {12: (3, 4)}
+    resumed.close()
+
+
+def test_forget_work_items_drops_their_cases(journal_path):
+    journal = MigrationJournal(journal_path)
+    journal.record_created(1, 101, 10, digest="a")
+    journal.record_created(2, 102, 10)
+    journal.forget_work_items([101, 999])
+    assert journal.get(1) is None
+    assert journal.content_hash(1) is None
+    assert journal.attachments_done(1)
+    assert journal.work_item_ids() == [102]
+    journal.close()
@@ -0,0 +1,72 @@
+from schema import ADO_STRING_FIELD_LENGTH, WorkItemSchema
+
+SCHEMA = WorkItemSchema({
+    'fields': [
+        {'referenceName': 'System.Title', 'type': 'string'},
+        {'referenceName': 'System.Description', 'type': 'html'},
+        {'referenceName': 'System.Tags', 'type': 'plainText'},
+        {'referenceName': 'System.State', 'type': 'string', 'readOnly': True},
+        {'referenceName': 'Microsoft.VSTS.Common.Priority', 'type': 'integer'},
+        {'referenceName': 'Custom.Team', 'type': 'string'},
+    ],
+    'type_fields': [
+        {'referenceName': 'System.Title', 'alwaysRequired': True},
+        {'referenceName': 'System.Description'},
+        {'referenceName': 'System.Tags'},
+        {'referenceName': 'System.State'},
+        {'referenceName': 'System.AreaPath', 'alwaysRequired': True},
+        {'referenceName': 'Microsoft.VSTS.Common.Priority', 'allowedValues': [1, 2, 3, 4]},
+        {'referenceName': 'Custom.Team', 'alwaysRequired': True, 'defaultValue': None},
+    ],
+})
+
+
+def operation(name, value):
+    return {"op": "add", "path": f"/fields/{name}", "value": value}
+
+
+def valid_payload():
+    return [
+        operation("System.Title", "Login"),
+        operation("Microsoft.VSTS.Common.Priority", 2),
+        operation("Custom.Team", "QA"),
+        {"op": "add", "path": "/relations/-", "value": {"rel": "x", "url": "y"}},
+    ]
+
+
+def test_valid_payload_has_no_problems():
+    assert SCHEMA.validate(valid_payload()) == []
+
+
+def test_reports_missing_required_fields():
+    # System fields other than the title are filled in by ADO
+    payload = [operation("System.Title", "Login")]
+    assert SCHEMA.validate(payload) == ["Custom.Team is required"]
+    assert "System.Title is required" in SCHEMA.validate([operation("System.Title", ""), operation("Custom.Team", "QA")])
+
+
+def test_reports_unknown_and_read_only_fields():
+    problems = SCHEMA.validate(valid_payload() + [operation("Custom.Missing", "x"), operation("System.State", "Design")])
+    assert problems == ["Custom.Missing is not a field of this work item type", "System.State is read-only"]
+
+
+def test_reports_disallowed_and_mistyped_values():
+    payload = valid_payload()
+    payload[1] = operation("Microsoft.VSTS.Common.Priority", "high")
+    problems = SCHEMA.validate(payload)
+    assert problems == [
+        "Microsoft.VSTS.Common.Priority value 'high' is not one of ['1', '2', '3', '4']",
+        "Microsoft.VSTS.Common.Priority value 'high' is not an integer",
+    ]
+
+
+def test_reports_overlong_strings_but_not_html():
+    payload = valid_payload() + [operation("System.Description", "x" * (ADO_STRING_FIELD_LENGTH + 1))]
+    assert SCHEMA.validate(payload) == []
+    payload[0] = operation("System.Title", "x" * (ADO_STRING_FIELD_LENGTH + 1))
+    assert len(SCHEMA.validate(payload)) == 1
+
+
+def test_empty_schema_accepts_anything():
+    assert not WorkItemSchema({})
+    assert WorkItemSchema({}).validate([operation("Custom.Missing", None)]) == []
@@ -0,0 +1,58 @@
+import pickle
+
+from shared_steps import SharedStepsAnalyzer
+
+LOGIN = [("Open the login page", "It loads"), ("Enter valid credentials", ""), ("Submit", "Dashboard shows")]
+
+
+def analyze(cases, min_uses=3):
+    analyzer = SharedStepsAnalyzer(min_uses)
+    for steps in cases:
+        analyzer.add(steps)
+    return analyzer.plan("https://ado/_apis/wit/workItems/")
+
+
+def test_detects_a_block_shared_by_enough_cases():
+    plan = analyze([LOGIN + [(f"Check report {n}", "")] for n in range(3)])
+    assert [block.steps for block in plan.blocks] == [tuple(LOGIN)]
+    assert plan.blocks[0].uses == 3
+
+
+def test_ignores_blocks_below_the_use_threshold():
+    plan = analyze([LOGIN + [(f"Check report {n}", "")] for n in range(2)])
+    assert plan.blocks == []
+
+
+def test_matches_steps_that_differ_only_in_whitespace():
+    spaced = [(f"  {action}\n", expected) for action, expected in LOGIN]
+    plan = analyze([LOGIN, LOGIN, spaced])
+    assert len(plan.blocks) == 1
+    assert plan.blocks[0].uses == 3
+
+
+def test_substitutes_linked_blocks_only():
+    plan = analyze([LOGIN + [(f"Check report {n}", "")] for n in range(3)])
+    steps = [("Start", "")] + LOGIN + [("Finish", "")]
+    assert plan.substitute(steps) == steps
+
+    plan.link(plan.blocks[0], 77)
+    assert plan.substitute(steps) == [("Start", ""), 77, ("Finish", "")]
+    assert plan.substitute(LOGIN[:2]) == LOGIN[:2]
+
+
+def test_substitutes_the_longest_block_first():
+    longer = LOGIN + [("Open settings", "")]
+    plan = analyze([longer] * 3 + [LOGIN + [(f"Other {n}", "")] for n in range(3)])
+    for work_item_id, block in enumerate(sorted(plan.blocks, key=lambda block: len(block.steps)), 1):
+        plan.link(block, work_item_id)
+    assert plan.substitute(longer) == [2]
+    assert plan.substitute(LOGIN) == [1]
+
+
+def test_plan_sent_to_workers_keeps_substitution():
+    plan = analyze([LOGIN + [(f"Check report {n}", "")] for n in range(3)])
+    plan.link(plan.blocks[0], 77)
+    copy = pickle.loads(pickle.dumps(plan))
+    assert copy.blocks == []
+    assert copy.substitute(LOGIN) == [77]
+    assert copy.work_item_url(77) == "https://ado/_apis/wit/workItems/77"
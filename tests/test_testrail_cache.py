@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+import testrail_cache
+from testrail_cache import cache_key
+
+ENDPOINT = "get_cases/1"
+PARAMS = {"suite_id": 1, "limit": 250}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return testrail_cache.TestRailCache(str(tmp_path / "cache"), "https://example.testrail.io/")
+
+
+def store(cache: testrail_cache.TestRailCache, pages, endpoint: str = ENDPOINT, params: dict = None):
+    writer = cache.writer(endpoint, params or PARAMS)
+    for rows in pages:
+        writer.write({"cases": rows}, rows)
+    writer.commit()
+
+
+def test_key_depends_on_instance_endpoint_and_params():
+    key = cache_key(ENDPOINT, PARAMS, "https://a.testrail.io")
+
+    assert cache_key(ENDPOINT, dict(reversed(list(PARAMS.items()))), "https://a.testrail.io/") == key
+    assert cache_key(ENDPOINT, PARAMS, "https://b.testrail.io") != key
+    assert cache_key("get_cases/2", PARAMS, "https://a.testrail.io") != key
+    assert cache_key(ENDPOINT, dict(PARAMS, updated_after=1), "https://a.testrail.io") != key
+
+
+def test_committed_entry_reads_back_page_by_page(cache):
+    pages = [[{"id": 1, "updated_on": 20}, {"id": 2, "updated_on": 30}], [{"id": 3, "updated_on": 10}]]
+    store(cache, pages)
+
+    key = cache.lookup(ENDPOINT, PARAMS)
+    assert [data["cases"] for data in cache.read_pages(key)] == pages
+    assert cache.meta(key)["rows"] == 3 and cache.meta(key)["max_updated_on"] == 30
+    assert cache.lookup(ENDPOINT, PARAMS, max_age=60) == key
+    assert testrail_cache.TestRailCache(cache.directory, "https://other.testrail.io").lookup(ENDPOINT, PARAMS) is None
+
+
+def test_discarded_entry_is_never_served(cache):
+    writer = cache.writer(ENDPOINT, PARAMS)
+    writer.write({"cases": [{"id": 1}]}, [{"id": 1}])
+    writer.discard()
+
+    assert cache.lookup(ENDPOINT, PARAMS) is None
+
+
+def test_stale_entry_is_treated_as_missing(cache, monkeypatch):
+    store(cache, [[{"id": 1}]])
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+
+    assert cache.lookup(ENDPOINT, PARAMS, max_age=60) is None
+    assert cache.lookup(ENDPOINT, PARAMS) is not None
+
+
+def test_invalidate_by_endpoint_prefix(cache):
+    store(cache, [[{"id": 1}]])
+    store(cache, [[{"id": 1}]], "get_sections/1")
+
+    assert cache.invalidate("get_cases/") == 1
+    assert cache.lookup(ENDPOINT, PARAMS) is None
+    assert cache.lookup("get_sections/1", PARAMS) is not None
+    assert cache.invalidate() == 1
+    assert cache.lookup("get_sections/1", PARAMS) is None
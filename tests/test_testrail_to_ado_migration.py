@@ -0,0 +1,327 @@
+import os
+import sqlite3
+import time
+
+import pytest
+import requests
+
+
+def test_migrates_every_case_into_its_section_suite(fake):
+    fake.reset(300)
+    totals = fake.migrator().migrate()
+
+    assert totals['created'] == 300 and totals['failed'] == 0 and totals['suite_rejections'] == 0
+    assert len(fake.test_case_ids()) == 300
+    members = fake.suite_members()
+    assert len(members) == 3
+    assert sum(len(ids) for ids in members.values()) == 300
+
+
+def test_survives_random_throttling_and_server_errors(fake):
+    fake.reset(300, throttle_rate=0.1, retry_after=0.01, error_rate=0.1)
+    totals = fake.migrator().migrate()
+
+    assert totals['created'] + totals['failed'] == 300
+    assert len(fake.test_case_ids()) == totals['created']
+
+
+def test_rerun_adopts_cases_already_in_their_suite_without_adding_them_again(fake):
+    fake.reset(300)
+    fake.migrator().migrate()
+
+    totals = fake.migrator().migrate()
+    assert totals['skipped'] == 300 and totals['suite_rejections'] == 0
+    migrator = fake.migrator(resume=True)
+    assert migrator.journal.pending_suite_additions() == {}
+    migrator.journal.close()
+
+
+def test_rerun_adds_adopted_cases_missing_from_their_suite(fake):
+    fake.reset(300)
+    fake.migrator().migrate()
+    suite_id, members = sorted(fake.suite_members().items())[0]
+    with fake.state.lock:
+        del fake.state.suite_members[suite_id][:10]
+
+    totals = fake.migrator().migrate()
+    assert totals['skipped'] == 300 and totals['suite_rejections'] == 0
+    assert sorted(fake.suite_members()[suite_id]) == sorted(members)
+
+
+def test_resumed_suite_additions_that_already_landed_are_not_rejected(fake):
+    fake.reset(300)
+    fake.migrator().migrate()
+    # As if the run stopped after adding the cases to their suites but before checkpointing it
+    connection = sqlite3.connect(fake.journal_path)
+    connection.execute("UPDATE cases SET step = 'created'")
+    connection.commit()
+    connection.close()
+
+    totals = fake.migrator(resume=True).migrate()
+    assert totals['suite_rejections'] == 0
+    migrator = fake.migrator(resume=True)
+    assert migrator.journal.pending_suite_additions() == {}
+    migrator.journal.close()
+
+
+def test_suite_rejections_are_logged_as_a_count_and_a_sample(fake, caplog):
+    fake.reset(100)
+    fake.migrator().migrate()
+    suite_id, members = next(iter(fake.suite_members().items()))
+    missing = list(range(1, 31))
+
+    migrator = fake.migrator(resume=True)
+    assert migrator.add_test_cases_to_suite(members[:5] + missing, suite_id) == missing
+    migrator.journal.close()
+    errors = [record.getMessage() for record in caplog.records if record.levelname == 'ERROR']
+    assert errors == [f"❌ Suite {suite_id} rejected 30 test cases: 1, 2, 3, 4, 5, 6, 7, 8, 9, 10 and 20 more"]
+
+
+def project_url(fake):
+    migration = fake.migration
+    return f"{migration.ADO_BASE_URL}/{migration.ADO_ORG}/{migration.ADO_PROJECT}/_apis/projects/{migration.ADO_PROJECT}"
+
+
+def test_throttled_requests_are_retried_after_retry_after_and_slow_the_host(fake):
+    fake.fail('GET', r'/_apis/projects/', 429, count=2, retry_after=0.05)
+    migrator = fake.migrator()
+    limiter = migrator.rate_limiter_for(project_url(fake))
+
+    started = time.monotonic()
+    assert migrator.make_request('GET', project_url(fake)).status_code == 200
+    assert time.monotonic() - started >= 0.1
+    assert fake.state.stats['requests'] == 3
+    # Both throttled answers fall within one cooldown, so the rate is cut once; the clean answer recovers a step
+    migration = fake.migration
+    assert limiter.rate == limiter.max_rate * (migration.RATE_DECREASE_FACTOR + migration.RATE_RECOVERY_STEP)
+    migrator.journal.close()
+
+
+def test_server_errors_are_retried_only_for_idempotent_requests(fake):
+    migrator = fake.migrator()
+    fake.fail('GET', r'/_apis/projects/', 503, count=2)
+    assert migrator.make_request('GET', project_url(fake)).status_code == 200
+    assert fake.state.stats['requests'] == 3
+
+    fake.fail('POST', r'/_apis/projects/', 503)
+    assert migrator.make_request('POST', project_url(fake)).status_code == 503
+    assert fake.state.stats['requests'] == 4
+    migrator.journal.close()
+
+
+def create_batch(fake, cases):
+    migrator = fake.migrator()
+    try:
+        return migrator.create_ado_test_cases_batch([(case, 5) for case in cases])
+    finally:
+        migrator.journal.close()
+
+
+@pytest.mark.parametrize('status', [503, 0])
+def test_batch_whose_response_was_lost_is_reconciled_instead_of_resent(fake, status):
+    fake.reset(50)
+    fake.fail('POST', r'/_apis/wit/\$batch', status, after_handling=True)
+
+    assert create_batch(fake, [fake.state.case(case_id) for case_id in range(1, 51)]) == 50
+    assert len(fake.test_case_ids()) == 50
+
+
+def test_batch_is_not_resent_when_the_reconciliation_lookup_fails(fake):
+    fake.reset(50)
+    fake.fail('POST', r'/_apis/wit/\$batch', 503, after_handling=True)
+    fake.fail('POST', r'/_apis/wit/wiql', 500, count=fake.migration.MAX_RETRIES + 1)
+
+    assert create_batch(fake, [fake.state.case(case_id) for case_id in range(1, 51)]) == 0
+    assert len(fake.test_case_ids()) == 50
+
+
+def test_batch_items_without_a_testrail_id_are_not_resent_after_an_unknown_outcome(fake):
+    fake.reset(2)
+    fake.fail('POST', r'/_apis/wit/\$batch', 503, after_handling=True)
+    untagged = dict(fake.state.case(2), id=None)
+
+    assert create_batch(fake, [fake.state.case(1), untagged]) == 1
+    assert len(fake.test_case_ids()) == 2
+
+
+def test_throttled_batch_is_resent(fake):
+    fake.reset(10)
+    fake.fail('POST', r'/_apis/wit/\$batch', 429, count=fake.migration.MAX_RETRIES + 1, retry_after=0.01)
+
+    assert create_batch(fake, [fake.state.case(case_id) for case_id in range(1, 11)]) == 10
+    assert len(fake.test_case_ids()) == 10
+
+
+def test_single_create_whose_response_was_lost_is_reconciled(fake, monkeypatch):
+    monkeypatch.setattr(fake.migration, 'ADO_BATCH_CREATE', False)
+    fake.reset(100)
+    fake.fail('POST', r'/_apis/wit/workitems/\$Test', 0, count=3, after_handling=True)
+
+    totals = fake.migrator().migrate()
+    assert totals['created'] == 100 and totals['failed'] == 0
+    assert len(fake.test_case_ids()) == 100
+
+
+def test_single_create_is_not_resent_when_the_reconciliation_lookup_fails(fake):
+    fake.reset(1)
+    fake.fail('POST', r'/_apis/wit/workitems/\$Test', 503, after_handling=True)
+    fake.fail('POST', r'/_apis/wit/wiql', 500, count=fake.migration.MAX_RETRIES + 1)
+
+    migrator = fake.migrator()
+    assert not migrator.create_ado_test_case(fake.state.case(1), 5)
+    migrator.journal.close()
+    assert len(fake.test_case_ids()) == 1
+
+
+def journal_length(fake):
+    migrator = fake.migrator(resume=True)
+    try:
+        return len(migrator.journal)
+    finally:
+        migrator.journal.close()
+
+
+def test_rollback_deletes_what_the_run_created_and_clears_the_journal(fake):
+    fake.reset(300)
+    run_id = fake.migrator().migrate()['run_id']
+
+    totals = fake.migrator().rollback()
+    assert totals['run_id'] == run_id
+    assert totals['work_items'] == 300 and totals['suites'] == 3
+    assert totals['work_items_failed'] == totals['suites_failed'] == 0
+    assert fake.test_case_ids() == []
+    assert list(fake.state.suites) == [fake.migration.ADO_STATIC_SUITE_PARENT_ID]
+    assert journal_length(fake) == 0
+
+
+def test_rollback_deletes_nothing_when_the_run_cannot_be_listed(fake):
+    fake.reset(300)
+    fake.migrator().migrate()
+    fake.fail('POST', r'/_apis/wit/wiql', 500, count=fake.migration.MAX_RETRIES + 1)
+
+    assert fake.migrator().rollback() is None
+    assert len(fake.test_case_ids()) == 300
+    assert len(fake.state.suites) == 4
+    assert journal_length(fake) == 300
+
+
+def test_rollback_of_a_run_that_only_adopted_keeps_the_journal(fake, caplog):
+    fake.reset(300)
+    first_run_id = fake.migrator().migrate()['run_id']
+    fake.migrator().migrate()
+
+    totals = fake.migrator().rollback()
+    assert totals['work_items'] == totals['suites'] == 0
+    assert len(fake.test_case_ids()) == 300
+    assert journal_length(fake) == 300
+    assert any("created no work items or suites" in record.getMessage() for record in caplog.records)
+
+    assert fake.migrator().rollback(first_run_id)['work_items'] == 300
+    assert fake.test_case_ids() == []
+
+
+def test_testrail_listing_is_read_page_by_page(fake):
+    fake.reset(1234)
+    pages = list(fake.migrator().iter_testrail_pages('get_cases/1', 'cases', {'suite_id': 1}))
+
+    assert [len(page) for page in pages] == [250, 250, 250, 250, 234]
+    assert [case['id'] for page in pages for case in page] == list(range(1, 1235))
+
+
+def test_throttled_testrail_page_is_retried(fake):
+    fake.reset(600)
+    fake.fail('GET', r'/index\.php$', 429, count=2, retry_after=0.01)
+    cases = [case for page in fake.migrator().iter_testrail_pages('get_cases/1', 'cases', {'suite_id': 1})
+             for case in page]
+
+    assert [case['id'] for case in cases] == list(range(1, 601))
+    assert fake.state.stats['requests'] == 5
+
+
+def test_failed_testrail_page_raises_instead_of_ending_the_listing(fake):
+    fake.reset(600)
+    fake.fail('GET', r'/index\.php$', 404)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        list(fake.migrator().iter_testrail_pages('get_cases/1', 'cases', {'suite_id': 1}))
+
+
+def test_suite_tree_is_indexed_across_listing_pages(fake):
+    fake.reset(0)
+    parents = [fake.state.create_suite(f"Area {n}", 4)['id'] for n in range(300)]
+    for parent in parents[:150]:
+        fake.state.create_suite("Smoke", parent)
+    migrator = fake.migrator()
+    migrator.fetch_ado_suites()
+
+    assert len(migrator.suite_index) == 451
+    assert migrator.suite_index.get("Area 299", 4) == parents[-1]
+    assert migrator.suite_index.get("Smoke", parents[149]) is not None
+
+
+def test_suite_tree_listing_that_fails_past_the_first_page_raises(fake, monkeypatch):
+    fake.reset(0)
+    for n in range(300):
+        fake.state.create_suite(f"Area {n}", 4)
+    migrator = fake.migrator()
+    make_request = migrator.make_request
+
+    def fail_the_next_page(*args, **kwargs):
+        response = make_request(*args, **kwargs)
+        fake.fail('GET', r'/suites$', 404)
+        return response
+
+    monkeypatch.setattr(migrator, 'make_request', fail_the_next_page)
+    with pytest.raises(requests.exceptions.HTTPError, match="past the first page"):
+        migrator.fetch_ado_suites()
+
+
+def test_suite_members_are_listed_across_pages(fake):
+    fake.reset(0)
+    with fake.state.lock:
+        fake.state.suite_members[4] = list(range(1000, 1450))
+
+    assert list(fake.migrator().iter_suite_test_case_ids(4)) == list(range(1000, 1450))
+
+
+def test_suite_member_listing_that_fails_past_the_first_page_raises(fake):
+    fake.reset(0)
+    with fake.state.lock:
+        fake.state.suite_members[4] = list(range(1000, 1450))
+    members = fake.migrator().iter_suite_test_case_ids(4)
+    first = [next(members) for _ in range(200)]
+    fake.fail('GET', r'/Suites/4/TestCase$', 404)
+
+    assert first == list(range(1000, 1200))
+    with pytest.raises(requests.exceptions.HTTPError):
+        list(members)
+
+
+def test_offline_run_reads_listings_cached_by_an_earlier_run(fake):
+    fake.reset(600)
+    listing = ('get_cases/1', 'cases', {'suite_id': 1})
+    live = [case['id'] for page in fake.migrator(cache_mode='refresh').iter_testrail_pages(*listing) for case in page]
+    requests_made = fake.state.stats['requests']
+    fake.fail('GET', r'/index\.php$', 500, count=100)
+    offline = fake.migrator(cache_mode='offline')
+
+    assert [case['id'] for page in offline.iter_testrail_pages(*listing) for case in page] == live
+    assert fake.state.stats['requests'] == requests_made
+    with pytest.raises(Exception, match="No cached TestRail export"):
+        list(offline.iter_testrail_pages('get_cases/1', 'cases', {'suite_id': 2}))
+    with pytest.raises(Exception, match="never cached"):
+        list(offline.iter_testrail_pages('get_tests/1', 'tests', cacheable=False))
+    assert offline.migrate_runs() is None
+
+
+def test_interrupted_listing_is_not_cached(fake):
+    fake.reset(600)
+    migrator = fake.migrator(cache_mode='refresh')
+    pages = migrator.iter_testrail_pages('get_cases/1', 'cases', {'suite_id': 1})
+    next(pages)
+    fake.fail('GET', r'/index\.php$', 404, count=2)
+    with pytest.raises(requests.exceptions.HTTPError):
+        list(pages)
+
+    assert migrator.cache.lookup('get_cases/1', {'suite_id': 1, 'limit': fake.migration.TESTRAIL_PAGE_SIZE}) is None
+    assert not any(name.endswith('.partial') for name in os.listdir(migrator.cache.directory))
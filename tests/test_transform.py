@@ -0,0 +1,56 @@
+import html
+import xml.etree.ElementTree as ElementTree
+
+from transform import build_test_case_payload, parse_steps, steps_xml
+
+
+def field(document, name):
+    return next((operation['value'] for operation in document if operation['path'] == f"/fields/{name}"), None)
+
+
+def test_steps_xml_escapes_markup_twice():
+    xml = steps_xml([("Click <Save> & \"confirm\"", "Saved <b>")])
+    root = ElementTree.fromstring(xml)
+    action, expected = (element.text for element in root.iter('parameterizedString'))
+    # The parsed XML holds formatted HTML, which in turn holds the escaped TestRail text
+    assert action == "<DIV><P>Click &lt;Save&gt; &amp; &quot;confirm&quot;</P></DIV>"
+    assert html.unescape(action[len("<DIV><P>"):-len("</P></DIV>")]) == "Click <Save> & \"confirm\""
+    assert expected == "<DIV><P>Saved &lt;b&gt;</P></DIV>"
+
+
+def test_steps_xml_numbers_steps_and_references_shared_steps():
+    root = ElementTree.fromstring(steps_xml([("Open", ""), 42, ("Check", "Done")]))
+    assert root.get('last') == "3"
+    assert [(child.tag, child.get('id')) for child in root] == [('step', '1'), ('compref', '2'), ('step', '3')]
+    assert root[1].get('ref') == "42"
+    assert root[0].get('type') == "ActionStep"
+    assert root[2].get('type') == "ValidateStep"
+
+
+def test_steps_xml_keeps_line_breaks():
+    root = ElementTree.fromstring(steps_xml([("first\nsecond", "")]))
+    assert root[0][0].text == "<DIV><P>first<BR/>second</P></DIV>"
+
+
+def test_steps_xml_of_no_steps_is_empty():
+    assert steps_xml([]) == ''
+
+
+def test_parse_steps_prefers_separated_steps():
+    case = {'custom_steps_separated': [{'content': "a", 'expected': None}], 'custom_steps': "ignored"}
+    assert parse_steps(case) == [("a", "")]
+
+
+def test_parse_steps_reads_json_and_free_text():
+    assert parse_steps({'custom_steps': '[{"content": "a", "expected": "b"}]'}) == [("a", "b")]
+    assert parse_steps({'custom_steps': "do it", 'custom_expected': "works"}) == [("do it", "works")]
+
+
+def test_free_text_expected_result_is_not_repeated_in_the_description():
+    document = build_test_case_payload({'id': 1, 'custom_steps': "do it", 'custom_expected': "works"},
+                                       {}, {}, "TestRail:C")
+    assert "works" in field(document, "Microsoft.VSTS.TCM.Steps")
+    assert "Expected Result" not in field(document, "System.Description")
+
+    document = build_test_case_payload({'id': 1, 'custom_expected': "works"}, {}, {}, "TestRail:C")
+    assert "<b>Expected Result:</b><br>works" in field(document, "System.Description")
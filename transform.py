@@ -0,0 +1,222 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+# Characters that must be escaped inside HTML and XML text; applied with one str.translate call
+XML_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
+
+# Templates for the Microsoft.VSTS.TCM.Steps field. Each parameterizedString holds
+# formatted (HTML) text: the TestRail text is HTML-escaped, wrapped in markup and
+# then escaped once more to embed it in the steps XML.
+STEPS_TEMPLATE = '<steps id="0" last="{last}">{steps}</steps>'.format
+STEP_TEMPLATE = ('<step id="{id}" type="{type}">'
+                 '<parameterizedString isformatted="true">{action}</parameterizedString>'
+                 '<parameterizedString isformatted="true">{expected}</parameterizedString>'
+                 '<description/></step>').format
+FORMATTED_TEXT = '<DIV><P>{}</P></DIV>'.format
+# A reference to a Shared Steps work item, in place of the steps it holds
+SHARED_STEPS_TEMPLATE = '<compref id="{id}" ref="{ref}"/>'.format
+
+# Link from a test case to a Shared Steps work item it references
+SHARED_STEPS_RELATION = "Microsoft.VSTS.TestCase.SharedStepReferencedBy-Reverse"
+
+# Tag recording a case's TestRail automation status
+AUTOMATION_STATUS_TAG_PREFIX = "AutomationStatus:"
+
+# Cases handed to one worker process at a time by transform_cases
+TRANSFORM_CHUNK_SIZE = 500
+
+
+def formatted_text(text: str) -> str:
+    """Wrap step text as formatted HTML and escape it for the steps XML"""
+    if not text:
+        return ''
+    return FORMATTED_TEXT(str(text).translate(XML_ESCAPES).replace('\n', '<BR/>')).translate(XML_ESCAPES)
+
+
+def parse_steps(case: dict) -> List[Tuple[str, str]]:
+    """Return a case's steps as (action, expected result) pairs.
+
+    Prefers ``custom_steps_separated`` (the "Test Case (Steps)" template); falls
+    back to ``custom_steps``, either a JSON list of steps or free text; free
+    text becomes one step whose expected result is ``custom_expected``.
+    Compact case records carry their steps already parsed.
+    """
+    parsed = getattr(case, 'steps', None)
+    if parsed is not None:
+        return list(parsed)
+    separated = case.get('custom_steps_separated')
+    if separated:
+        return [(step.get('content') or '', step.get('expected') or '') for step in separated]
+
+    steps_data = case.get('custom_steps')
+    if not steps_data:
+        return []
+    if isinstance(steps_data, str) and steps_data.startswith('['):
+        try:
+            steps_data = json.loads(steps_data)
+        except json.JSONDecodeError:
+            pass
+    if isinstance(steps_data, list):
+        return [(step.get('content') or '', step.get('expected') or '') for step in steps_data]
+    return [(str(steps_data), case.get('custom_expected') or '')]
+
+
+def step_xml(step_id: int, action: str, expected: str) -> str:
+    return STEP_TEMPLATE(
+        id=step_id,
+        type='ValidateStep' if expected else 'ActionStep',
+        action=formatted_text(action),
+        expected=formatted_text(expected)
+    )
+
+
+def steps_xml(steps: List[Union[Tuple[str, str], int]]) -> str:
+    """Render steps as the ADO Test Case steps XML.
+
+    Each step is an (action, expected result) pair, or the ID of a Shared
+    Steps work item to reference instead.
+    """
+    if not steps:
+        return ''
+    rendered = [
+        SHARED_STEPS_TEMPLATE(id=step_id, ref=step) if isinstance(step, int) else step_xml(step_id, *step)
+        for step_id, step in enumerate(steps, 1)
+    ]
+    return STEPS_TEMPLATE(last=len(steps), steps=''.join(rendered))
+
+
+def build_test_case_payload(case: dict, priority_mapping: Dict[int, int],
+                            automation_status_mapping: Dict[int, str], tag_prefix: str,
+                            shared_steps=None, field_labels=None) -> List[dict]:
+    """Build the JSON-patch document that creates a TestRail case as an ADO Test Case.
+
+    With a ``SharedStepsPlan``, step blocks it holds are replaced by references
+    to their Shared Steps work items. With ``CaseFieldLabels``, the case type
+    and custom fields are added to the description.
+    """
+    case_title = case.get('title', 'Untitled Test Case')
+
+    # Extract all relevant fields from TestRail
+    description = case.get('custom_preconds', '')
+    parsed_steps = parse_steps(case)
+    expected_result = case.get('custom_expected', '')
+    # Free-text steps already carry the expected result; it is not repeated in the description
+    if expected_result and any(expected == expected_result for _, expected in parsed_steps):
+        expected_result = ''
+    if shared_steps is not None:
+        parsed_steps = shared_steps.substitute(parsed_steps)
+    steps = steps_xml(parsed_steps)
+    priority_id = case.get('priority_id', 2)  # Default to Medium
+    automation_status = case.get('custom_case_automated', 0)
+    estimate = case.get('estimate', '')
+    references = case.get('refs', '')
+
+    # Map priority from TestRail to ADO
+    ado_priority = priority_mapping.get(priority_id, 3)
+    automation_text = automation_status_mapping.get(automation_status, "Not Automated")
+
+    # Build comprehensive description
+    description_parts = []
+    if description:
+        description_parts.append(f"<b>Prerequisites:</b><br>{description}")
+    if expected_result:
+        description_parts.append(f"<b>Expected Result:</b><br>{expected_result}")
+
+    description_parts.append(f"<b>Automation Status:</b> {automation_text}")
+
+    if estimate:
+        description_parts.append(f"<b>Estimate:</b> {estimate}")
+    if references:
+        description_parts.append(f"<b>References:</b> {references}")
+    if field_labels is not None:
+        description_parts.extend(f"<b>{label}:</b> {text}" for label, text in field_labels.describe(case))
+
+    full_description = "<br><br>".join(description_parts)
+
+    # Create work item payload
+    work_item_payload = [
+        {"op": "add", "path": "/fields/System.Title", "value": case_title},
+        {"op": "add", "path": "/fields/System.Description", "value": full_description},
+        {"op": "add", "path": "/fields/Microsoft.VSTS.Common.Priority", "value": ado_priority}
+    ]
+
+    # Add steps if available
+    if steps:
+        work_item_payload.append({
+            "op": "add",
+            "path": "/fields/Microsoft.VSTS.TCM.Steps",
+            "value": steps
+        })
+
+    # Add tags for automation status and the source TestRail case
+    tags = [f"{AUTOMATION_STATUS_TAG_PREFIX}{automation_text.replace(' ', '')}"]
+    if case.get('id') is not None:
+        tags.append(f"{tag_prefix}{case['id']}")
+    work_item_payload.append({
+        "op": "add",
+        "path": "/fields/System.Tags",
+        "value": "; ".join(tags)
+    })
+
+    # Link every Shared Steps work item the steps reference
+    for shared_steps_id in dict.fromkeys(step for step in parsed_steps if isinstance(step, int)):
+        work_item_payload.append({
+            "op": "add",
+            "path": "/relations/-",
+            "value": {"rel": SHARED_STEPS_RELATION, "url": shared_steps.work_item_url(shared_steps_id)}
+        })
+
+    return work_item_payload
+
+
+def transform_batch(cases: List[dict], priority_mapping: Dict[int, int],
+                    automation_status_mapping: Dict[int, str], tag_prefix: str,
+                    shared_steps=None, field_labels=None) -> List[List[dict]]:
+    """Build payloads for a list of cases; the unit of work sent to a worker process"""
+    return [build_test_case_payload(case, priority_mapping, automation_status_mapping, tag_prefix, shared_steps,
+                                    field_labels)
+            for case in cases]
+
+
+def chunked(cases: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for case in cases:
+        chunk.append(case)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def transform_cases(cases: Iterable[dict], priority_mapping: Dict[int, int],
+                    automation_status_mapping: Dict[int, str], tag_prefix: str,
+                    workers: int = None, chunk_size: int = TRANSFORM_CHUNK_SIZE,
+                    shared_steps=None, field_labels=None) -> Iterator[List[dict]]:
+    """Yield a payload per case, in order, building them on a process pool.
+
+    Only a couple of chunks per worker are in flight at once, so ``cases`` can
+    be a stream. With ``workers`` of 1 the payloads are built in the calling
+    process.
+    """
+    transform = partial(transform_batch, priority_mapping=priority_mapping,
+                        automation_status_mapping=automation_status_mapping, tag_prefix=tag_prefix,
+                        shared_steps=shared_steps, field_labels=field_labels)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunked(cases, chunk_size):
+            yield from transform(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunked(cases, chunk_size):
+            pending.append(pool.submit(transform, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()